@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional
+
+
+class LoadShedError(Exception):
+    """Raised when admission control turns a call away instead of queueing it"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM call shed: {reason}")
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ('wake',)
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+
+
+class AdmissionController:
+    """
+    Admission control for calls to a rate-limited upstream. At most
+    `max_concurrency` calls run at once and, when `rate` is set, calls start
+    at no more than `rate` per second (a token bucket holding up to `burst`
+    tokens). Callers over the limit wait in a bounded FIFO queue. A call is
+    shed with LoadShedError instead of waiting when the queue is full, when
+    its estimated wait exceeds `max_wait`, or when it has waited that long.
+    Sync and async callers share the same limits and queue.
+    """
+
+    def __init__(self, max_concurrency: int = 8, rate: float = 0.0, burst: Optional[int] = None,
+                 max_queue: int = 32, max_wait: float = 2.0):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst or max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._in_flight = 0
+        self._queue = deque()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        # Moving average of call duration, used to estimate queue wait
+        self._latency = 0.0
+        self._shed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _token_delay(self) -> float:
+        """Seconds until a token is available (0 if one is, or no rate is set)"""
+        if self.rate <= 0 or self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _take(self):
+        self._in_flight += 1
+        if self.rate > 0:
+            self._tokens -= 1
+
+    def _shed_locked(self, reason: str):
+        self._shed[reason] = self._shed.get(reason, 0) + 1
+        raise LoadShedError(reason)
+
+    def _estimated_wait(self, position: int) -> float:
+        """Rough wait for the caller at `position` in the queue (0 = head)"""
+        slot_wait = 0.0
+        if self._in_flight >= self.max_concurrency:
+            slot_wait = (position + 1) * self._latency / self.max_concurrency
+        token_wait = 0.0
+        if self.rate > 0:
+            token_wait = max(0.0, position + 1 - self._tokens) / self.rate
+        return max(slot_wait, token_wait)
+
+    def _enter(self, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Admit the call now (returns None), queue it, or shed it"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if not self._queue and self._in_flight < self.max_concurrency and self._token_delay() == 0:
+                self._take()
+                return None
+            if len(self._queue) >= self.max_queue:
+                self._shed_locked('queue_full')
+            if self._estimated_wait(len(self._queue)) > self.max_wait:
+                self._shed_locked('deadline')
+            waiter = _Waiter(wake)
+            self._queue.append(waiter)
+            return waiter
+
+    def _poll(self, waiter: _Waiter, deadline: float) -> Optional[float]:
+        """
+        Admit the waiter if it's at the head of the queue and a slot and token
+        are free. Returns None once admitted, otherwise how long to sleep.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            remaining = deadline - now
+            if self._queue[0] is waiter and self._in_flight < self.max_concurrency:
+                delay = self._token_delay()
+                if delay == 0:
+                    self._queue.popleft()
+                    self._take()
+                    self._wake_head()
+                    return None
+                remaining = min(remaining, delay)
+            if deadline <= now:
+                self._queue.remove(waiter)
+                self._wake_head()
+                self._shed_locked('timeout')
+            return remaining
+
+    def _wake_head(self):
+        if self._queue and self._in_flight < self.max_concurrency:
+            self._queue[0].wake()
+
+    def acquire(self) -> float:
+        """Block until the call may start; returns the start time to pass to release"""
+        event = threading.Event()
+        waiter = self._enter(event.set)
+        if waiter is not None:
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                delay = self._poll(waiter, deadline)
+                if delay is None:
+                    break
+                event.wait(delay)
+                event.clear()
+        return time.monotonic()
+
+    async def acquire_async(self) -> float:
+        """Async variant of acquire that waits without blocking the event loop"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enter(lambda: loop.call_soon_threadsafe(event.set))
+        if waiter is not None:
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                delay = self._poll(waiter, deadline)
+                if delay is None:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                except asyncio.CancelledError:
+                    self._abandon(waiter)
+                    raise
+                event.clear()
+        return time.monotonic()
+
+    def _abandon(self, waiter: _Waiter):
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                self._wake_head()
+
+    def release(self, started: float):
+        """Free the slot taken by acquire"""
+        duration = time.monotonic() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._latency = duration if not self._latency else 0.8 * self._latency + 0.2 * duration
+            self._wake_head()
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the duration of the block"""
+        started = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    @asynccontextmanager
+    async def admit_async(self):
+        """Async variant of admit"""
+        started = await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'rate': self.rate,
+                'shed': dict(self._shed)
+            }
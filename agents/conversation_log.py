@@ -0,0 +1,270 @@
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from .db_pool import SQLiteConnectionPool
+from .metrics import DB_ERRORS
+
+# What append() does with a message when the queue is full
+DROP_POLICIES = ('drop_new', 'drop_old', 'block')
+
+
+class ConversationLog:
+    """
+    Persistent, write-behind log of chat messages in the conversation_log
+    table. append() only queues a message; a background thread writes the
+    queue in batches of up to `batch_size`, one transaction each, waiting up
+    to `flush_interval` seconds for a batch to fill, so /chat never waits on
+    a disk write.
+
+    The queue holds at most `max_queue` messages. When it is full,
+    'drop_new' discards the incoming message, 'drop_old' the oldest queued
+    one, and 'block' waits up to `block_timeout` seconds for room before
+    discarding the incoming one. Dropped and failed writes are counted.
+    close() writes everything still queued before returning.
+
+    get_page() never waits for the queue to drain: messages this process has
+    queued for a session but not yet written are added to the page from
+    memory.
+
+    Clearing a session logs a marker instead of deleting its messages, so
+    the log stays complete for audits; pages start after the last marker.
+    """
+
+    INSERT_QUERY = '''
+        INSERT INTO conversation_log (session_id, type, message, source, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+
+    # Messages after `cursor` and after the session's last clear marker
+    PAGE_QUERY = '''
+        SELECT id, type, message, source, timestamp FROM conversation_log
+        WHERE session_id = ? AND type != 'clear' AND id > MAX(?, (
+            SELECT COALESCE(MAX(id), 0) FROM conversation_log
+            WHERE session_id = ? AND type = 'clear'
+        ))
+        ORDER BY id
+        LIMIT ?
+    '''
+
+    def __init__(self, pool: SQLiteConnectionPool, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.2, drop_policy: str = 'drop_new', block_timeout: float = 0.05,
+                 busy_timeout: float = 10.0):
+        if drop_policy not in DROP_POLICIES:
+            print(f"Unknown conversation log drop policy {drop_policy!r}, using 'drop_new'")
+            drop_policy = 'drop_new'
+
+        # Pages are read on pooled connections; the writer has its own
+        self.pool = pool
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.busy_timeout = busy_timeout
+
+        self._reset()
+
+    def _reset(self):
+        """Start with an empty queue and no writer thread"""
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        # Held by the writer from taking a batch off the queue until it is
+        # committed, so a reader holding it finds each message either in the
+        # table or in the queue
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._flush_requested = False
+        # Messages queued, and messages taken off the queue (written,
+        # failed or dropped as oldest); flush() waits for the second to
+        # catch up with the first
+        self._accepted = 0
+        self._handled = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def append(self, session_id: str, entry: Dict) -> bool:
+        """Queue a history entry for writing; returns False if it was dropped"""
+        row = (session_id, entry['type'], entry['message'], entry.get('source'), entry['timestamp'])
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue and not self._make_room():
+                self.dropped += 1
+                return False
+            self._enqueue(row)
+            return True
+
+    def _make_room(self) -> bool:
+        """Apply the drop policy to a full queue; True if the new message fits (lock must be held)"""
+        if self.drop_policy == 'drop_old':
+            self._queue.popleft()
+            self._handled += 1
+            self.dropped += 1
+            return True
+        if self.drop_policy == 'block':
+            return self._cond.wait_for(
+                lambda: len(self._queue) < self.max_queue or self._closed, self.block_timeout
+            ) and not self._closed
+        return False
+
+    def _enqueue(self, row: Tuple):
+        """Add a row and wake the writer once a batch is ready (lock must be held)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='conversation-log', daemon=True)
+            self._thread.start()
+        self._queue.append(row)
+        self._accepted += 1
+        if len(self._queue) >= self.batch_size:
+            self._cond.notify_all()
+
+    def clear(self, session_id: str, timestamp: str):
+        """Hide a session's earlier messages from get_page; never dropped"""
+        with self._cond:
+            if not self._closed:
+                self._enqueue((session_id, 'clear', '', None, timestamp))
+
+    def _run(self):
+        conn = None
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed)
+                if not self._closed and not self._flush_requested and len(self._queue) < self.batch_size:
+                    # Let a burst of messages accumulate into one transaction
+                    self._cond.wait_for(
+                        lambda: len(self._queue) >= self.batch_size or self._closed or self._flush_requested,
+                        self.flush_interval
+                    )
+                if not self._queue:
+                    break  # Closed and fully written
+
+            with self._write_lock:
+                with self._cond:
+                    batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                    # Blocked appenders have room again
+                    self._cond.notify_all()
+                if not batch:
+                    continue  # Emptied by 'drop_old' meanwhile
+
+                conn, error = self._write(conn, batch)
+
+                with self._cond:
+                    self._handled += len(batch)
+                    if error is None:
+                        self.written += len(batch)
+                        self.batches += 1
+                    else:
+                        self.failed += len(batch)
+                    if self._handled >= self._accepted:
+                        self._flush_requested = False
+                    self._cond.notify_all()
+
+        if conn is not None:
+            conn.close()
+
+    def _write(self, conn: Optional[sqlite3.Connection], batch: List[Tuple]):
+        """Insert one batch; returns the connection to reuse and the error, if any"""
+        try:
+            if conn is None:
+                conn = sqlite3.connect(self.pool.db_path, timeout=self.busy_timeout)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                conn.executemany(self.INSERT_QUERY, batch)
+            return conn, None
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('conversation_log')
+            print(f"Error writing {len(batch)} conversation log messages: {e}")
+            if conn is not None:
+                conn.close()
+            return None, e
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every message queued so far is written; False on timeout"""
+        with self._cond:
+            target = self._accepted
+            if self._handled >= target:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._handled >= target, timeout)
+
+    def get_page(self, session_id: str, cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        Return up to `limit` messages newer than `cursor` (a message id),
+        oldest first, with the cursor for the following page. Messages this
+        process has queued but not yet written have no id to page by, so the
+        last page returns all of the session's queued messages after the
+        written ones, with an `id` of None and no next_cursor, even if that
+        makes it longer than `limit`. A session reads its own latest messages
+        without waiting for the writer.
+        """
+        # At most one batch is waited for, not the whole queue
+        with self._write_lock:
+            with self._cond:
+                queued = [row for row in self._queue if row[0] == session_id]
+            with self.pool.connection() as conn:
+                rows = conn.execute(self.PAGE_QUERY, (session_id, cursor or 0, session_id, limit + 1)).fetchall()
+
+        clears = [i for i, row in enumerate(queued) if row[1] == 'clear']
+        if clears:
+            # A clear not yet written hides everything before it
+            rows = []
+            queued = queued[clears[-1] + 1:]
+
+        page = [self._entry(message_id, *row) for message_id, *row in rows[:limit]]
+        if len(rows) > limit:
+            return {'history': page, 'next_cursor': page[-1]['id']}
+
+        page.extend(self._entry(None, *row[1:]) for row in queued)
+        return {'history': page, 'next_cursor': None}
+
+    @staticmethod
+    def _entry(message_id: Optional[int], message_type: str, message: str, source: Optional[str],
+               timestamp: str) -> Dict:
+        """A history entry in the shape the in-memory history returns"""
+        entry = {'type': message_type, 'message': message, 'timestamp': timestamp}
+        if source is not None:
+            entry['source'] = source
+        entry['id'] = message_id
+        return entry
+
+    def before_fork(self):
+        """Write out the queue in a pre-fork master, so no worker inherits it"""
+        self.flush()
+
+    def after_fork(self):
+        """
+        A forked worker has none of its parent's threads and may inherit a
+        held lock, so it starts over with its own queue and writer
+        """
+        self._reset()
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting messages and wait for the writer to write the rest"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                print(f"Conversation log writer did not finish; {len(self._queue)} messages were not written")
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'queued': len(self._queue),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+                'max_queue': self.max_queue,
+                'drop_policy': self.drop_policy
+            }
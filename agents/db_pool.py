@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from typing import List
+
+
+class SQLiteConnectionPool:
+    """
+    Bounded, thread-safe pool of long-lived SQLite connections.
+    Connections are opened lazily, tuned once with performance pragmas and
+    then reused across requests instead of being reopened for every query.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 5.0,
+                 cache_size_kb: int = 16384, mmap_size: int = 268435456,
+                 cached_statements: int = 256):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new connection and apply the tuning pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,  # Connections move between worker threads
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.Error as e:
+            # Read-only filesystems cannot switch journal mode; keep the default
+            print(f"Could not enable WAL journal mode: {e}")
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take a connection from the pool, opening one if below capacity"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.max_size:
+                conn = self._create_connection()
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out after {self.timeout}s waiting for a database connection"
+            )
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool"""
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that borrows a pooled connection"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def reset(self):
+        """
+        Close every connection but keep the pool usable; new connections are
+        opened on demand. Call before forking so child processes never share
+        a SQLite connection with their parent.
+        """
+        self._close_connections()
+
+    def close(self):
+        """Close every connection owned by the pool"""
+        with self._lock:
+            self._closed = True
+        self._close_connections()
+
+    def _close_connections(self):
+        with self._lock:
+            connections, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing database connection: {e}")
+
+    def size(self) -> int:
+        """Return the number of open connections"""
+        return len(self._all)
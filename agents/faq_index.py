@@ -0,0 +1,132 @@
+import json
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .response_cache import normalize_query
+
+# Words that appear in most questions and don't tell FAQ entries apart
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'can', 'do', 'does', 'for', 'i', 'is', 'it', 'me',
+    'my', 'of', 'on', 'or', 'the', 'there', 'this', 'to', 'what', 'when', 'where',
+    'which', 'with', 'you', 'your', 'im', 'we', 'our', 'be', 'have', 'how', 'any'
+))
+
+
+def _stem(word: str) -> str:
+    """Strip common inflections so 'returns', 'returned' and 'returning' match"""
+    for suffix in ('ing', 'ed', 's'):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix) and not word.endswith('ss'):
+            word = word[:-len(suffix)]
+            # shipping -> shipp -> ship
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                word = word[:-1]
+            break
+    # damage/damaged, exchange/exchanges
+    if len(word) > 4 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Stemmed words of a message, without stop words"""
+    return [_stem(word) for word in normalize_query(text).split() if word not in STOP_WORDS]
+
+
+class FaqIndex:
+    """
+    FAQ answers matched by TF-IDF cosine similarity. Each entry's phrasings
+    together make one L2-normalized row of a NumPy matrix, so scoring a
+    message is a single matrix-vector product; the best entry answers the
+    message if its similarity clears `min_similarity`.
+    """
+
+    def __init__(self, entries: List[Dict], min_similarity: float = 0.3):
+        import numpy as np
+
+        self.entries = entries
+        self.min_similarity = min_similarity
+
+        rows = [
+            Counter(term for question in entry['questions'] for term in tokenize(question))
+            for entry in entries
+        ]
+
+        document_frequency = Counter(term for row in rows for term in row)
+        self._vocabulary = {term: column for column, term in enumerate(sorted(document_frequency))}
+        self._idf = np.array([
+            math.log((1 + len(rows)) / (1 + document_frequency[term])) + 1
+            for term in sorted(document_frequency)
+        ], dtype=np.float32)
+
+        self._matrix = np.zeros((len(rows), len(self._vocabulary)), dtype=np.float32)
+        for row_index, counts in enumerate(rows):
+            for term, count in counts.items():
+                self._matrix[row_index, self._vocabulary[term]] = 1 + math.log(count)
+        self._matrix *= self._idf
+        norms = np.linalg.norm(self._matrix, axis=1, keepdims=True)
+        self._matrix /= np.maximum(norms, 1e-12)
+        # Weight of a word no FAQ question uses: a typical word's weight
+        self._unknown_idf = float(np.median(self._idf))
+        self._np = np
+
+    @classmethod
+    def load(cls, path: str, min_similarity: float = 0.3) -> 'FaqIndex':
+        """Build an index from a JSON list of {id, questions, answer} entries"""
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        return cls(entries, min_similarity=min_similarity)
+
+    def _query_vector(self, query: str):
+        vector = self._np.zeros(len(self._vocabulary), dtype=self._np.float32)
+        unknown = 0.0
+        for term, count in Counter(tokenize(query)).items():
+            column = self._vocabulary.get(term)
+            if column is not None:
+                vector[column] = 1 + math.log(count)
+            else:
+                unknown += ((1 + math.log(count)) * self._unknown_idf) ** 2
+        vector *= self._idf
+        known = float(vector @ vector)
+        if not known:
+            return None
+        # Words the FAQ doesn't know still count towards the query's length,
+        # so a long unrelated question sharing one word scores low
+        return vector / math.sqrt(known + unknown)
+
+    def match(self, query: str) -> Tuple[Optional[Dict], float]:
+        """Return the closest entry and its similarity, or (None, 0.0) if no term overlaps"""
+        vector = self._query_vector(query)
+        if vector is None:
+            return None, 0.0
+        scores = self._matrix @ vector
+        best = int(scores.argmax())
+        return self.entries[best], float(scores[best])
+
+    def answer(self, query: str) -> Optional[str]:
+        """Return the FAQ answer for a query if one is similar enough"""
+        entry, similarity = self.match(query)
+        if entry is None or similarity < self.min_similarity:
+            return None
+        return entry['answer']
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self.entries),
+            'questions': sum(len(entry['questions']) for entry in self.entries),
+            'terms': len(self._vocabulary),
+            'min_similarity': self.min_similarity
+        }
+
+
+def load_faq_index(path: Optional[str], min_similarity: float = 0.3) -> Optional[FaqIndex]:
+    """Load the FAQ index, or return None (FAQ answers off) if it can't be built"""
+    if not path:
+        return None
+    try:
+        return FaqIndex.load(path, min_similarity=min_similarity)
+    except ImportError as e:
+        print(f"FAQ answers disabled, NumPy is not installed: {e}")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"FAQ answers disabled, could not load {path}: {e}")
+    return None
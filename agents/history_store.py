@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+
+class _SessionHistory:
+    """Ring buffer of messages for a single session"""
+
+    __slots__ = ('messages', 'next_id', 'last_access')
+
+    def __init__(self, max_messages: int):
+        self.messages = deque(maxlen=max_messages)
+        self.next_id = 1
+        self.last_access = time.monotonic()
+
+
+class ConversationHistoryStore:
+    """
+    Conversation history keyed by session id.
+    Each session keeps a bounded ring buffer of its most recent messages.
+    Idle sessions expire after a TTL, and the least recently used sessions
+    are evicted when the session count or total message count exceeds its cap.
+    """
+
+    def __init__(self, max_messages_per_session: int = 100, max_sessions: int = 10000,
+                 max_total_messages: int = 200000, session_ttl: float = 3600):
+        self.max_messages_per_session = max_messages_per_session
+        self.max_sessions = max_sessions
+        self.max_total_messages = max_total_messages
+        self.session_ttl = session_ttl
+
+        # Ordered from least to most recently used
+        self._sessions: 'OrderedDict[str, _SessionHistory]' = OrderedDict()
+        self._total_messages = 0
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, entry: Dict) -> Dict:
+        """Append a message to a session's history and return the stored entry"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire_idle(now)
+
+            history = self._sessions.get(session_id)
+            if history is None:
+                history = _SessionHistory(self.max_messages_per_session)
+                self._sessions[session_id] = history
+            else:
+                self._sessions.move_to_end(session_id)
+            history.last_access = now
+
+            stored = dict(entry, id=history.next_id)
+            history.next_id += 1
+            if len(history.messages) == history.messages.maxlen:
+                self._total_messages -= 1  # Oldest message drops off the ring
+            history.messages.append(stored)
+            self._total_messages += 1
+
+            self._enforce_caps(keep=session_id)
+            return stored
+
+    def get_page(self, session_id: str, cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        Return up to `limit` messages newer than `cursor` (a message id),
+        oldest first, along with the cursor for the following page.
+        """
+        with self._lock:
+            self._expire_idle(time.monotonic())
+
+            history = self._sessions.get(session_id)
+            if history is None:
+                return {'history': [], 'next_cursor': None}
+
+            self._sessions.move_to_end(session_id)
+            history.last_access = time.monotonic()
+
+            after = cursor or 0
+            page: List[Dict] = []
+            has_more = False
+            for message in history.messages:
+                if message['id'] <= after:
+                    continue
+                if len(page) == limit:
+                    has_more = True
+                    break
+                page.append(message)
+
+            next_cursor = page[-1]['id'] if has_more else None
+            return {'history': page, 'next_cursor': next_cursor}
+
+    def clear(self, session_id: str):
+        """Remove all history for a session"""
+        with self._lock:
+            history = self._sessions.pop(session_id, None)
+            if history is not None:
+                self._total_messages -= len(history.messages)
+
+    def stats(self) -> Dict:
+        """Return current session and message counts"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'messages': self._total_messages
+            }
+
+    def _expire_idle(self, now: float):
+        """Drop sessions idle for longer than the TTL (lock must be held)"""
+        while self._sessions:
+            session_id, history = next(iter(self._sessions.items()))
+            if now - history.last_access < self.session_ttl:
+                break
+            self._evict(session_id)
+
+    def _enforce_caps(self, keep: str):
+        """Evict least recently used sessions until within limits (lock must be held)"""
+        while (len(self._sessions) > self.max_sessions
+               or self._total_messages > self.max_total_messages):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._evict(session_id)
+
+    def _evict(self, session_id: str):
+        history = self._sessions.pop(session_id)
+        self._total_messages -= len(history.messages)
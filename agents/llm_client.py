@@ -0,0 +1,340 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional
+
+from .admission import AdmissionController
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is rejecting calls to the LLM"""
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of recent calls and stops sending traffic upstream
+    when too many of them fail or are slow. After `reset_timeout` seconds a
+    single probe call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float = 0.5, slow_call_rate: float = 0.5,
+                 slow_call_seconds: float = 8.0, window_size: int = 20,
+                 min_calls: int = 5, reset_timeout: float = 30.0):
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+
+        # (failed, slow) for the most recent calls
+        self._outcomes = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be sent upstream"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency: float):
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if slow:
+                    self._trip()
+                else:
+                    self._reset()
+                return
+            self._outcomes.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append((True, False))
+            self._evaluate()
+
+    def _evaluate(self):
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow_calls = sum(1 for _, slow in self._outcomes if slow)
+        if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+            self._trip()
+
+    def _trip(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    def _reset(self):
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+
+class LLMClient:
+    """
+    Long-lived chat completion client shared by all requests.
+    Reuses keep-alive HTTP connections, applies connect/read timeouts and
+    bounded retries, and guards the upstream with a circuit breaker and
+    admission control (see AdmissionController).
+    Settings default from LLM_* environment variables; OPENAI_BASE_URL can
+    point the client at a local stub server. The OpenAI SDK and httpx are
+    imported when the first call is made, not at startup.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None, max_connections: int = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 admission: Optional[AdmissionController] = None):
+        if base_url is None:
+            base_url = os.getenv('OPENAI_BASE_URL') or None
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv('LLM_CONNECT_TIMEOUT', 3.0))
+        if read_timeout is None:
+            read_timeout = float(os.getenv('LLM_READ_TIMEOUT', 15.0))
+        if max_retries is None:
+            max_retries = int(os.getenv('LLM_MAX_RETRIES', 1))
+        if max_connections is None:
+            max_connections = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+
+        self._api_key = api_key
+        self._base_url = base_url
+        self._max_retries = max_retries
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._max_connections = max_connections
+
+        # Built on first use by _get_client
+        self._http_client = None
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        # Async client is bound to the event loop that first uses it
+        self._async_http_client = None
+        self._async_client = None
+
+        self.breaker = breaker or CircuitBreaker(
+            slow_call_seconds=float(os.getenv('LLM_SLOW_CALL_SECONDS', 8.0)),
+            reset_timeout=float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30.0))
+        )
+
+        # Bounds concurrent and per-second calls; excess calls are shed
+        self.admission = admission or AdmissionController(
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+            rate=float(os.getenv('LLM_RATE_LIMIT', 0)),
+            burst=int(os.getenv('LLM_RATE_BURST', 0)) or None,
+            max_queue=int(os.getenv('LLM_QUEUE_SIZE', 32)),
+            max_wait=float(os.getenv('LLM_QUEUE_TIMEOUT', 2.0))
+        )
+
+    def _http_settings(self):
+        import httpx
+
+        timeout = httpx.Timeout(self._read_timeout, connect=self._connect_timeout)
+        limits = httpx.Limits(
+            max_connections=self._max_connections,
+            max_keepalive_connections=self._max_connections
+        )
+        return httpx, timeout, limits
+
+    def _get_client(self) -> 'OpenAI':
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+
+                    httpx, timeout, limits = self._http_settings()
+                    self._http_client = httpx.Client(timeout=timeout, limits=limits)
+                    self._client = OpenAI(
+                        api_key=self._api_key,
+                        base_url=self._base_url,
+                        timeout=timeout,
+                        max_retries=self._max_retries,
+                        http_client=self._http_client
+                    )
+        return self._client
+
+    def complete(self, messages: List[Dict], model: str = "gpt-3.5-turbo", **kwargs) -> str:
+        """Run a chat completion and return the text of the first choice"""
+        with self.admission.admit():
+            return self._complete(messages, model, **kwargs)
+
+    def _complete(self, messages: List[Dict], model: str, **kwargs) -> str:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        start = time.monotonic()
+        try:
+            completion = self._get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                **kwargs
+            )
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success(time.monotonic() - start)
+        return completion.choices[0].message.content
+
+    def stream(self, messages: List[Dict], model: str = "gpt-3.5-turbo", **kwargs) -> Iterator[str]:
+        """Run a streamed chat completion, yielding text chunks as they arrive"""
+        # The slot is held until the stream finishes or is closed
+        with self.admission.admit():
+            yield from self._stream(messages, model, **kwargs)
+
+    def _stream(self, messages: List[Dict], model: str, **kwargs) -> Iterator[str]:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        # Streams are judged on time to first token rather than total duration
+        start = time.monotonic()
+        first_token_latency = None
+        failed = False
+        chunks = None
+        try:
+            chunks = self._get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                **kwargs
+            )
+            for chunk in chunks:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    if first_token_latency is None:
+                        first_token_latency = time.monotonic() - start
+                    yield text
+        except Exception:
+            failed = True
+            self.breaker.record_failure()
+            raise
+        finally:
+            # Also runs when the caller stops consuming the stream early
+            if chunks is not None:
+                chunks.response.close()
+            if not failed:
+                self.breaker.record_success(first_token_latency or time.monotonic() - start)
+
+    def _get_async_client(self) -> 'AsyncOpenAI':
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            httpx, timeout, limits = self._http_settings()
+            self._async_http_client = httpx.AsyncClient(timeout=timeout, limits=limits)
+            self._async_client = AsyncOpenAI(
+                api_key=self._api_key,
+                base_url=self._base_url,
+                timeout=timeout,
+                max_retries=self._max_retries,
+                http_client=self._async_http_client
+            )
+        return self._async_client
+
+    async def complete_async(self, messages: List[Dict], model: str = "gpt-3.5-turbo", **kwargs) -> str:
+        """Async variant of complete for use inside an event loop"""
+        async with self.admission.admit_async():
+            return await self._complete_async(messages, model, **kwargs)
+
+    async def _complete_async(self, messages: List[Dict], model: str, **kwargs) -> str:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        client = self._get_async_client()
+        start = time.monotonic()
+        try:
+            completion = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                **kwargs
+            )
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success(time.monotonic() - start)
+        return completion.choices[0].message.content
+
+    async def stream_async(self, messages: List[Dict], model: str = "gpt-3.5-turbo", **kwargs) -> AsyncIterator[str]:
+        """Async variant of stream"""
+        async with self.admission.admit_async():
+            chunks = self._stream_async(messages, model, **kwargs)
+            try:
+                async for text in chunks:
+                    yield text
+            finally:
+                await chunks.aclose()
+
+    async def _stream_async(self, messages: List[Dict], model: str, **kwargs) -> AsyncIterator[str]:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        client = self._get_async_client()
+        start = time.monotonic()
+        first_token_latency = None
+        failed = False
+        chunks = None
+        try:
+            chunks = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                **kwargs
+            )
+            async for chunk in chunks:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    if first_token_latency is None:
+                        first_token_latency = time.monotonic() - start
+                    yield text
+        except Exception:
+            failed = True
+            self.breaker.record_failure()
+            raise
+        finally:
+            if chunks is not None:
+                await chunks.response.aclose()
+            if not failed:
+                self.breaker.record_success(first_token_latency or time.monotonic() - start)
+
+    def close(self):
+        """Close pooled HTTP connections"""
+        if self._http_client is not None:
+            self._http_client.close()
+
+    async def aclose(self):
+        """Close the async client's connections from its event loop"""
+        if self._async_http_client is not None:
+            await self._async_http_client.aclose()
+            self._async_http_client = None
+            self._async_client = None
@@ -1,7 +1,17 @@
 import sqlite3
-import re
 import os
-from typing import Dict, Optional, List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, List, Type
+from .db_pool import SQLiteConnectionPool
+from .query_matcher import QueryMatch, QueryMatcher
+from .product_index import ProductIndex
+from .order_cache import OrderCache
+from .order_record import CustomerOrder, OrderInfo, OrderRecord, ProductOrder, TrackingEvent
+from .pagination import decode_cursor, encode_cursor
+from .single_flight import SingleFlight, SingleFlightTimeout
+from .tracking_ingest import TrackingEventIngestor
+from .metrics import DB_ERRORS, DB_QUERY_SECONDS
 
 class LogisticsAgent:
     """
@@ -9,43 +19,182 @@ class LogisticsAgent:
     This agent is responsible for fetching order status, tracking information, and delivery details.
     """
     
+    # Default and maximum page sizes for product and customer order searches
+    SEARCH_RESULT_LIMIT = 50
+    MAX_PAGE_SIZE = 500
+    
+    # Products with at least this many orders are searched by walking the
+    # order_date index rather than sorting every full-text match
+    FTS_SORT_LIMIT = 5000
+    
     def __init__(self, db_path: str = None):
-        if db_path is None:
+        if db_path is None and os.getenv('DATABASE_PATH'):
+            self.db_path = os.getenv('DATABASE_PATH')
+        elif db_path is None:
             # Default to the database in the db directory
             current_dir = os.path.dirname(__file__)
             db_dir = os.path.join(current_dir, '..', 'db')
             self.db_path = os.path.join(db_dir, 'customer_support.db')
         else:
             self.db_path = db_path
+        
+        # Long-lived connections shared by all request threads
+        self.db_pool = SQLiteConnectionPool(
+            self.db_path,
+            max_size=int(os.getenv('DB_POOL_SIZE', 8))
+        )
+        
+        # FTS index table name -> whether it exists, resolved on first search
+        self._search_indexes = {}
+        # Product search term -> query plan ('fts' or 'scan'), see _product_search_plan
+        self._product_plans = {}
+        
+        # Typo-tolerant product lookup over the product names in orders,
+        # refreshed with newly added orders as queries come in
+        self.product_index = ProductIndex(
+            loader=self.load_product_names,
+            refresh_interval=float(os.getenv('PRODUCT_INDEX_REFRESH', 60)),
+            min_similarity=float(os.getenv('PRODUCT_MIN_SIMILARITY', 0.5))
+        )
+        
+        # Single-pass extraction of order IDs, plus catalog product lookup
+        self.matcher = QueryMatcher(product_index=self.product_index)
+        
+        # Hot orders served from memory, invalidated from the order change log
+        self.order_cache = OrderCache(
+            max_size=int(os.getenv('ORDER_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('ORDER_CACHE_TTL', 300)),
+            check_interval=float(os.getenv('ORDER_CACHE_CHECK_INTERVAL', 0))
+        )
+        self._has_change_tracking = None
+        
+        # Concurrent lookups of the same order share one database read
+        self.order_flights = SingleFlight(
+            'order_info',
+            timeout=float(os.getenv('ORDER_COALESCE_TIMEOUT', 5.0))
+        )
+        
+        # Bulk writer for carrier tracking events (POST /tracking/events);
+        # orders it changes are dropped from the order cache as each batch commits
+        self.tracking_ingestor = TrackingEventIngestor(
+            self.db_path,
+            batch_size=int(os.getenv('TRACKING_INGEST_BATCH', 20000)),
+            on_commit=self.order_cache.invalidate
+        )
+        
+        # Bounded worker threads for lookups issued from async code
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('DB_EXECUTOR_WORKERS', self.db_pool.max_size)),
+            thread_name_prefix='logistics-db'
+        )
     
     def _get_db_connection(self):
-        """Create and return a database connection"""
+        """Borrow a database connection from the pool"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # This allows us to access columns by name
-            return conn
+            return self.db_pool.acquire()
         except sqlite3.Error as e:
+            DB_ERRORS.inc('connect')
             print(f"Database connection error: {e}")
             return None
     
+    def _release_db_connection(self, conn):
+        """Return a borrowed connection to the pool"""
+        self.db_pool.release(conn)
+    
+    def close(self):
+        """Stop the executor and close all pooled database connections"""
+        self._executor.shutdown(wait=True)
+        self.tracking_ingestor.close()
+        self.db_pool.close()
+    
     def extract_order_id(self, query: str) -> Optional[int]:
-        """Extract order ID from user query using regex"""
-        # Look for patterns like "order #123", "order 123", "#123"
-        patterns = [
-            r'order\s*#?(\d+)',
-            r'#(\d+)',
-            r'order\s+(\d+)',
-            r'id\s*#?(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query.lower())
-            if match:
-                return int(match.group(1))
-        return None
-    
-    def get_order_info(self, order_id: int) -> Optional[Dict]:
+        """Extract order ID from user query using the shared precompiled matcher"""
+        # Looks for patterns like "order #123", "order 123", "#123"
+        return self.matcher.match(query).order_id
+    
+    # Join all tables to get complete information
+    ORDER_INFO_QUERY = '''
+        SELECT 
+            o.order_id,
+            o.product_name,
+            o.delivery_status,
+            o.expected_date,
+            o.order_date,
+            c.name as customer_name,
+            c.email as customer_email,
+            l.tracking_id,
+            l.current_location,
+            l.last_update
+        FROM orders o
+        LEFT JOIN customers c ON o.customer_id = c.id
+        LEFT JOIN logistics l ON o.order_id = l.order_id
+    '''
+    
+    # Stay below SQLite's bound-parameter limit (999 on older builds)
+    BATCH_CHUNK_SIZE = 500
+    
+    LATEST_CHANGE_QUERY = 'SELECT MAX(version) FROM order_changes'
+    CHANGED_ORDERS_QUERY = 'SELECT order_id FROM order_changes WHERE version > ? AND version <= ?'
+    
+    def _sync_order_cache(self, cursor) -> Optional[int]:
+        """
+        Drop cached orders changed since the order cache's last sync, if that
+        was longer ago than its check interval. Returns the version to cache
+        reads under, or None if the database has no change log (the order
+        cache is bypassed in that case).
+        """
+        cache = self.order_cache
+        if self._has_change_tracking is False:
+            return None
+        if not cache.needs_sync():
+            return cache.version
+        
+        known = cache.version
+        try:
+            cursor.execute(self.LATEST_CHANGE_QUERY)
+        except sqlite3.OperationalError:
+            self._has_change_tracking = False
+            return None
+        self._has_change_tracking = True
+        latest = cursor.fetchone()[0] or 0
+        
+        changed = None
+        if known is not None and latest - known <= cache.max_size:
+            cursor.execute(self.CHANGED_ORDERS_QUERY, (known, latest))
+            rows = cursor.fetchall()
+            # Fewer rows than versions means the log was pruned past `known`
+            if len(rows) == latest - known:
+                changed = [row[0] for row in rows]
+        cache.sync(latest, changed)
+        return cache.version
+    
+    def _cached_orders(self, order_ids: List[int], orders: Dict[int, OrderInfo]) -> List[int]:
+        """Copy cached orders into `orders`; returns the IDs that were not cached"""
+        missing = []
+        for order_id in order_ids:
+            cached = self.order_cache.get(order_id)
+            if cached is not None:
+                orders[order_id] = cached
+            else:
+                missing.append(order_id)
+        return missing
+    
+    def get_order_info(self, order_id: int) -> Optional[OrderInfo]:
         """Fetch complete order information including customer and logistics data"""
+        try:
+            return self.order_flights.do(order_id, self._load_order_info, order_id)
+        except SingleFlightTimeout:
+            # Order lookups are never dropped; read it directly instead
+            return self._load_order_info(order_id)
+    
+    def _load_order_info(self, order_id: int) -> Optional[OrderInfo]:
+        # Between change log checks a hit needs no database connection
+        checked = not self.order_cache.needs_sync()
+        if checked:
+            cached = self.order_cache.get(order_id)
+            if cached is not None:
+                return cached
+        
         conn = self._get_db_connection()
         if not conn:
             return None
@@ -53,221 +202,567 @@ class LogisticsAgent:
         try:
             cursor = conn.cursor()
             
-            # Join all tables to get complete information
-            query = '''
-                SELECT 
-                    o.order_id,
-                    o.product_name,
-                    o.delivery_status,
-                    o.expected_date,
-                    o.order_date,
-                    c.name as customer_name,
-                    c.email as customer_email,
-                    l.tracking_id,
-                    l.current_location,
-                    l.last_update
-                FROM orders o
-                LEFT JOIN customers c ON o.customer_id = c.id
-                LEFT JOIN logistics l ON o.order_id = l.order_id
-                WHERE o.order_id = ?
-            '''
+            # Sync before reading the data so a concurrent change can only
+            # make the cached copy newer than its version, never older
+            version = self._sync_order_cache(cursor)
+            if version is not None and not checked:
+                cached = self.order_cache.get(order_id)
+                if cached is not None:
+                    return cached
             
-            cursor.execute(query, (order_id,))
-            result = cursor.fetchone()
+            cursor.row_factory = OrderInfo.from_row
+            with DB_QUERY_SECONDS.time('order_info'):
+                cursor.execute(self.ORDER_INFO_QUERY + ' WHERE o.order_id = ?', (order_id,))
+                order_info = cursor.fetchone()
             
-            if result:
-                return {
-                    'order_id': result['order_id'],
-                    'product_name': result['product_name'],
-                    'delivery_status': result['delivery_status'],
-                    'expected_date': result['expected_date'],
-                    'order_date': result['order_date'],
-                    'customer_name': result['customer_name'],
-                    'customer_email': result['customer_email'],
-                    'tracking_id': result['tracking_id'],
-                    'current_location': result['current_location'],
-                    'last_update': result['last_update']
-                }
+            if order_info:
+                if version is not None:
+                    self.order_cache.put(order_id, order_info, version)
+                return order_info
             else:
                 return None
                 
         except sqlite3.Error as e:
+            DB_ERRORS.inc('order_info')
             print(f"Database query error: {e}")
             return None
         finally:
-            conn.close()
+            self._release_db_connection(conn)
     
-    def get_customer_orders(self, customer_email: str = None, customer_name: str = None) -> List[Dict]:
-        """Get all orders for a specific customer"""
+    def get_orders_info(self, order_ids: List[int]) -> Dict[int, OrderInfo]:
+        """
+        Fetch complete order information for many orders at once, using one
+        IN (...) query per chunk of IDs. Returns a dict keyed by order ID;
+        IDs that don't exist are absent from the result.
+        """
+        unique_ids = list(dict.fromkeys(order_ids))
+        if not unique_ids:
+            return {}
+        
+        orders = {}
+        missing = unique_ids
+        checked = not self.order_cache.needs_sync()
+        if checked:
+            missing = self._cached_orders(unique_ids, orders)
+            if not missing:
+                return orders
+        
         conn = self._get_db_connection()
         if not conn:
-            return []
+            return orders
         
         try:
             cursor = conn.cursor()
             
-            if customer_email:
-                query = '''
-                    SELECT 
-                        o.order_id,
-                        o.product_name,
-                        o.delivery_status,
-                        o.expected_date,
-                        l.current_location
-                    FROM orders o
-                    LEFT JOIN customers c ON o.customer_id = c.id
-                    LEFT JOIN logistics l ON o.order_id = l.order_id
-                    WHERE c.email = ?
-                    ORDER BY o.order_date DESC
-                '''
-                cursor.execute(query, (customer_email,))
-            elif customer_name:
-                query = '''
-                    SELECT 
-                        o.order_id,
-                        o.product_name,
-                        o.delivery_status,
-                        o.expected_date,
-                        l.current_location
-                    FROM orders o
-                    LEFT JOIN customers c ON o.customer_id = c.id
-                    LEFT JOIN logistics l ON o.order_id = l.order_id
-                    WHERE c.name LIKE ?
-                    ORDER BY o.order_date DESC
-                '''
-                cursor.execute(query, (f'%{customer_name}%',))
-            else:
-                return []
-            
-            results = cursor.fetchall()
-            orders = []
-            for row in results:
-                orders.append({
-                    'order_id': row['order_id'],
-                    'product_name': row['product_name'],
-                    'delivery_status': row['delivery_status'],
-                    'expected_date': row['expected_date'],
-                    'current_location': row['current_location']
-                })
+            version = self._sync_order_cache(cursor)
+            if version is not None and not checked:
+                missing = self._cached_orders(missing, orders)
             
+            cursor.row_factory = OrderInfo.from_row
+            for start in range(0, len(missing), self.BATCH_CHUNK_SIZE):
+                chunk = missing[start:start + self.BATCH_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                with DB_QUERY_SECONDS.time('orders_batch'):
+                    cursor.execute(self.ORDER_INFO_QUERY + f' WHERE o.order_id IN ({placeholders})', chunk)
+                    rows = cursor.fetchall()
+                for order_info in rows:
+                    orders[order_info.order_id] = order_info
+                    if version is not None:
+                        self.order_cache.put(order_info.order_id, order_info, version)
             return orders
             
         except sqlite3.Error as e:
+            DB_ERRORS.inc('orders_batch')
             print(f"Database query error: {e}")
-            return []
+            return orders
         finally:
-            conn.close()
+            self._release_db_connection(conn)
+    
+    # Sort key of order listings, as indexed; orders without a date sort oldest
+    ORDER_DATE_KEY = "COALESCE(o.order_date, '')"
     
-    def search_orders_by_product(self, product_name: str) -> List[Dict]:
-        """Search for orders containing a specific product"""
+    # Most recent orders, the ones customers are most likely to ask about
+    RECENT_ORDERS_QUERY = ORDER_INFO_QUERY + f' ORDER BY {ORDER_DATE_KEY} DESC LIMIT ?'
+    
+    def warm_order_cache(self, limit: int = 1000) -> int:
+        """Preload the most recent orders into the order cache; returns how many were loaded"""
+        limit = min(limit, self.order_cache.max_size)
+        if limit <= 0:
+            return 0
+        
         conn = self._get_db_connection()
         if not conn:
-            return []
+            return 0
         
         try:
             cursor = conn.cursor()
+            version = self._sync_order_cache(cursor)
+            if version is None:
+                return 0
             
-            query = '''
-                SELECT 
-                    o.order_id,
-                    o.product_name,
-                    o.delivery_status,
-                    o.expected_date,
-                    l.current_location,
-                    c.name as customer_name
-                FROM orders o
-                LEFT JOIN customers c ON o.customer_id = c.id
-                LEFT JOIN logistics l ON o.order_id = l.order_id
-                WHERE o.product_name LIKE ?
-                ORDER BY o.order_date DESC
-            '''
-            
-            cursor.execute(query, (f'%{product_name}%',))
-            results = cursor.fetchall()
-            
-            orders = []
-            for row in results:
-                orders.append({
-                    'order_id': row['order_id'],
-                    'product_name': row['product_name'],
-                    'delivery_status': row['delivery_status'],
-                    'expected_date': row['expected_date'],
-                    'current_location': row['current_location'],
-                    'customer_name': row['customer_name']
-                })
-            
-            return orders
+            cursor.row_factory = OrderInfo.from_row
+            with DB_QUERY_SECONDS.time('recent_orders'):
+                cursor.execute(self.RECENT_ORDERS_QUERY, (limit,))
+                rows = cursor.fetchall()
+            for order_info in rows:
+                self.order_cache.put(order_info.order_id, order_info, version)
+            return len(rows)
+        
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('recent_orders')
+            print(f"Database query error: {e}")
+            return 0
+        finally:
+            self._release_db_connection(conn)
+    
+    # Product names of orders in an order_id range, read through the primary key
+    PRODUCT_NAMES_QUERY = '''
+        SELECT DISTINCT product_name FROM orders
+        WHERE order_id > ? AND order_id <= ?
+    '''
+    
+    def load_product_names(self, since: int = 0):
+        """
+        Return the distinct product names of orders with an ID above `since`,
+        and the highest order ID read, for incremental product index refreshes
+        """
+        conn = self._get_db_connection()
+        if not conn:
+            return [], since
+        
+        try:
+            cursor = conn.cursor()
+            with DB_QUERY_SECONDS.time('product_names'):
+                cursor.execute('SELECT MAX(order_id) FROM orders')
+                high_water = cursor.fetchone()[0] or 0
+                if high_water <= since:
+                    return [], since
+                cursor.execute(self.PRODUCT_NAMES_QUERY, (since, high_water))
+                names = [row[0] for row in cursor.fetchall()]
+            return names, high_water
+        
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('product_names')
+            print(f"Database query error: {e}")
+            return [], since
+        finally:
+            self._release_db_connection(conn)
+    
+    # Keyset pagination: orders newest first, each page starting after the
+    # (date key, order_id) of the previous page's last row. The separate
+    # bound on the date key lets SQLite seek the expression index to it.
+    ORDER_KEYSET_FILTER = f' AND {ORDER_DATE_KEY} <= ? AND ({ORDER_DATE_KEY}, o.order_id) < (?, ?)'
+    ORDER_PAGE_ORDER = f' ORDER BY {ORDER_DATE_KEY} DESC, o.order_id DESC LIMIT ?'
+    
+    CUSTOMER_ORDERS_QUERY = '''
+        SELECT 
+            o.order_id,
+            o.product_name,
+            o.delivery_status,
+            o.expected_date,
+            o.order_date,
+            l.current_location
+        FROM orders o
+        LEFT JOIN customers c ON o.customer_id = c.id
+        LEFT JOIN logistics l ON o.order_id = l.order_id
+    '''
+    CUSTOMER_EMAIL_FILTER = '''
+        WHERE c.email = ?
+    '''
+    # Substring name match through the customers_fts trigram index; filtering
+    # on o.customer_id lets each matching customer's orders come from its index
+    CUSTOMER_NAME_FILTER = '''
+        WHERE o.customer_id IN (SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?)
+    '''
+    # Names too short for trigrams, or databases without the index
+    CUSTOMER_NAME_LIKE_FILTER = '''
+        WHERE o.customer_id IN (SELECT id FROM customers WHERE name LIKE ?)
+    '''
+    # Narrows a customer's orders to one product, for chat product questions
+    CUSTOMER_PRODUCT_FILTER = ' AND o.product_name LIKE ?'
+    
+    # Chat product questions only show the orders of the customer who names
+    # the email address they ordered with
+    EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+    
+    def _page_size(self, limit: Optional[int]) -> int:
+        """Clamp a requested page size to 1..MAX_PAGE_SIZE, defaulting to SEARCH_RESULT_LIMIT"""
+        if limit is None:
+            return self.SEARCH_RESULT_LIMIT
+        return max(1, min(limit, self.MAX_PAGE_SIZE))
+    
+    def _fetch_page(self, cursor, label: str, query: str, params: tuple, page_cursor: Optional[str],
+                    limit: int, record: Type[OrderRecord]) -> Dict:
+        """
+        Run one keyset-paginated query: apply the cursor, read one row past
+        the page to learn whether another page follows, and return the page
+        as `record` objects
+        """
+        if page_cursor:
+            order_date, order_id = decode_cursor(page_cursor)
+            query += self.ORDER_KEYSET_FILTER
+            params += (order_date, order_date, order_id)
+        query += self.ORDER_PAGE_ORDER
+        params += (limit + 1,)
+        
+        cursor.row_factory = record.from_row
+        with DB_QUERY_SECONDS.time(label):
+            cursor.execute(query, params)
+            rows = cursor.fetchmany(limit + 1)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].order_date, rows[-1].order_id)
+        return {'orders': rows, 'next_cursor': next_cursor}
+    
+    def _customer_orders_page(self, conn, customer_email: str = None, customer_name: str = None,
+                              cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        db_cursor = conn.cursor()
+        
+        if customer_email:
+            query, params = self.CUSTOMER_ORDERS_QUERY + self.CUSTOMER_EMAIL_FILTER, (customer_email,)
+        elif customer_name and len(customer_name) >= 3 and self._search_index_available(db_cursor, 'customers_fts'):
+            query, params = self.CUSTOMER_ORDERS_QUERY + self.CUSTOMER_NAME_FILTER, (self._match_term(customer_name),)
+        elif customer_name:
+            query, params = self.CUSTOMER_ORDERS_QUERY + self.CUSTOMER_NAME_LIKE_FILTER, (f'%{customer_name}%',)
+        else:
+            return {'orders': [], 'next_cursor': None}
+        
+        return self._fetch_page(db_cursor, 'customer_orders', query, params, cursor,
+                                self._page_size(limit), CustomerOrder)
+    
+    def get_customer_orders_page(self, customer_email: str = None, customer_name: str = None,
+                                 cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """
+        Return one page of a customer's orders, newest first, as
+        {'orders': [...], 'next_cursor': cursor for the next page or None}.
+        Raises InvalidCursor for a malformed cursor.
+        """
+        if cursor:
+            decode_cursor(cursor)
+        
+        conn = self._get_db_connection()
+        if not conn:
+            return {'orders': [], 'next_cursor': None}
+        
+        try:
+            return self._customer_orders_page(conn, customer_email, customer_name, cursor, limit)
+        
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('customer_orders')
+            print(f"Database query error: {e}")
+            return {'orders': [], 'next_cursor': None}
+        finally:
+            self._release_db_connection(conn)
+    
+    def search_customer_orders_by_product(self, customer_email: str, product_name: str,
+                                          limit: Optional[int] = None) -> Dict:
+        """
+        Return the first page of one customer's orders whose product name
+        contains product_name, newest first, as {'orders': [...], 'next_cursor': ...}
+        """
+        conn = self._get_db_connection()
+        if not conn:
+            return {'orders': [], 'next_cursor': None}
+        
+        try:
+            query = self.CUSTOMER_ORDERS_QUERY + self.CUSTOMER_EMAIL_FILTER + self.CUSTOMER_PRODUCT_FILTER
+            return self._fetch_page(conn.cursor(), 'customer_product_orders', query,
+                                    (customer_email, f'%{product_name}%'), None,
+                                    self._page_size(limit), CustomerOrder)
+        
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('customer_product_orders')
+            print(f"Database query error: {e}")
+            return {'orders': [], 'next_cursor': None}
+        finally:
+            self._release_db_connection(conn)
+    
+    def get_customer_orders(self, customer_email: str = None, customer_name: str = None) -> List[CustomerOrder]:
+        """Get a customer's most recent orders (the first page of get_customer_orders_page)"""
+        return self.get_customer_orders_page(customer_email, customer_name)['orders']
+    
+    def _search_index_available(self, cursor, index_table: str = 'orders_fts') -> bool:
+        """Check once whether an FTS5 search index exists"""
+        if index_table not in self._search_indexes:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index_table,))
+            self._search_indexes[index_table] = cursor.fetchone() is not None
+        return self._search_indexes[index_table]
+    
+    @staticmethod
+    def _match_term(text: str) -> str:
+        """Quote a search term so FTS matches it as a literal substring"""
+        return '"' + text.replace('"', '""') + '"'
+    
+    # Matches through the orders_fts trigram index, sorted by date; best for
+    # products with few orders
+    PRODUCT_SEARCH_QUERY = '''
+        SELECT 
+            o.order_id,
+            o.product_name,
+            o.delivery_status,
+            o.expected_date,
+            o.order_date,
+            l.current_location,
+            c.name as customer_name
+        FROM orders_fts f
+        JOIN orders o ON o.order_id = f.rowid
+        LEFT JOIN customers c ON o.customer_id = c.id
+        LEFT JOIN logistics l ON o.order_id = l.order_id
+        WHERE orders_fts MATCH ?
+    '''
+    # Newest orders first through the order_date index, filtered by name; a
+    # page of a popular product is found after a few hundred rows instead of
+    # sorting every match. Also used for terms too short for trigrams and
+    # databases without the FTS index.
+    PRODUCT_SCAN_QUERY = '''
+        SELECT 
+            o.order_id,
+            o.product_name,
+            o.delivery_status,
+            o.expected_date,
+            o.order_date,
+            l.current_location,
+            c.name as customer_name
+        FROM orders o
+        LEFT JOIN customers c ON o.customer_id = c.id
+        LEFT JOIN logistics l ON o.order_id = l.order_id
+        WHERE o.product_name LIKE ?
+    '''
+    # Counts matches up to a cap, to choose between the two plans above
+    PRODUCT_MATCH_COUNT_QUERY = '''
+        SELECT count(*) FROM (SELECT 1 FROM orders_fts WHERE orders_fts MATCH ? LIMIT ?)
+    '''
+    
+    def _product_search_plan(self, cursor, product_name: str) -> str:
+        """
+        Return 'fts' or 'scan' for a search term. Sorting FTS matches costs
+        time in proportion to how many orders match, walking the date index
+        in inverse proportion; products with at least FTS_SORT_LIMIT orders
+        are walked. Decisions are cached per term.
+        """
+        plan = self._product_plans.get(product_name)
+        if plan is not None:
+            return plan
+        
+        # Trigram tokens need at least three characters to match
+        if len(product_name) < 3 or not self._search_index_available(cursor):
+            plan = 'scan'
+        else:
+            with DB_QUERY_SECONDS.time('product_match_count'):
+                cursor.execute(self.PRODUCT_MATCH_COUNT_QUERY, (self._match_term(product_name), self.FTS_SORT_LIMIT))
+                matches = cursor.fetchone()[0]
+            plan = 'scan' if matches >= self.FTS_SORT_LIMIT else 'fts'
+        
+        if len(self._product_plans) >= 1024:
+            self._product_plans.clear()
+        self._product_plans[product_name] = plan
+        return plan
+    
+    def _product_orders_page(self, conn, product_name: str, cursor: Optional[str] = None,
+                             limit: Optional[int] = None) -> Dict:
+        db_cursor = conn.cursor()
+        
+        if self._product_search_plan(db_cursor, product_name) == 'fts':
+            query, params = self.PRODUCT_SEARCH_QUERY, (self._match_term(product_name),)
+        else:
+            query, params = self.PRODUCT_SCAN_QUERY, (f'%{product_name}%',)
+        
+        return self._fetch_page(db_cursor, 'product_search', query, params, cursor,
+                                self._page_size(limit), ProductOrder)
+    
+    def search_orders_by_product_page(self, product_name: str, cursor: Optional[str] = None,
+                                      limit: Optional[int] = None) -> Dict:
+        """
+        Return one page of the orders whose product name contains
+        product_name, newest first, as {'orders': [...], 'next_cursor': cursor
+        for the next page or None}. Raises InvalidCursor for a malformed cursor.
+        """
+        if cursor:
+            decode_cursor(cursor)
+        
+        conn = self._get_db_connection()
+        if not conn:
+            return {'orders': [], 'next_cursor': None}
+        
+        try:
+            return self._product_orders_page(conn, product_name, cursor, limit)
+        
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('product_search')
+            print(f"Database query error: {e}")
+            return {'orders': [], 'next_cursor': None}
+        finally:
+            self._release_db_connection(conn)
+    
+    def search_orders_by_product(self, product_name: str, limit: int = None) -> List[ProductOrder]:
+        """Search for the most recent orders containing a specific product"""
+        return self.search_orders_by_product_page(product_name, limit=limit)['orders']
+    
+    def _iter_pages(self, fetch_page, batch_size: int) -> Iterator[List[OrderRecord]]:
+        """
+        Yield successive pages from fetch_page(conn, cursor, limit) until the
+        last one. Each page borrows a pooled connection only while it is read,
+        so a slow consumer holds neither a connection nor a read snapshot.
+        Database errors propagate, so a caller can tell a truncated export
+        from a complete one.
+        """
+        cursor = None
+        while True:
+            conn = self._get_db_connection()
+            if not conn:
+                raise sqlite3.OperationalError('No database connection available')
+            try:
+                page = fetch_page(conn, cursor, batch_size)
+            except sqlite3.Error:
+                DB_ERRORS.inc('export')
+                raise
+            finally:
+                self._release_db_connection(conn)
             
+            if page['orders']:
+                yield page['orders']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+    
+    def iter_orders_by_product(self, product_name: str, batch_size: int = None) -> Iterator[List[OrderRecord]]:
+        """Yield every order containing a product, newest first, in batches"""
+        batch_size = batch_size or self.MAX_PAGE_SIZE
+        return self._iter_pages(
+            lambda conn, cursor, limit: self._product_orders_page(conn, product_name, cursor, limit),
+            batch_size
+        )
+    
+    def iter_customer_orders(self, customer_email: str = None, customer_name: str = None,
+                             batch_size: int = None) -> Iterator[List[OrderRecord]]:
+        """Yield every order of a customer, newest first, in batches"""
+        batch_size = batch_size or self.MAX_PAGE_SIZE
+        return self._iter_pages(
+            lambda conn, cursor, limit: self._customer_orders_page(conn, customer_email, customer_name, cursor, limit),
+            batch_size
+        )
+    
+    # Carrier scans of an order, oldest first (served by the unique
+    # tracking_events index, which starts with order_id and event_time)
+    TRACKING_EVENTS_QUERY = '''
+        SELECT tracking_id, location, status, event_time, carrier
+        FROM tracking_events
+        WHERE order_id = ?
+        ORDER BY event_time, tracking_id, location
+    '''
+    
+    def get_tracking_events(self, order_id: int) -> List[TrackingEvent]:
+        """Return the tracking event history of an order"""
+        conn = self._get_db_connection()
+        if not conn:
+            return []
+        
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = TrackingEvent.from_row
+            with DB_QUERY_SECONDS.time('tracking_events'):
+                cursor.execute(self.TRACKING_EVENTS_QUERY, (order_id,))
+                return cursor.fetchall()
+        
         except sqlite3.Error as e:
+            DB_ERRORS.inc('tracking_events')
             print(f"Database query error: {e}")
             return []
         finally:
-            conn.close()
+            self._release_db_connection(conn)
+    
+    def format_order_status(self, order_info: OrderInfo) -> str:
+        """Format a user-friendly status message for one order"""
+        order_id = order_info['order_id']
+        status = order_info['delivery_status']
+        product = order_info['product_name']
+        location = order_info['current_location']
+        expected = order_info['expected_date']
+        
+        if status.lower() == 'delivered':
+            return f"Your {product} (Order #{order_id}) has been delivered!"
+        elif status.lower() == 'in transit':
+            return f"Your {product} (Order #{order_id}) is currently {status.lower()} and located at {location}. Expected delivery: {expected}."
+        elif status.lower() == 'shipped':
+            return f"Your {product} (Order #{order_id}) has been shipped and is currently at {location}. Expected delivery: {expected}."
+        elif status.lower() == 'processing':
+            return f"Your {product} (Order #{order_id}) is currently being processed. Expected delivery: {expected}."
+        else:
+            return f"Your {product} (Order #{order_id}) status: {status}. Expected delivery: {expected}."
     
-    def process_query(self, user_query: str) -> Dict:
+    def process_query(self, user_query: str, match: Optional[QueryMatch] = None) -> Dict:
         """
-        Main method to process user queries and return relevant order information
+        Main method to process user queries and return relevant order information.
+        Callers that already scanned the query can pass its QueryMatch to skip a rescan.
         """
+        if match is None:
+            match = self.matcher.match(user_query)
+        
         response = {
             'success': False,
             'message': '',
             'data': None
         }
         
-        # First try to extract order ID
-        order_id = self.extract_order_id(user_query)
+        # First try to extract order IDs
+        order_id = match.order_id
         
-        if order_id:
+        if len(match.order_ids) > 1:
+            found = self.get_orders_info(match.order_ids)
+            lines = []
+            for requested_id in match.order_ids:
+                if requested_id in found:
+                    lines.append(self.format_order_status(found[requested_id]))
+                else:
+                    lines.append(f"I couldn't find any information for order #{requested_id}.")
+            
+            response['success'] = bool(found)
+            response['data'] = [found[i] for i in match.order_ids if i in found]
+            response['message'] = '\n'.join(lines)
+        
+        elif order_id:
             order_info = self.get_order_info(order_id)
             if order_info:
                 response['success'] = True
                 response['data'] = order_info
-                
-                # Format a user-friendly message
-                status = order_info['delivery_status']
-                product = order_info['product_name']
-                location = order_info['current_location']
-                expected = order_info['expected_date']
-                
-                if status.lower() == 'delivered':
-                    response['message'] = f"Your {product} (Order #{order_id}) has been delivered!"
-                elif status.lower() == 'in transit':
-                    response['message'] = f"Your {product} (Order #{order_id}) is currently {status.lower()} and located at {location}. Expected delivery: {expected}."
-                elif status.lower() == 'shipped':
-                    response['message'] = f"Your {product} (Order #{order_id}) has been shipped and is currently at {location}. Expected delivery: {expected}."
-                elif status.lower() == 'processing':
-                    response['message'] = f"Your {product} (Order #{order_id}) is currently being processed. Expected delivery: {expected}."
-                else:
-                    response['message'] = f"Your {product} (Order #{order_id}) status: {status}. Expected delivery: {expected}."
+                response['message'] = self.format_order_status(order_info)
             else:
                 response['message'] = f"I couldn't find any information for order #{order_id}. Please check the order number and try again."
         
-        # Check if query is about a specific product
-        elif any(product in user_query.lower() for product in ['earbuds', 'headphones', 'case', 'cable', 'speaker']):
-            # Extract product name from query
-            product_keywords = {
-                'earbuds': 'Earbuds',
-                'headphones': 'Headphones', 
-                'case': 'Case',
-                'cable': 'Cable',
-                'speaker': 'Speaker'
-            }
+        # Check if query is about a specific product; a product name alone
+        # doesn't identify the customer, so only their own orders are shown
+        elif match.products:
+            product_name = match.products[0]
+            email = self.EMAIL_PATTERN.search(user_query)
+            if not email:
+                response['message'] = f"To look up your {product_name} order, please give me the order number or the email address you ordered with."
+                return response
             
-            for keyword, product_name in product_keywords.items():
-                if keyword in user_query.lower():
-                    orders = self.search_orders_by_product(product_name)
-                    if orders:
-                        response['success'] = True
-                        response['data'] = orders
-                        if len(orders) == 1:
-                            order = orders[0]
-                            response['message'] = f"Found your {order['product_name']} (Order #{order['order_id']}). Status: {order['delivery_status']}, Expected: {order['expected_date']}."
-                        else:
-                            response['message'] = f"Found {len(orders)} orders containing '{product_name}'. Here are the details:"
-                    else:
-                        response['message'] = f"I couldn't find any orders for products containing '{product_name}'."
-                    break
+            page = self.search_customer_orders_by_product(email.group(0).lower(), product_name)
+            orders = page['orders']
+            if orders:
+                response['success'] = True
+                response['data'] = orders
+                if len(orders) == 1:
+                    order = orders[0]
+                    response['message'] = f"Found your {order['product_name']} (Order #{order['order_id']}). Status: {order['delivery_status']}, Expected: {order['expected_date']}."
+                elif page['next_cursor']:
+                    response['message'] = f"Found more than {len(orders)} orders containing '{product_name}'. Here are the {len(orders)} most recent:"
+                else:
+                    response['message'] = f"Found {len(orders)} orders containing '{product_name}'. Here are the details:"
+            else:
+                response['message'] = f"I couldn't find any orders for products containing '{product_name}' under that email address."
         else:
             response['message'] = "I need more specific information to help you. Please provide an order number (e.g., 'Where is my order #123?') or mention a specific product."
         
         return response
+    
+    async def process_query_async(self, user_query: str, match: Optional[QueryMatch] = None) -> Dict:
+        """Run process_query on the bounded database executor without blocking the event loop"""
+        # Imported here so WSGI deployments don't load asyncio at startup
+        import asyncio
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.process_query, user_query, match)
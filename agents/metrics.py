@@ -0,0 +1,262 @@
+import bisect
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _ThreadSentinel:
+    """Lives in a thread's local storage; collected when the thread exits"""
+
+    __slots__ = ('__weakref__',)
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms exported in Prometheus text format.
+    Every thread records into its own shard, so the hot path takes no lock;
+    shards are merged only when the metrics are rendered. When a thread
+    exits its shard is folded into a retired total, so servers that start
+    a thread per request don't accumulate shards.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._local = threading.local()
+        # Live per-thread shards, keyed by id() of the thread's sentinel
+        self._shards: Dict[int, dict] = {}
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        """Return the calling thread's shard, creating it on first use"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            sentinel = _ThreadSentinel()
+            key = id(sentinel)
+            with self._lock:
+                self._shards[key] = shard
+            weakref.finalize(sentinel, self._retire, key)
+            self._local.sentinel = sentinel
+            self._local.shard = shard
+            return shard
+
+    def _retire(self, key: int):
+        with self._lock:
+            shard = self._shards.pop(key, None)
+            if shard:
+                _merge_into(self._retired, shard)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> 'Counter':
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> 'Histogram':
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float],
+              metric_type: str = 'gauge') -> 'CallbackMetric':
+        """Register a value read from `callback` at render time (gauge or counter)"""
+        return self._register(CallbackMetric(name, documentation, callback, metric_type))
+
+    def _register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics.append(metric)
+        return metric
+
+    def collect(self) -> dict:
+        """Merge every shard into {(metric, labelvalues): value}"""
+        with self._lock:
+            merged = {}
+            _merge_into(merged, self._retired)
+            for shard in list(self._shards.values()):
+                _merge_into(merged, shard)
+        return merged
+
+    def render(self) -> str:
+        """Return all metrics in Prometheus text exposition format"""
+        values = self.collect()
+        lines = []
+        for metric in self._metrics:
+            metric.render(lines, values)
+        return '\n'.join(lines) + '\n'
+
+
+def _merge_into(target: dict, shard: dict):
+    # list() copies the items in one step, so a shard can be read while its
+    # thread keeps adding series
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            existing = target.get(key)
+            if existing is None:
+                target[key] = list(value)
+            else:
+                for index, count in enumerate(value):
+                    existing[index] += count
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        shard = self.registry._shard()
+        key = (self, labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, lines: List[str], values: dict):
+        lines.append(f'# HELP {self.name} {self.documentation}')
+        lines.append(f'# TYPE {self.name} counter')
+        for (metric, labelvalues), value in values.items():
+            if metric is self:
+                lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {_format_number(value)}')
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'started')
+
+    def __init__(self, histogram: 'Histogram', labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+
+class Histogram:
+    """Distribution of observed values (typically seconds) in fixed buckets"""
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        shard = self.registry._shard()
+        key = (self, labelvalues)
+        # One count per bucket plus +Inf, then the running sum
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def time(self, *labelvalues) -> _Timer:
+        """Context manager that observes the elapsed time of its block"""
+        return _Timer(self, labelvalues)
+
+    def render(self, lines: List[str], values: dict):
+        lines.append(f'# HELP {self.name} {self.documentation}')
+        lines.append(f'# TYPE {self.name} histogram')
+        for (metric, labelvalues), entry in values.items():
+            if metric is not self:
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = _labels(self.labelnames, labelvalues, f'le="{_format_number(float(bound))}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            cumulative += entry[len(self.buckets)]
+            inf = _labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{inf} {cumulative}')
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_number(entry[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+
+
+class CallbackMetric:
+    """Single unlabelled value read from a callback at render time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float], metric_type: str):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self, lines: List[str], values: dict):
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Error reading metric {self.name}: {e}")
+            return
+        lines.append(f'# HELP {self.name} {self.documentation}')
+        lines.append(f'# TYPE {self.name} {self.metric_type}')
+        lines.append(f'{self.name} {_format_number(value)}')
+
+
+# Process-wide registry and the metrics recorded by the agents
+REGISTRY = MetricsRegistry()
+
+CHAT_REQUESTS = REGISTRY.counter(
+    'scsa_chat_requests_total', 'Chat messages answered, by intent, source and outcome',
+    ('intent', 'source', 'outcome')
+)
+CHAT_SECONDS = REGISTRY.histogram(
+    'scsa_chat_request_seconds', 'Time to answer a chat message, by intent', ('intent',)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    'scsa_stage_seconds', 'Time spent in each stage of answering a chat message', ('stage',)
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'scsa_db_query_seconds', 'SQLite query execution time, by Logistics Agent query', ('query',)
+)
+DB_ERRORS = REGISTRY.counter(
+    'scsa_db_errors_total', 'SQLite errors, by Logistics Agent query', ('query',)
+)
+GENERAL_ANSWERS = REGISTRY.counter(
+    'scsa_general_answers_total', 'General query answers, by how they were produced', ('outcome',)
+)
+LLM_SECONDS = REGISTRY.histogram(
+    'scsa_llm_request_seconds', 'LLM completion call time, by outcome', ('outcome',)
+)
+LLM_ERRORS = REGISTRY.counter(
+    'scsa_llm_errors_total', 'Failed LLM completion calls, by error type', ('error',)
+)
+LLM_SHED = REGISTRY.counter(
+    'scsa_llm_shed_total', 'LLM calls shed by admission control and answered with the fallback, by reason',
+    ('reason',)
+)
+COALESCED_CALLS = REGISTRY.counter(
+    'scsa_coalesced_calls_total', 'Calls answered by waiting on an identical call already in flight, by call',
+    ('call',)
+)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class OrderCache:
+    """
+    Bounded read-through cache of order lookups keyed by order ID.
+    The owner syncs it with the database's order change log (see
+    db.database_setup.create_order_change_log) before trusting a hit,
+    passing the latest change version and the orders changed since the last
+    sync; those entries are dropped, or all of them if the changes can't be
+    listed. With a `check_interval` above 0 (off by default) hits within
+    that many seconds of a sync skip the check and may be stale; writes made
+    by this process are still dropped at once through invalidate(). Entries
+    also expire after a TTL.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300, check_interval: float = 0.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+
+        # order_id -> (order_info, expires_at); ordered from least to most recently used
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        # Change version the entries are current with, and when that was checked
+        self.version = None
+        self._synced_at = float('-inf')
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def needs_sync(self) -> bool:
+        """True if the change log should be checked before trusting a hit"""
+        return time.monotonic() - self._synced_at >= self.check_interval
+
+    def sync(self, version: int, changed_ids: Optional[Iterable[int]]):
+        """
+        Catch up with change `version`, dropping the orders in `changed_ids`,
+        or every entry if it is None
+        """
+        with self._lock:
+            if self.version is None or version > self.version:
+                if changed_ids is None:
+                    self.invalidations += len(self._entries)
+                    self._entries.clear()
+                else:
+                    for order_id in changed_ids:
+                        if self._entries.pop(order_id, None) is not None:
+                            self.invalidations += 1
+                self.version = version
+            self._synced_at = time.monotonic()
+
+    def invalidate(self, order_ids: Iterable[int]):
+        """
+        Drop orders this process just changed, and check the change log
+        before the next hit so a read that raced the write isn't kept either
+        """
+        with self._lock:
+            for order_id in order_ids:
+                if self._entries.pop(order_id, None) is not None:
+                    self.invalidations += 1
+            self._synced_at = float('-inf')
+
+    def get(self, order_id: int) -> Optional[Dict]:
+        """Return the cached order info, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(order_id)
+            if entry is not None:
+                order_info, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(order_id)
+                    self.hits += 1
+                    return order_info
+                del self._entries[order_id]
+            self.misses += 1
+            return None
+
+    def put(self, order_id: int, order_info: Dict, version: int):
+        """Cache order info read after the cache was synced to `version`"""
+        with self._lock:
+            # Data read before a newer sync may predate a change it dropped
+            if self.version is None or version < self.version:
+                return
+            self._entries[order_id] = (order_info, time.monotonic() + self.ttl)
+            self._entries.move_to_end(order_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Return size, hit ratio, eviction and invalidation counts"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
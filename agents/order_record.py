@@ -0,0 +1,133 @@
+from operator import attrgetter
+from typing import Dict, Iterator, Tuple
+
+
+class OrderRecord:
+    """
+    Compact, read-only row from an order query. Subclasses list their
+    columns in SELECT order as __slots__ and are built straight from the
+    cursor (`cursor.row_factory = Record.from_row`), skipping the
+    sqlite3.Row and the per-row dict copy. Records still read like the dicts
+    they replace (`order['order_id']`, `.get()`, `dict(order)`) and are
+    serialized by agents.json_codec.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Reads every field in one C call, for to_dict and serialization;
+        # not a method, so callers pass the record: self._values(self)
+        cls._values = attrgetter(*cls.__slots__)
+
+    @classmethod
+    def from_row(cls, cursor, row: Tuple) -> 'OrderRecord':
+        """sqlite3 row factory"""
+        return cls(*row)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        return zip(self.__slots__, self._values(self))
+
+    def to_dict(self) -> Dict:
+        return dict(zip(self.__slots__, self._values(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, OrderRecord):
+            return type(other) is type(self) and other._values(other) == self._values(self)
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._values(self))
+
+    def __repr__(self):
+        fields = ', '.join(f'{key}={value!r}' for key, value in self.items())
+        return f'{type(self).__name__}({fields})'
+
+
+class OrderInfo(OrderRecord):
+    """An order with its customer and tracking details (LogisticsAgent.ORDER_INFO_QUERY)"""
+
+    __slots__ = (
+        'order_id', 'product_name', 'delivery_status', 'expected_date', 'order_date',
+        'customer_name', 'customer_email', 'tracking_id', 'current_location', 'last_update'
+    )
+
+    def __init__(self, order_id, product_name, delivery_status, expected_date, order_date,
+                 customer_name, customer_email, tracking_id, current_location, last_update):
+        self.order_id = order_id
+        self.product_name = product_name
+        self.delivery_status = delivery_status
+        self.expected_date = expected_date
+        self.order_date = order_date
+        self.customer_name = customer_name
+        self.customer_email = customer_email
+        self.tracking_id = tracking_id
+        self.current_location = current_location
+        self.last_update = last_update
+
+
+class ProductOrder(OrderRecord):
+    """A product search result (LogisticsAgent.PRODUCT_SEARCH_QUERY / PRODUCT_SCAN_QUERY)"""
+
+    __slots__ = (
+        'order_id', 'product_name', 'delivery_status', 'expected_date', 'order_date',
+        'current_location', 'customer_name'
+    )
+
+    def __init__(self, order_id, product_name, delivery_status, expected_date, order_date,
+                 current_location, customer_name):
+        self.order_id = order_id
+        self.product_name = product_name
+        self.delivery_status = delivery_status
+        self.expected_date = expected_date
+        self.order_date = order_date
+        self.current_location = current_location
+        self.customer_name = customer_name
+
+
+class CustomerOrder(OrderRecord):
+    """One of a customer's orders (LogisticsAgent.CUSTOMER_ORDERS_QUERY)"""
+
+    __slots__ = (
+        'order_id', 'product_name', 'delivery_status', 'expected_date', 'order_date',
+        'current_location'
+    )
+
+    def __init__(self, order_id, product_name, delivery_status, expected_date, order_date,
+                 current_location):
+        self.order_id = order_id
+        self.product_name = product_name
+        self.delivery_status = delivery_status
+        self.expected_date = expected_date
+        self.order_date = order_date
+        self.current_location = current_location
+
+
+class TrackingEvent(OrderRecord):
+    """One carrier scan in an order's tracking history (LogisticsAgent.TRACKING_EVENTS_QUERY)"""
+
+    __slots__ = ('tracking_id', 'location', 'status', 'event_time', 'carrier')
+
+    def __init__(self, tracking_id, location, status, event_time, carrier):
+        self.tracking_id = tracking_id
+        self.location = location
+        self.status = status
+        self.event_time = event_time
+        self.carrier = carrier
@@ -0,0 +1,27 @@
+import base64
+from typing import Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    """Raised for a page cursor that was not issued by encode_cursor"""
+
+
+def encode_cursor(order_date: Optional[str], order_id: int) -> str:
+    """
+    Opaque keyset cursor for the last order of a page. The next page starts
+    after this (order_date, order_id) position, newest first, so pages stay
+    consistent while new orders arrive and deep pages cost no more than the
+    first one. Orders without a date sort as an empty date, oldest of all.
+    """
+    raw = f"{'' if order_date is None else order_date}|{order_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Return the (order date key, order_id) position encoded in a cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        order_date, order_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return order_date, int(order_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f'Invalid page cursor: {cursor!r}') from e
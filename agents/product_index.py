@@ -0,0 +1,400 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Chat words that are never product words, so they are not fuzzy-matched
+# against the catalog ("speak" must not become "Speaker")
+SKIP_WORDS = frozenset((
+    'about', 'and', 'any', 'are', 'arrive', 'arrived', 'can', 'did', 'does', 'for',
+    'from', 'get', 'got', 'has', 'have', 'hello', 'help', 'how', 'its', 'just', 'know',
+    'like', 'need', 'not', 'now', 'please', 'still', 'tell', 'thanks', 'that', 'the',
+    'there', 'this', 'today', 'want', 'was', 'what', 'when', 'where', 'which', 'who',
+    'why', 'will', 'with', 'would', 'yet', 'you', 'your', 'order', 'orders', 'delivery',
+    'shipping', 'track', 'tracking', 'status', 'delivered', 'shipped', 'transit',
+    'package', 'parcel', 'cancel', 'cancelled', 'speak', 'talk', 'buy', 'bought',
+    'return', 'returned', 'refund', 'change', 'exchange', 'pay', 'paid', 'send', 'sent',
+    'ship', 'ships', 'receive', 'received', 'contact', 'human', 'agent', 'support'
+))
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _trigrams(word: str) -> frozenset:
+    """Character trigrams of a word, padded so its first letters count double"""
+    padded = f'$${word}$'
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ProductMatch:
+    """A catalog product a message refers to"""
+
+    __slots__ = ('name', 'term', 'score')
+
+    def __init__(self, name: str, term: str, score: float):
+        # Full catalog product name
+        self.name = name
+        # The part of the name the message mentioned, e.g. "Earbuds" in
+        # "Wireless Earbuds" for "my earbds"; searching for it finds every
+        # product sharing that mention
+        self.term = term
+        self.score = score
+
+    def __repr__(self):
+        return f'ProductMatch({self.name!r}, {self.term!r}, {self.score:.2f})'
+
+
+class _Catalog:
+    """
+    The data of a ProductIndex. A published catalog is never changed, apart
+    from its memo of resolved message words: a refresh adds to a copy and
+    publishes that, so a lookup sees either the old or the new catalog.
+    """
+
+    __slots__ = ('names', 'name_ids', 'product_words', 'words', 'word_ids', 'word_grams',
+                 'postings', 'trigrams', 'resolved', 'matches')
+
+    def __init__(self):
+        # Products, by product id
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        # Ids of the words in each product name; a handful, so a tuple
+        self.product_words: List[Tuple[int, ...]] = []
+
+        # Words, by word id
+        self.words: List[str] = []
+        self.word_ids: Dict[str, int] = {}
+        self.word_grams: List[frozenset] = []
+        self.postings: List[List[int]] = []
+
+        # Trigram -> ids of the words containing it
+        self.trigrams: Dict[str, List[int]] = {}
+        # Message word -> (word id, similarity) or None, reset when words are added
+        self.resolved: Dict[str, Optional[Tuple[int, float]]] = {}
+        # (resolved words, limit) -> ranked matches; a new catalog starts empty
+        self.matches: Dict[tuple, List['ProductMatch']] = {}
+
+    def copy(self) -> '_Catalog':
+        """
+        A copy to add products to. The inner postings and trigram lists are
+        shared; _add replaces the ones it changes instead of appending
+        """
+        other = _Catalog.__new__(_Catalog)
+        other.names = list(self.names)
+        other.name_ids = dict(self.name_ids)
+        other.product_words = list(self.product_words)
+        other.words = list(self.words)
+        other.word_ids = dict(self.word_ids)
+        other.word_grams = list(self.word_grams)
+        other.postings = list(self.postings)
+        other.trigrams = dict(self.trigrams)
+        other.resolved = self.resolved
+        other.matches = {}
+        return other
+
+
+class ProductIndex:
+    """
+    Typo-tolerant index of the product catalog. Product names are split into
+    words; a character-trigram inverted index over the distinct words finds
+    the catalog word closest to each word of a message (Dice similarity of
+    their trigram sets), and word -> product postings turn those words into
+    ranked candidate products.
+
+    The catalog comes from `loader(since)`, which returns the product names
+    of orders newer than the `since` high-water mark and the new mark, so
+    refreshes only read new orders. Once `refresh_interval` seconds have
+    passed, the next lookup starts a refresh on a background thread and
+    goes on with the current catalog; the refreshed one is swapped in when
+    it is complete. Call refresh() at startup to load the catalog before
+    the first lookup. Renamed or deleted products stay in the index until
+    the process restarts.
+    """
+
+    # Postings scanned per word; each word's postings are kept shortest
+    # name first, so this only drops the least specific candidates
+    MAX_CANDIDATES = 256
+    # Message words remembered with their closest catalog word; chat
+    # vocabulary repeats, so most words skip the trigram lookup
+    MAX_RESOLVED_WORDS = 50000
+    # Ranked results remembered by the catalog words a message resolved to;
+    # customers name the same products in many differently worded messages
+    MAX_CACHED_MATCHES = 10000
+
+    def __init__(self, loader: Optional[Callable[[int], Tuple[Iterable[str], int]]] = None,
+                 refresh_interval: float = 60.0, min_similarity: float = 0.5,
+                 min_fuzzy_length: int = 4, min_transposition_length: int = 5):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.min_similarity = min_similarity
+        self.min_fuzzy_length = min_fuzzy_length
+        self.min_transposition_length = min_transposition_length
+
+        # The current catalog, replaced as a whole by add()
+        self._catalog = _Catalog()
+
+        self._write_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._schedule_lock = threading.Lock()
+        self._high_water = 0
+        self._next_refresh = 0.0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._catalog.names)
+
+    def add(self, names: Iterable[str]) -> int:
+        """Index product names not seen before; returns how many were added"""
+        with self._write_lock:
+            current = self._catalog
+            new_names = list(dict.fromkeys(name for name in names if name and name not in current.name_ids))
+            if not new_names:
+                return 0
+            catalog = current.copy()
+            self._add(catalog, new_names)
+            # Lookups see the new products from here on
+            self._catalog = catalog
+            return len(new_names)
+
+    def _add(self, catalog: _Catalog, names: List[str]):
+        new_postings: Dict[int, List[int]] = {}
+        # Trigram lists already copied for this catalog, safe to append to
+        copied_grams = set()
+        for name in names:
+            product_id = len(catalog.names)
+            word_ids = []
+            for word in _WORD.findall(name.lower()):
+                if len(word) < 3:
+                    continue
+                word_id = catalog.word_ids.get(word)
+                if word_id is None:
+                    word_id = self._add_word(catalog, word, copied_grams)
+                if word_id not in word_ids:
+                    word_ids.append(word_id)
+            catalog.names.append(name)
+            catalog.product_words.append(tuple(word_ids))
+            for word_id in word_ids:
+                new_postings.setdefault(word_id, []).append(product_id)
+            catalog.name_ids[name] = product_id
+
+        # Postings are kept shortest name first, the most likely match for a
+        # bare word. A few new products are inserted into a copy of the
+        # list; a bulk load sorts each list once.
+        names_list = catalog.names
+        key = lambda p: (len(names_list[p]), p)
+        for word_id, product_ids in new_postings.items():
+            postings = catalog.postings[word_id]
+            if len(product_ids) * 16 < len(postings):
+                postings = list(postings)
+                for product_id in product_ids:
+                    bisect.insort(postings, product_id, key=key)
+                catalog.postings[word_id] = postings
+            else:
+                catalog.postings[word_id] = sorted(postings + product_ids, key=key)
+
+    def _add_word(self, catalog: _Catalog, word: str, copied_grams: set) -> int:
+        word_id = len(catalog.words)
+        grams = _trigrams(word)
+        catalog.words.append(word)
+        catalog.word_grams.append(grams)
+        catalog.postings.append([])
+        for gram in grams:
+            if gram not in copied_grams:
+                catalog.trigrams[gram] = list(catalog.trigrams.get(gram, ()))
+                copied_grams.add(gram)
+            catalog.trigrams[gram].append(word_id)
+        catalog.word_ids[word] = word_id
+        # A new word may be closer than what a message word resolved to
+        catalog.resolved = {}
+        return word_id
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Load products from orders added since the last refresh; returns how
+        many new products were indexed. Skipped if another thread is already
+        refreshing, or the interval has not passed and force is False.
+        """
+        if self.loader is None:
+            return 0
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            if not force and time.monotonic() < self._next_refresh:
+                return 0
+            return self._load()
+        finally:
+            self._refresh_lock.release()
+
+    def _load(self) -> int:
+        """Index products from orders added since the last load (refresh lock must be held)"""
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        names, high_water = self.loader(self._high_water)
+        added = self.add(names)
+        self._high_water = max(self._high_water, high_water)
+        self.refreshes += 1
+        return added
+
+    def _load_first(self):
+        """
+        Load the catalog in the calling thread if nothing has warmed it up,
+        e.g. under `python app.py`; concurrent first lookups wait for the one
+        load rather than matching against an empty catalog
+        """
+        with self._refresh_lock:
+            if self.refreshes:
+                return
+            try:
+                self._load()
+            except Exception as e:
+                print(f"Product index load failed: {e}")
+
+    def _refresh_in_background(self):
+        """Start a refresh on a daemon thread; only the first lookup past the interval does"""
+        with self._schedule_lock:
+            now = time.monotonic()
+            if self.loader is None or now < self._next_refresh:
+                return
+            self._next_refresh = now + self.refresh_interval
+        threading.Thread(target=self._background_refresh, name='product-index-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh(force=True)
+        except Exception as e:
+            print(f"Product index refresh failed: {e}")
+
+    def _resolve(self, catalog: _Catalog, token: str) -> Optional[Tuple[int, float]]:
+        """Return the catalog word closest to a message word and its similarity"""
+        word_id = catalog.word_ids.get(token)
+        if word_id is not None:
+            return word_id, 1.0
+        if len(token) < self.min_fuzzy_length or token.isdigit():
+            return None
+
+        grams = _trigrams(token)
+        threshold = self.min_similarity
+        # A word with Dice similarity >= t shares at least this many trigrams
+        # with the token, so it appears in the postings of all but the
+        # (needed - 1) most common ones; only those rarer postings are scanned
+        needed = max(1, math.ceil(len(grams) * threshold / (2 - threshold)))
+        postings = sorted((catalog.trigrams.get(gram, ()) for gram in grams), key=len)
+        candidates = set()
+        for word_ids in postings[:len(grams) - needed + 1]:
+            candidates.update(word_ids)
+
+        best = None
+        best_similarity = threshold
+        word_grams = catalog.word_grams
+        for candidate in candidates:
+            other = word_grams[candidate]
+            similarity = 2 * len(grams & other) / (len(grams) + len(other))
+            if similarity >= best_similarity and (
+                    best is None or similarity > best_similarity or candidate < best):
+                best = candidate
+                best_similarity = similarity
+        if best is not None:
+            return best, best_similarity
+
+        # Swapped letters break up to three trigrams, too many for short
+        # words ("calbe"), so try each adjacent swap as an exact word
+        if len(token) >= self.min_transposition_length:
+            for i in range(len(token) - 1):
+                word_id = catalog.word_ids.get(token[:i] + token[i + 1] + token[i] + token[i + 2:])
+                if word_id is not None:
+                    other = word_grams[word_id]
+                    return word_id, 2 * len(grams & other) / (len(grams) + len(other))
+        return None
+
+    def match(self, text: str, limit: int = 5) -> List[ProductMatch]:
+        """Return up to `limit` catalog products a message mentions, best first"""
+        if not self.refreshes and self.loader is not None:
+            self._load_first()
+        elif time.monotonic() >= self._next_refresh:
+            self._refresh_in_background()
+        catalog = self._catalog
+        if not catalog.names:
+            return []
+
+        cache = catalog.resolved
+        resolved = {}
+        for token in _WORD.findall(text.lower()):
+            if len(token) < 3 or token in SKIP_WORDS:
+                continue
+            if token in cache:
+                hit = cache[token]
+            else:
+                hit = self._resolve(catalog, token)
+                if len(cache) >= self.MAX_RESOLVED_WORDS:
+                    cache.clear()
+                cache[token] = hit
+            if hit is not None and resolved.get(hit[0], 0.0) < hit[1]:
+                resolved[hit[0]] = hit[1]
+        if not resolved:
+            return []
+
+        key = (tuple(sorted(resolved.items())), limit)
+        matches = catalog.matches.get(key)
+        if matches is None:
+            matches = self._rank(catalog, resolved, limit)
+            if len(catalog.matches) >= self.MAX_CACHED_MATCHES:
+                catalog.matches.clear()
+            catalog.matches[key] = matches
+        return list(matches)
+
+    def _rank(self, catalog: _Catalog, resolved: Dict[int, float], limit: int) -> List[ProductMatch]:
+        """Score the products containing the resolved words; returns the best `limit`"""
+        # Rarer words are more specific: weight by inverse document frequency
+        # and score the rarest first, so common words only add to candidates
+        # already found instead of pulling in every product that has them
+        total = len(catalog.names)
+        postings = catalog.postings
+        words = sorted(resolved, key=lambda w: len(postings[w]))
+        first = words[0]
+        weight = resolved[first] * math.log(1 + total / len(postings[first]))
+        # Postings are shortest name first, so ties keep that order below
+        scores = dict.fromkeys(postings[first][:self.MAX_CANDIDATES], weight)
+        for word_id in words[1:]:
+            word_postings = postings[word_id]
+            weight = resolved[word_id] * math.log(1 + total / len(word_postings))
+            if len(word_postings) > len(scores):
+                product_words = catalog.product_words
+                for product_id in [p for p in scores if word_id in product_words[p]]:
+                    scores[product_id] += weight
+            else:
+                for product_id in word_postings[:self.MAX_CANDIDATES]:
+                    scores[product_id] = scores.get(product_id, 0.0) + weight
+
+        names = catalog.names
+        return [
+            ProductMatch(names[product_id], self._mention(catalog, product_id, resolved), score)
+            for product_id, score in heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        ]
+
+    def _mention(self, catalog: _Catalog, product_id: int, resolved: Dict[int, float]) -> str:
+        """The span of a product name from its first to its last matched word"""
+        name = catalog.names[product_id]
+        word_ids = catalog.word_ids
+        spans = [m.span() for m in _WORD.finditer(name.lower()) if word_ids.get(m.group()) in resolved]
+        return name[spans[0][0]:spans[-1][1]]
+
+    def search_terms(self, text: str, limit: int = 5) -> List[str]:
+        """Distinct search terms for the products a message mentions, best first"""
+        terms = []
+        for match in self.match(text, limit):
+            if match.term not in terms:
+                terms.append(match.term)
+        return terms
+
+    def stats(self) -> Dict:
+        catalog = self._catalog
+        return {
+            'products': len(catalog.names),
+            'words': len(catalog.words),
+            'trigrams': len(catalog.trigrams),
+            'refreshes': self.refreshes,
+            'high_water': self._high_water
+        }
@@ -0,0 +1,172 @@
+import re
+from typing import Dict, List, Optional
+
+# Keywords that indicate order-related queries
+ORDER_KEYWORDS = (
+    'order', 'delivery', 'shipping', 'track', 'status',
+    'where', 'when', 'delivered', 'shipped', 'transit',
+    'package', 'parcel', 'tracking'
+)
+
+# Order ID patterns like "order #123", "order 123", "#123", "id 123", in priority
+# order, as (literal prefix, pattern capturing the ID that follows it). "id"
+# must be a whole word, so "paid 300" or "valid 2" are not order IDs
+ORDER_ID_PATTERNS = (
+    ('order', r'\s*#?(\d+)'),
+    ('orders', r'\s*#?(\d+)'),
+    ('#', r'(\d+)'),
+    ('id', r'(?<!\wid)\b\s*#?(\d+)')
+)
+
+# Words that tie a product mention to the customer's own order. Products are
+# only looked up when one is present, so "Do you sell laptops?" or "is it a
+# bank holiday" stay general questions instead of becoming order searches
+PRODUCT_CUES = (
+    'my', 'mine', 'our', 'ordered', 'bought', 'purchased', 'order', 'orders',
+    'arrive', 'arrived', 'arriving', 'delivered', 'shipped', 'track', 'tracking',
+    'package', 'parcel'
+)
+
+# Further IDs listed after an order ID, as in "#12, #15 and order 31" or
+# "orders 1, 2 and 3". A bare number must end the list item (end of message,
+# punctuation, another separator or "please"), so "order 5, 2 days late" and
+# "order 12 and 3 more items" are one order
+ORDER_ID_CONTINUATION = (
+    r'\s*(?:,|&|\band\b|,\s*and\b)\s*'
+    r'(?:(?:#|orders?\s*#?)(\d+)|(\d+)\b(?=\s*(?:$|[^\w\s]|(?:and|or|please|thanks?)\b)))'
+)
+
+
+class QueryMatch:
+    """Everything extracted from one message by a single scan"""
+
+    __slots__ = ('intent', 'order_ids', 'order_id', 'products')
+
+    def __init__(self, intent: str, order_ids: List[int], order_id: Optional[int], products: List[str]):
+        self.intent = intent
+        # The order IDs given with the highest-priority pattern, in order of appearance
+        self.order_ids = order_ids
+        # The ID the original extraction rules would pick (pattern priority, then position)
+        self.order_id = order_id
+        # Search terms for the catalog products mentioned, best match first
+        self.products = products
+
+
+def _trie_pattern(words, suffixes: Dict[str, str]) -> str:
+    """
+    Build a regex alternation factored by common prefixes, e.g.
+    ["track", "tracking", "transit"] -> "tra(?:ck(?:ing)?|nsit)". Each branch
+    starts with a distinct literal, so the regex engine rejects most positions
+    after one character comparison. `suffixes` maps a literal prefix to a
+    pattern that must follow it; the prefix alone only matches if it is also
+    one of `words`.
+    """
+    trie = {}
+    for word in set(words) | set(suffixes):
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        if word in suffixes:
+            node['suffix'] = suffixes[word]
+        if word in words:
+            node['end'] = True
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if len(char) == 1]
+        if 'suffix' in node:
+            branches.append(node['suffix'])
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if 'end' in node else body
+
+    return build(trie)
+
+
+class QueryMatcher:
+    """
+    Precompiled matcher that finds order IDs and intent keywords in one pass
+    over the lowercased message, using a single alternation regex instead of
+    a separate scan per keyword and pattern. Products are looked up in the
+    catalog `product_index` (see ProductIndex), only for messages without an
+    order ID that contain one of `product_cues`; mentioning one makes the
+    message order-related.
+    """
+
+    def __init__(self, order_keywords=ORDER_KEYWORDS, order_id_patterns=ORDER_ID_PATTERNS,
+                 product_index=None, product_cues=PRODUCT_CUES):
+        self.order_keywords = tuple(order_keywords)
+        self.product_index = product_index
+        self._id_rank = {f'id{rank}': rank for rank in range(len(order_id_patterns))}
+
+        suffixes = {
+            prefix: re.sub(r'\((?!\?)', f'(?P<id{rank}>', pattern, count=1)
+            for rank, (prefix, pattern) in enumerate(order_id_patterns)
+        }
+
+        # A match with an idN group is an order ID; otherwise it is a keyword
+        self._pattern = re.compile(_trie_pattern(set(self.order_keywords), suffixes))
+        self._continuation = re.compile(ORDER_ID_CONTINUATION)
+        self._product_cue = re.compile(r'\b(?:' + '|'.join(map(re.escape, product_cues)) + r')\b')
+        # Bare numbers also signal an order query; only checked when nothing else matched
+        self._number = re.compile(r'\d')
+
+    def match(self, query: str) -> QueryMatch:
+        """Scan a message once and return its intent, order IDs and products"""
+        order_ids = []
+        best_rank = None
+        best_id = None
+        order_related = False
+
+        lowered = query.lower()
+        search = self._pattern.search
+        m = search(lowered)
+        while m is not None:
+            position = m.end()
+            group = m.lastgroup
+            order_related = True
+            if group is not None:
+                found = [int(m.group(group))]
+                # Pick up the rest of a list without rescanning it
+                while True:
+                    more = self._continuation.match(lowered, position)
+                    if more is None:
+                        break
+                    found.append(int(more.group(more.lastindex)))
+                    position = more.end()
+
+                # IDs from a lower-priority pattern than one already seen are
+                # likely something else (an amount, a date), so keep only the
+                # best pattern's IDs
+                rank = self._id_rank[group]
+                if best_rank is None or rank < best_rank:
+                    best_rank = rank
+                    best_id = found[0]
+                    order_ids = []
+                if rank == best_rank:
+                    for order_id in found:
+                        if order_id not in order_ids:
+                            order_ids.append(order_id)
+
+            m = search(lowered, position)
+
+        # Order IDs take precedence over products, so skip the catalog lookup
+        if not order_ids and self.product_index is not None and self._product_cue.search(lowered):
+            products = self.product_index.search_terms(lowered)
+            order_related = order_related or bool(products)
+        else:
+            products = []
+
+        if not order_related:
+            order_related = self._number.search(lowered) is not None
+
+        return QueryMatch(
+            'order_related' if order_related else 'general',
+            order_ids,
+            best_id,
+            products
+        )
+
+
+# For callers without a product catalog: intent and order IDs only
+default_matcher = QueryMatcher()
@@ -0,0 +1,136 @@
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture for individual requests. A request is profiled
+    when it carries the configured token, or is picked by the sampling rate;
+    every other request pays only the cost of that check. Profiles are kept
+    in memory, most recent first, up to `max_profiles`.
+    """
+
+    def __init__(self, token: Optional[str] = None, sample_rate: float = 0.0, max_profiles: int = 100):
+        self.token = token or None
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+
+        # profile_id -> {'stats': marshalled pstats data, ...metadata}
+        self._profiles: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_authorized(self, token: Optional[str]) -> bool:
+        """Check a caller-supplied token against the configured one"""
+        return bool(self.token and token) and hmac.compare_digest(token, self.token)
+
+    def should_profile(self, token: Optional[str] = None) -> bool:
+        """Decide whether the current request is profiled"""
+        if token is not None and self.is_authorized(token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, label: str, func: Callable, *args, **kwargs) -> Tuple[object, str]:
+        """Call func under the profiler; returns (result, profile_id)"""
+        profile_id = uuid.uuid4().hex
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(func, *args, **kwargs), profile_id
+        finally:
+            self._save(profile_id, label, profiler, time.perf_counter() - started)
+
+    def run_stream(self, label: str, func: Callable, *args, **kwargs) -> Tuple[Iterator, str]:
+        """
+        Profile a streamed response: func returns an iterator, profiled while
+        it produces each item but not while the server sends it. Returns
+        (iterator, profile_id); the profile is stored when the iterator ends
+        or is closed.
+        """
+        profile_id = uuid.uuid4().hex
+        return self._profile_iterator(profile_id, label, func, args, kwargs), profile_id
+
+    def _profile_iterator(self, profile_id: str, label: str, func: Callable, args, kwargs) -> Iterator:
+        profiler = cProfile.Profile()
+        duration = 0.0
+        try:
+            started = time.perf_counter()
+            try:
+                iterator = iter(profiler.runcall(func, *args, **kwargs))
+            finally:
+                duration += time.perf_counter() - started
+            while True:
+                started = time.perf_counter()
+                profiler.enable()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    profiler.disable()
+                    duration += time.perf_counter() - started
+                yield item
+        finally:
+            self._save(profile_id, label, profiler, duration)
+
+    def _save(self, profile_id: str, label: str, profiler: cProfile.Profile, duration: float):
+        stats = pstats.Stats(profiler)
+        self._store(profile_id, {
+            'id': profile_id,
+            'label': label,
+            'created_at': time.time(),
+            'duration_ms': round(duration * 1000, 3),
+            # Same format as pstats.Stats.dump_stats, loadable with pstats/snakeviz
+            'stats': marshal.dumps(stats.stats)
+        })
+
+    def _store(self, profile_id: str, entry: Dict):
+        with self._lock:
+            self._profiles[profile_id] = entry
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def list_profiles(self) -> List[Dict]:
+        """Return metadata for stored profiles, newest first"""
+        with self._lock:
+            entries = list(self._profiles.values())
+        return [
+            {key: value for key, value in entry.items() if key != 'stats'}
+            for entry in reversed(entries)
+        ]
+
+    def get_pstats(self, profile_id: str) -> Optional[bytes]:
+        """Return a stored profile in pstats file format"""
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+        return entry['stats'] if entry else None
+
+    def get_report(self, profile_id: str, sort: str = 'cumulative', limit: int = 40) -> Optional[str]:
+        """Return a stored profile as a pstats text report"""
+        data = self.get_pstats(profile_id)
+        if data is None:
+            return None
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            sort = 'cumulative'
+        output = io.StringIO()
+        stats = pstats.Stats(_LoadedStats(marshal.loads(data)), stream=output)
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+class _LoadedStats:
+    """Adapter that lets pstats.Stats load raw stats data without a file"""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
@@ -0,0 +1,171 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+_APOSTROPHES = re.compile(r"['\u2019]")
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation and whitespace so equivalent questions share a key"""
+    query = _APOSTROPHES.sub('', query.lower())
+    query = _PUNCTUATION.sub(' ', query)
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache with TTL for generated answers.
+    When `persist_path` is set, entries are also written to a SQLite table so
+    a restarted process can serve them without calling the LLM again; expired
+    rows are deleted on write, at most every `prune_interval` seconds.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, persist_path: Optional[str] = None,
+                 prune_interval: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+
+        # key -> (message, expires_at); ordered from least to most recently used
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.persist_path = persist_path
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        # Prune on the first write after opening, then every prune_interval
+        self._next_prune = 0.0
+        if persist_path:
+            self._open_disk(persist_path)
+
+    def _open_disk(self, path: str):
+        """Open the persistent tier, disabling it if the file cannot be used"""
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    message TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_created ON response_cache (created_at)')
+            conn.commit()
+            self._disk = conn
+        except sqlite3.Error as e:
+            print(f"Response cache persistence disabled: {e}")
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the cached answer for a query, or None on a miss"""
+        key = normalize_query(query)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                message, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return message
+                del self._entries[key]
+
+        row = self._disk_get(key, now)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Keep the original expiry; promoting must not extend the entry's life
+        message, created_at = row
+        self._store(key, message, created_at)
+        return message
+
+    def set(self, query: str, message: str):
+        """Cache an answer for a query"""
+        key = normalize_query(query)
+        now = time.time()
+        self._store(key, message, now)
+        self._disk_set(key, message, now)
+
+    def _store(self, key: str, message: str, created_at: float):
+        with self._lock:
+            self._entries[key] = (message, created_at + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        """Return (message, created_at) for an unexpired persisted entry"""
+        if self._disk is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    'SELECT message, created_at FROM response_cache WHERE cache_key = ?', (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Response cache read error: {e}")
+            return None
+        if row is None or row[1] + self.ttl <= now:
+            return None
+        return row
+
+    def _disk_set(self, key: str, message: str, created_at: float):
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    'INSERT OR REPLACE INTO response_cache (cache_key, message, created_at) VALUES (?, ?, ?)',
+                    (key, message, created_at)
+                )
+                if created_at >= self._next_prune:
+                    self._disk.execute('DELETE FROM response_cache WHERE created_at <= ?', (created_at - self.ttl,))
+                    self._next_prune = created_at + self.prune_interval
+                self._disk.commit()
+        except sqlite3.Error as e:
+            print(f"Response cache write error: {e}")
+
+    def clear(self):
+        """Drop all cached answers, including the persistent tier"""
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute('DELETE FROM response_cache')
+                self._disk.commit()
+
+    def stats(self) -> Dict:
+        """Return hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+    def reopen(self):
+        """Reopen the persistent tier after close(), e.g. in a forked worker"""
+        if self.persist_path and self._disk is None:
+            self._open_disk(self.persist_path)
+
+    def close(self):
+        """Close the persistent tier"""
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.close()
+                self._disk = None
@@ -0,0 +1,142 @@
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+from .metrics import COALESCED_CALLS
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when a caller gave up waiting on another caller's in-flight call"""
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = False
+        self.result = None
+        self.error = None
+        self.waiters = []
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key onto one execution. The
+    first caller runs the function; callers arriving while it is in flight
+    wait for it and receive the same result, or the same exception. A waiter
+    gives up after `timeout` seconds with SingleFlightTimeout. Sync and async
+    callers share the same in-flight calls.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def _join(self, key: Hashable):
+        """Return (call, is_leader) for key, starting a new call if none is in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                COALESCED_CALLS.inc(self.name)
+                return call, False
+            call = self._calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, result=None, error: Optional[BaseException] = None):
+        if error is not None and not isinstance(error, Exception):
+            # The leader was cancelled or interrupted; waiters didn't ask for that
+            error = SingleFlightTimeout(f"{self.name} call was abandoned")
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.result = result
+            call.error = error
+            call.done = True
+            waiters, call.waiters = call.waiters, []
+        for wake in waiters:
+            wake()
+
+    def _add_waiter(self, call: _Call, wake: Callable[[], None]) -> bool:
+        """Register wake to run when call finishes; False if it already has"""
+        with self._lock:
+            if call.done:
+                return False
+            call.waiters.append(wake)
+            return True
+
+    def _timed_out(self, call: _Call, wake: Callable[[], None]):
+        with self._lock:
+            if wake in call.waiters:
+                call.waiters.remove(wake)
+            self.timeouts += 1
+        raise SingleFlightTimeout(f"Timed out waiting for in-flight {self.name} call")
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs):
+        """Call func(*args, **kwargs), or wait for the identical call already in flight"""
+        call, leader = self._join(key)
+        if leader:
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                self._finish(key, call, error=e)
+                raise
+            self._finish(key, call, result=result)
+            return result
+
+        event = threading.Event()
+        if self._add_waiter(call, event.set) and not event.wait(self.timeout):
+            self._timed_out(call, event.set)
+        return call.outcome()
+
+    async def do_async(self, key: Hashable, func: Callable, *args, **kwargs):
+        """Async variant of do; func is a coroutine function"""
+        import asyncio
+
+        call, leader = self._join(key)
+        if leader:
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as e:
+                self._finish(key, call, error=e)
+                raise
+            self._finish(key, call, result=result)
+            return result
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        def wake():
+            loop.call_soon_threadsafe(resolve)
+
+        if self._add_waiter(call, wake):
+            try:
+                await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                self._timed_out(call, wake)
+        return call.outcome()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts
+            }
@@ -1,11 +1,18 @@
-import openai
 import os
-from typing import Dict, List
-from dotenv import load_dotenv
+import sqlite3
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from .logistics_agent import LogisticsAgent
+from .history_store import ConversationHistoryStore
+from .conversation_log import ConversationLog
+from .response_cache import ResponseCache, normalize_query
+from .llm_client import LLMClient, CircuitOpenError
+from .admission import LoadShedError
+from .single_flight import SingleFlight, SingleFlightTimeout
+from .faq_index import load_faq_index
+from .query_matcher import ORDER_KEYWORDS, QueryMatch
+from .metrics import CHAT_REQUESTS, CHAT_SECONDS, DB_ERRORS, GENERAL_ANSWERS, LLM_ERRORS, LLM_SECONDS, LLM_SHED, STAGE_SECONDS
 
-# Load environment variables
-load_dotenv()
 
 class SupportAgent:
     """
@@ -13,25 +20,69 @@ class SupportAgent:
     It decides whether to handle queries internally or delegate to the Logistics Agent.
     """
     
+    # Canned answer used whenever the LLM cannot be reached
+    FALLBACK_MESSAGE = "I'm here to help! For order tracking, please provide your order number. For other questions, I'll do my best to assist you."
+    
     def __init__(self):
-        # Initialize OpenAI client
-        openai.api_key = os.getenv('SECRET_KEY')
-        if not openai.api_key:
+        # Environment is loaded once by the app entry point
+        api_key = os.getenv('SECRET_KEY')
+        if not api_key:
             print("Warning: SECRET_KEY not found in environment variables")
         
+        # Shared completion client, reused across requests; the OpenAI SDK
+        # is only imported once the first general query needs it
+        self.llm_client = LLMClient(api_key=api_key) if api_key else None
+        
         # Initialize Logistics Agent
         self.logistics_agent = LogisticsAgent()
         
-        # Keywords that indicate order-related queries
-        self.order_keywords = [
-            'order', 'delivery', 'shipping', 'track', 'status', 
-            'where', 'when', 'delivered', 'shipped', 'transit',
-            'earbuds', 'headphones', 'case', 'cable', 'speaker',
-            'package', 'parcel', 'tracking'
-        ]
+        # Keywords that indicate order-related queries, matched by the
+        # precompiled matcher shared with the Logistics Agent
+        self.order_keywords = ORDER_KEYWORDS
+        self.matcher = self.logistics_agent.matcher
+        
+        # Bounded per-session conversation context
+        self.conversation_history = ConversationHistoryStore(
+            max_messages_per_session=int(os.getenv('HISTORY_MAX_MESSAGES', 100)),
+            max_sessions=int(os.getenv('HISTORY_MAX_SESSIONS', 10000)),
+            session_ttl=float(os.getenv('HISTORY_SESSION_TTL', 3600))
+        )
+        
+        # Every message, persisted for audits and shared across workers by a
+        # background writer so /chat never waits on it; None when
+        # CONVERSATION_LOG=0, and /history then reads this worker's memory
+        self.conversation_log = None
+        if os.getenv('CONVERSATION_LOG', '1') != '0':
+            self.conversation_log = ConversationLog(
+                self.logistics_agent.db_pool,
+                max_queue=int(os.getenv('CONVERSATION_LOG_QUEUE_SIZE', 10000)),
+                batch_size=int(os.getenv('CONVERSATION_LOG_BATCH_SIZE', 500)),
+                flush_interval=float(os.getenv('CONVERSATION_LOG_FLUSH_INTERVAL', 0.2)),
+                drop_policy=os.getenv('CONVERSATION_LOG_DROP_POLICY', 'drop_new')
+            )
+        
+        # Answers to repeated general questions, optionally persisted to disk
+        self.response_cache = ResponseCache(
+            max_size=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('RESPONSE_CACHE_TTL', 3600)),
+            persist_path=os.getenv('RESPONSE_CACHE_PATH') or None
+        )
+        
+        # Identical general questions asked at the same time share one
+        # completion call, keyed like the response cache
+        self.llm_flights = SingleFlight(
+            'llm',
+            timeout=float(os.getenv('LLM_COALESCE_TIMEOUT', 20.0))
+        )
         
-        # Cache for conversation context
-        self.conversation_history = []
+        # Local FAQ answers from the business's own policy file, tried before
+        # the response cache and the API; None unless FAQ_PATH is set (and
+        # NumPy is installed). There is no default: answers are given as
+        # policy, so they must come from the real policies
+        self.faq = load_faq_index(
+            os.getenv('FAQ_PATH'),
+            min_similarity=float(os.getenv('FAQ_MIN_SIMILARITY', 0.3))
+        )
     
     def analyze_intent(self, user_query: str) -> str:
         """
@@ -39,119 +90,462 @@ class SupportAgent:
         - 'order_related': Queries about orders, delivery, tracking
         - 'general': General questions about company, policies, etc.
         """
-        query_lower = user_query.lower()
+        return self.analyze_query(user_query).intent
+    
+    def analyze_query(self, user_query: str) -> QueryMatch:
+        """
+        Scan the query once for order-related keywords, order IDs and catalog
+        products. The result is passed on to the Logistics Agent so the query
+        is not scanned again.
+        """
+        return self.matcher.match(user_query)
+    
+    def _answer_from_faq(self, user_query: str) -> Optional[Dict]:
+        """Return the local FAQ answer for a query, if one matches closely enough"""
+        if self.faq is None:
+            return None
+        message = self.faq.answer(user_query)
+        if message is None:
+            return None
+        GENERAL_ANSWERS.inc('faq')
+        return {
+            'success': True,
+            'message': message,
+            'source': 'faq'
+        }
+    
+    def _answer_order_question_from_faq(self, user_query: str, match: QueryMatch) -> Optional[Dict]:
+        """
+        Return the FAQ answer for an order-related message that names no order
+        or product: shipping-cost, delivery-time or address-change questions
+        use order keywords but are policy questions
+        """
+        if match.order_ids or match.products:
+            return None
+        return self._answer_from_faq(user_query)
+    
+    def _answer_without_llm(self, user_query: str) -> Optional[Dict]:
+        """Return an answer for a general query that needs no API call, if there is one"""
+        response = self._answer_from_faq(user_query)
+        if response is not None:
+            return response
         
-        # Check for order-related keywords
-        if any(keyword in query_lower for keyword in self.order_keywords):
-            return 'order_related'
+        if not self.llm_client:
+            GENERAL_ANSWERS.inc('no_client')
+            return {
+                'success': True,
+                'message': "I'm a customer support assistant. For order-related queries, please provide your order number. For general questions, please contact our support team.",
+                'source': 'openai'
+            }
         
-        # Check for order ID patterns
-        import re
-        if re.search(r'#?\d+', query_lower):
-            return 'order_related'
+        # Serve repeated questions without calling the API
+        cached_message = self.response_cache.get(user_query)
+        if cached_message is not None:
+            GENERAL_ANSWERS.inc('cached')
+            return {
+                'success': True,
+                'message': cached_message,
+                'source': 'openai'
+            }
         
-        return 'general'
+        return None
+    
+    def _completion_request(self, user_query: str) -> Dict:
+        """Build the chat completion arguments for a general query"""
+        # System prompt optimized for customer support
+        system_prompt = """You are a helpful customer support assistant for an e-commerce company. 
+        Keep responses brief (1-2 sentences), friendly, and professional. 
+        For order-specific questions, ask for order numbers.
+        For general questions, provide helpful information about policies, company info, etc."""
+        
+        # Use GPT-3.5-turbo for cost efficiency
+        return {
+            'model': "gpt-3.5-turbo",
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_query}
+            ],
+            'max_tokens': 100,  # Keep it short to save credits
+            'temperature': 0.7
+        }
+    
+    def _observe_llm_call(self, started: float, error: Optional[Exception] = None):
+        """Record the latency and outcome of one completion call"""
+        if error is None:
+            outcome = 'ok'
+        elif isinstance(error, CircuitOpenError):
+            outcome = 'circuit_open'
+        elif isinstance(error, LoadShedError):
+            outcome = 'shed'
+            LLM_SHED.inc(error.reason)
+        else:
+            outcome = 'error'
+            LLM_ERRORS.inc(type(error).__name__)
+        LLM_SECONDS.observe(time.perf_counter() - started, outcome)
+    
+    def _complete(self, user_query: str) -> str:
+        """Make one completion call for a general query and record its outcome"""
+        started = time.perf_counter()
+        try:
+            content = self.llm_client.complete(**self._completion_request(user_query))
+        except Exception as e:
+            self._observe_llm_call(started, e)
+            raise
+        self._observe_llm_call(started)
+        return content
+    
+    async def _complete_async(self, user_query: str) -> str:
+        """Async variant of _complete"""
+        started = time.perf_counter()
+        try:
+            content = await self.llm_client.complete_async(**self._completion_request(user_query))
+        except Exception as e:
+            self._observe_llm_call(started, e)
+            raise
+        self._observe_llm_call(started)
+        return content
     
     def handle_general_query(self, user_query: str) -> Dict:
         """
         Handle general queries using OpenAI API with minimal token usage
         """
+        response = self._answer_without_llm(user_query)
+        if response is not None:
+            return response
+        
+        # Fallback response is kept if the API fails
         response = {
-            'success': False,
-            'message': '',
+            'success': True,
+            'message': self.FALLBACK_MESSAGE,
             'source': 'openai'
         }
         
-        if not openai.api_key:
-            response['message'] = "I'm a customer support assistant. For order-related queries, please provide your order number. For general questions, please contact our support team."
-            response['success'] = True
+        try:
+            content = self.llm_flights.do(normalize_query(user_query), self._complete, user_query)
+            response['message'] = content.strip()
+            self.response_cache.set(user_query, response['message'])
+            GENERAL_ANSWERS.inc('llm')
+        except (CircuitOpenError, LoadShedError, SingleFlightTimeout):
+            # Upstream is unhealthy or saturated; answer immediately instead of waiting on it
+            GENERAL_ANSWERS.inc('fallback')
+        except Exception as e:
+            GENERAL_ANSWERS.inc('fallback')
+            print(f"OpenAI API error: {e}")
+        
+        return response
+    
+    async def handle_general_query_async(self, user_query: str) -> Dict:
+        """
+        Async variant of handle_general_query that awaits the API call
+        instead of blocking the calling thread
+        """
+        response = self._answer_without_llm(user_query)
+        if response is not None:
             return response
         
+        response = {
+            'success': True,
+            'message': self.FALLBACK_MESSAGE,
+            'source': 'openai'
+        }
+        
         try:
-            # System prompt optimized for customer support
-            system_prompt = """You are a helpful customer support assistant for an e-commerce company. 
-            Keep responses brief (1-2 sentences), friendly, and professional. 
-            For order-specific questions, ask for order numbers.
-            For general questions, provide helpful information about policies, company info, etc."""
-            
-            # Initialize OpenAI client
-            from openai import OpenAI
-            client = OpenAI(api_key=openai.api_key)
-            
-            # Use GPT-3.5-turbo for cost efficiency
-            completion = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_query}
-                ],
-                max_tokens=100,  # Keep it short to save credits
-                temperature=0.7
-            )
-            
-            response['success'] = True
-            response['message'] = completion.choices[0].message.content.strip()
-            
+            content = await self.llm_flights.do_async(normalize_query(user_query), self._complete_async, user_query)
+            response['message'] = content.strip()
+            self.response_cache.set(user_query, response['message'])
+            GENERAL_ANSWERS.inc('llm')
+        except (CircuitOpenError, LoadShedError, SingleFlightTimeout):
+            GENERAL_ANSWERS.inc('fallback')
         except Exception as e:
+            GENERAL_ANSWERS.inc('fallback')
             print(f"OpenAI API error: {e}")
-            # Fallback response if API fails
-            response['success'] = True
-            response['message'] = "I'm here to help! For order tracking, please provide your order number. For other questions, I'll do my best to assist you."
         
         return response
     
-    def process_user_query(self, user_query: str) -> Dict:
+    def stream_general_query(self, user_query: str) -> Iterator[str]:
         """
-        Main method to process user queries by determining intent and routing appropriately
+        Yield the answer to a general query in chunks as the API produces them
         """
-        # Add to conversation history
-        self.conversation_history.append({
+        response = self._answer_without_llm(user_query)
+        if response is not None:
+            yield response['message']
+            return
+        
+        parts = []
+        completed = False
+        started = time.perf_counter()
+        try:
+            for text in self.llm_client.stream(**self._completion_request(user_query)):
+                parts.append(text)
+                yield text
+            completed = True
+            self._observe_llm_call(started)
+        except (CircuitOpenError, LoadShedError) as e:
+            self._observe_llm_call(started, e)
+        except Exception as e:
+            self._observe_llm_call(started, e)
+            print(f"OpenAI API error: {e}")
+        
+        GENERAL_ANSWERS.inc('llm' if completed else 'fallback')
+        if completed and parts:
+            self.response_cache.set(user_query, ''.join(parts).strip())
+        elif not parts:
+            # Fallback response if API fails before producing any text
+            yield self.FALLBACK_MESSAGE
+    
+    async def stream_general_query_async(self, user_query: str) -> AsyncIterator[str]:
+        """Async variant of stream_general_query"""
+        response = self._answer_without_llm(user_query)
+        if response is not None:
+            yield response['message']
+            return
+        
+        parts = []
+        completed = False
+        started = time.perf_counter()
+        try:
+            async for text in self.llm_client.stream_async(**self._completion_request(user_query)):
+                parts.append(text)
+                yield text
+            completed = True
+            self._observe_llm_call(started)
+        except (CircuitOpenError, LoadShedError) as e:
+            self._observe_llm_call(started, e)
+        except Exception as e:
+            self._observe_llm_call(started, e)
+            print(f"OpenAI API error: {e}")
+        
+        GENERAL_ANSWERS.inc('llm' if completed else 'fallback')
+        if completed and parts:
+            self.response_cache.set(user_query, ''.join(parts).strip())
+        elif not parts:
+            yield self.FALLBACK_MESSAGE
+    
+    def _format_logistics_response(self, logistics_response: Dict) -> Dict:
+        """Convert a Logistics Agent result into a user-facing response"""
+        if logistics_response['success']:
+            return {
+                'message': logistics_response['message'],
+                'success': True,
+                'source': 'logistics_agent',
+                'data': logistics_response.get('data')
+            }
+        return {
+            'message': logistics_response['message'],
+            'success': True,
+            'source': 'logistics_agent'
+        }
+    
+    def _record_message(self, session_id: str, entry: Dict):
+        """Add a message to the session's in-memory history and queue it for the log"""
+        self.conversation_history.append(session_id, entry)
+        if self.conversation_log is not None:
+            self.conversation_log.append(session_id, entry)
+    
+    def _record_user_message(self, session_id: str, user_query: str):
+        """Add a user message to the session's conversation history"""
+        self._record_message(session_id, {
             'type': 'user',
             'message': user_query,
             'timestamp': self._get_timestamp()
         })
+    
+    def _record_assistant_message(self, session_id: str, response: Dict):
+        """Add an assistant response to the session's conversation history"""
+        self._record_message(session_id, {
+            'type': 'assistant',
+            'message': response['message'],
+            'timestamp': self._get_timestamp(),
+            'source': response.get('source', 'unknown')
+        })
+    
+    def _analyze_timed(self, user_query: str) -> QueryMatch:
+        """analyze_query, recorded as the intent stage"""
+        with STAGE_SECONDS.time('intent'):
+            return self.analyze_query(user_query)
+    
+    def _observe_chat(self, match: QueryMatch, response: Dict, started: float):
+        """Record the outcome and total latency of one chat message"""
+        outcome = 'success' if response.get('success') else 'failure'
+        CHAT_REQUESTS.inc(match.intent, response.get('source', 'unknown'), outcome)
+        CHAT_SECONDS.observe(time.perf_counter() - started, match.intent)
+    
+    def process_user_query(self, user_query: str, session_id: str = 'default') -> Dict:
+        """
+        Main method to process user queries by determining intent and routing appropriately
+        """
+        started = time.perf_counter()
+        self._record_user_message(session_id, user_query)
         
         # Analyze intent
-        intent = self.analyze_intent(user_query)
+        match = self._analyze_timed(user_query)
+        
+        if match.intent == 'order_related':
+            response = self._answer_order_question_from_faq(user_query, match)
+            if response is None:
+                # Delegate to Logistics Agent
+                with STAGE_SECONDS.time('logistics'):
+                    response = self._format_logistics_response(self.logistics_agent.process_query(user_query, match))
+        else:
+            # Handle general queries
+            with STAGE_SECONDS.time('general'):
+                response = self.handle_general_query(user_query)
+        
+        self._record_assistant_message(session_id, response)
+        self._observe_chat(match, response, started)
+        return response
+    
+    async def process_user_query_async(self, user_query: str, session_id: str = 'default') -> Dict:
+        """
+        Async variant of process_user_query. Database lookups run on the
+        Logistics Agent's bounded executor and the API call is awaited, so a
+        slow general query never holds up order lookups.
+        """
+        started = time.perf_counter()
+        self._record_user_message(session_id, user_query)
+        
+        match = self._analyze_timed(user_query)
+        
+        if match.intent == 'order_related':
+            response = self._answer_order_question_from_faq(user_query, match)
+            if response is None:
+                with STAGE_SECONDS.time('logistics'):
+                    logistics_response = await self.logistics_agent.process_query_async(user_query, match)
+                response = self._format_logistics_response(logistics_response)
+        else:
+            with STAGE_SECONDS.time('general'):
+                response = await self.handle_general_query_async(user_query)
+        
+        self._record_assistant_message(session_id, response)
+        self._observe_chat(match, response, started)
+        return response
+    
+    def stream_user_query(self, user_query: str, session_id: str = 'default') -> Iterator[Dict]:
+        """
+        Streaming variant of process_user_query. Yields 'delta' events with
+        answer text as it is generated, then a single 'done' event carrying
+        the complete response. Logistics and FAQ answers arrive in the 'done' event.
+        """
+        started = time.perf_counter()
+        self._record_user_message(session_id, user_query)
+        
+        match = self._analyze_timed(user_query)
         
-        if intent == 'order_related':
-            # Delegate to Logistics Agent
-            logistics_response = self.logistics_agent.process_query(user_query)
-            
-            if logistics_response['success']:
+        if match.intent == 'order_related':
+            response = self._answer_order_question_from_faq(user_query, match)
+            if response is None:
+                with STAGE_SECONDS.time('logistics'):
+                    response = self._format_logistics_response(self.logistics_agent.process_query(user_query, match))
+        else:
+            response = self._answer_from_faq(user_query)
+            if response is None:
+                parts = []
+                for text in self.stream_general_query(user_query):
+                    parts.append(text)
+                    yield {'type': 'delta', 'text': text}
                 response = {
-                    'message': logistics_response['message'],
                     'success': True,
-                    'source': 'logistics_agent',
-                    'data': logistics_response.get('data')
+                    'message': ''.join(parts).strip(),
+                    'source': 'openai'
                 }
-            else:
+        
+        self._record_assistant_message(session_id, response)
+        self._observe_chat(match, response, started)
+        yield dict(response, type='done')
+    
+    async def stream_user_query_async(self, user_query: str, session_id: str = 'default') -> AsyncIterator[Dict]:
+        """Async variant of stream_user_query"""
+        started = time.perf_counter()
+        self._record_user_message(session_id, user_query)
+        
+        match = self._analyze_timed(user_query)
+        
+        if match.intent == 'order_related':
+            response = self._answer_order_question_from_faq(user_query, match)
+            if response is None:
+                with STAGE_SECONDS.time('logistics'):
+                    logistics_response = await self.logistics_agent.process_query_async(user_query, match)
+                response = self._format_logistics_response(logistics_response)
+        else:
+            response = self._answer_from_faq(user_query)
+            if response is None:
+                parts = []
+                async for text in self.stream_general_query_async(user_query):
+                    parts.append(text)
+                    yield {'type': 'delta', 'text': text}
                 response = {
-                    'message': logistics_response['message'],
                     'success': True,
-                    'source': 'logistics_agent'
+                    'message': ''.join(parts).strip(),
+                    'source': 'openai'
                 }
-        else:
-            # Handle general queries
-            response = self.handle_general_query(user_query)
-        
-        # Add response to conversation history
-        self.conversation_history.append({
-            'type': 'assistant',
-            'message': response['message'],
-            'timestamp': self._get_timestamp(),
-            'source': response.get('source', 'unknown')
-        })
         
-        return response
+        self._record_assistant_message(session_id, response)
+        self._observe_chat(match, response, started)
+        yield dict(response, type='done')
+    
+    def get_conversation_history(self, session_id: str = 'default', cursor: int = None, limit: int = 50) -> Dict:
+        """
+        Return one page of a session's conversation history, from the
+        persistent log when it is enabled (complete across workers and
+        restarts) and from this worker's memory otherwise
+        """
+        if self.conversation_log is not None:
+            try:
+                return self.conversation_log.get_page(session_id, cursor=cursor, limit=limit)
+            except sqlite3.Error as e:
+                DB_ERRORS.inc('conversation_log')
+                print(f"Error reading conversation log, using in-memory history: {e}")
+            # In-memory message ids don't match log cursors: a later page
+            # can't be continued, and the fallback page is the last one
+            if cursor is not None:
+                return {'history': [], 'next_cursor': None}
+            page = self.conversation_history.get_page(session_id, limit=limit)
+            return {'history': page['history'], 'next_cursor': None}
+        return self.conversation_history.get_page(session_id, cursor=cursor, limit=limit)
+    
+    def clear_conversation_history(self, session_id: str = 'default'):
+        """Clear a session's conversation history (the log keeps it for audits)"""
+        self.conversation_history.clear(session_id)
+        if self.conversation_log is not None:
+            self.conversation_log.clear(session_id, self._get_timestamp())
+    
+    def warm_up(self) -> Dict:
+        """Fill caches at boot so the first requests don't all miss"""
+        orders = self.logistics_agent.warm_order_cache(int(os.getenv('WARM_ORDER_CACHE', 1000)))
+        products = self.logistics_agent.product_index.refresh(force=True)
+        return {'orders': orders, 'products': products}
+    
+    def before_fork(self):
+        """
+        Close SQLite handles opened in a pre-fork master process; forked
+        workers must open their own rather than share the parent's.
+        """
+        if self.conversation_log is not None:
+            self.conversation_log.before_fork()
+        self.logistics_agent.db_pool.reset()
+        self.response_cache.close()
+    
+    def after_fork(self):
+        """Reopen per-process resources in a forked worker"""
+        if self.conversation_log is not None:
+            self.conversation_log.after_fork()
+        self.response_cache.reopen()
     
-    def get_conversation_history(self) -> List[Dict]:
-        """Return the conversation history"""
-        return self.conversation_history
+    def close(self):
+        """Release resources held by the agents"""
+        # Write out queued messages before the database is closed
+        if self.conversation_log is not None:
+            self.conversation_log.close()
+        self.logistics_agent.close()
+        self.response_cache.close()
+        if self.llm_client:
+            self.llm_client.close()
     
-    def clear_conversation_history(self):
-        """Clear the conversation history"""
-        self.conversation_history = []
+    async def aclose(self):
+        """Release resources, including those bound to the event loop"""
+        if self.llm_client:
+            await self.llm_client.aclose()
+        self.close()
     
     def _get_timestamp(self) -> str:
         """Get current timestamp"""
@@ -175,7 +569,7 @@ How can I assist you today?"""
         return [
             "Where is my order #1?",
             "What's the status of my order #2?",
-            "When will my earbuds arrive?",
+            "When will my earbuds arrive? My email is john.doe@email.com",
             "Track my delivery",
             "Who are you?",
             "What's your return policy?"
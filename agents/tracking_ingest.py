@@ -0,0 +1,364 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .json_codec import loads
+from .metrics import DB_ERRORS, DB_QUERY_SECONDS
+
+# Statuses an event may set on orders.delivery_status, matched ignoring case
+# and with "_" or "-" for spaces ("IN_TRANSIT" -> "In Transit")
+DELIVERY_STATUSES = {
+    status.lower(): status
+    for status in ('Processing', 'Shipped', 'In Transit', 'Out for Delivery', 'Delivered')
+}
+
+
+class InvalidEvent(ValueError):
+    """A tracking event that is malformed or refers to an unknown order"""
+
+
+def _required_text(record: Dict, key: str) -> str:
+    value = record.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidEvent(f'{key} must be a non-empty string')
+    return value.strip()
+
+
+def _event_time(value) -> str:
+    """Normalize an ISO 8601 string or Unix timestamp; aware times are converted to UTC"""
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            moment = datetime.fromtimestamp(value, timezone.utc)
+        elif isinstance(value, str):
+            moment = datetime.fromisoformat(value.strip())
+        else:
+            raise InvalidEvent('timestamp must be an ISO 8601 string or a Unix timestamp')
+    except (ValueError, OverflowError, OSError) as e:
+        raise InvalidEvent(f'Invalid timestamp {value!r}') from e
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    # "YYYY-MM-DD HH:MM:SS", which sorts with the "YYYY-MM-DD HH:MM"
+    # last_update values already in logistics
+    return moment.isoformat(' ', 'seconds')
+
+
+def parse_event(record) -> Tuple:
+    """
+    Validate one carrier event, e.g. {"tracking_id": "TRK001", "location":
+    "Pune Hub", "timestamp": "2024-05-01T10:30:00Z", "status": "In Transit"}
+    with optional "order_id" and "carrier". Returns (order_id or None,
+    tracking_id, location, status or None, event_time, carrier or None).
+    """
+    if not isinstance(record, dict):
+        raise InvalidEvent('Each event must be a JSON object')
+
+    tracking_id = _required_text(record, 'tracking_id')
+    location = _required_text(record, 'location')
+    event_time = _event_time(record.get('timestamp'))
+
+    order_id = record.get('order_id')
+    if order_id is not None and (not isinstance(order_id, int) or isinstance(order_id, bool)):
+        raise InvalidEvent('order_id must be an integer')
+
+    status = record.get('status')
+    if status is not None:
+        if not isinstance(status, str):
+            raise InvalidEvent('status must be a string')
+        key = status.strip().lower().replace('_', ' ').replace('-', ' ')
+        if key not in DELIVERY_STATUSES:
+            raise InvalidEvent(f'Unknown status {status!r}')
+        status = DELIVERY_STATUSES[key]
+
+    carrier = record.get('carrier')
+    if carrier is not None and not isinstance(carrier, str):
+        raise InvalidEvent('carrier must be a string')
+
+    return order_id, tracking_id, location, status, event_time, carrier
+
+
+class TrackingEventIngestor:
+    """
+    Bulk writer for carrier tracking events. Events are validated, then
+    written `batch_size` at a time, one transaction per batch: appended to
+    the tracking_events history (replays of an event already stored are
+    ignored), and the newest event per tracking ID upserts its logistics row
+    and, when it carries a status, orders.delivery_status. An event older
+    than the shipment's current position is kept in the history but does
+    not move it back.
+
+    Writes go through one dedicated connection, one batch at a time per
+    process. Under WAL, readers on the pooled connections keep reading the
+    last committed state while a batch is written. After each commit
+    `on_commit` is called with the IDs of the orders the batch touched, so
+    the owner can drop them from its caches.
+    """
+
+    # Per-line errors included in a report; the rest are only counted
+    MAX_REPORTED_ERRORS = 20
+    # Stay below SQLite's bound-parameter limit (999 on older builds)
+    CHUNK_SIZE = 500
+
+    INSERT_EVENT_QUERY = '''
+        INSERT OR IGNORE INTO tracking_events (order_id, tracking_id, location, status, event_time, carrier)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    # Moves a shipment only forward in time
+    UPSERT_LOGISTICS_QUERY = '''
+        INSERT INTO logistics (tracking_id, order_id, current_location, last_update)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (tracking_id) DO UPDATE SET
+            current_location = excluded.current_location,
+            last_update = excluded.last_update
+        WHERE excluded.last_update > logistics.last_update
+           OR (excluded.last_update = logistics.last_update
+               AND excluded.current_location IS NOT logistics.current_location)
+    '''
+
+    # Only the event that is now the shipment's current position sets the status
+    UPDATE_STATUS_QUERY = '''
+        UPDATE orders SET delivery_status = ?
+        WHERE order_id = ? AND delivery_status IS NOT ?
+          AND (SELECT last_update FROM logistics WHERE tracking_id = ?) = ?
+    '''
+
+    def __init__(self, db_path: str, batch_size: int = 20000, busy_timeout: float = 10.0,
+                 on_commit: Optional[Callable[[Set[int]], None]] = None):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.busy_timeout = busy_timeout
+        self.on_commit = on_commit
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.events = 0
+        self.rejected = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """The writer connection, opened on first use (lock must be held)"""
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout,
+                check_same_thread=False,
+                isolation_level=None  # Transactions are begun explicitly
+            )
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+            except sqlite3.Error as e:
+                print(f"Could not enable WAL journal mode: {e}")
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA cache_size=-65536')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def ingest(self, events: Iterable[Dict]) -> Dict:
+        """Ingest event dicts; returns a report of what was stored and rejected"""
+        return self._ingest(enumerate(events, 1))
+
+    def ingest_lines(self, lines: Iterable) -> Dict:
+        """Ingest JSON Lines (str or bytes), streaming; errors name the line number"""
+        return self._ingest(self._read_lines(lines))
+
+    @staticmethod
+    def _read_lines(lines: Iterable) -> Iterator[Tuple[int, object]]:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, loads(line)
+            except ValueError as e:
+                yield number, InvalidEvent(f'Invalid JSON: {e}')
+
+    def _ingest(self, numbered: Iterable[Tuple[int, object]]) -> Dict:
+        report = {
+            'success': True,
+            'received': 0,
+            'inserted': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'logistics_updated': 0,
+            'orders_updated': 0,
+            'errors': []
+        }
+        started = time.perf_counter()
+        batch: List[Tuple[int, Tuple]] = []
+        try:
+            for number, record in numbered:
+                report['received'] += 1
+                try:
+                    if isinstance(record, InvalidEvent):
+                        raise record
+                    batch.append((number, parse_event(record)))
+                except InvalidEvent as e:
+                    self._reject(report, number, e)
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch, report)
+                    batch = []
+            if batch:
+                self._write_batch(batch, report)
+        except sqlite3.Error as e:
+            DB_ERRORS.inc('tracking_ingest')
+            print(f"Error ingesting tracking events: {e}")
+            report['success'] = False
+            report['message'] = 'Database error; batches before the failed one were saved.'
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _reject(self, report: Dict, number: int, error: Exception):
+        report['rejected'] += 1
+        self.rejected += 1
+        if len(report['errors']) < self.MAX_REPORTED_ERRORS:
+            report['errors'].append(f'Event {number}: {error}')
+
+    def _select_in(self, conn, query: str, values: List) -> Iterator[Tuple]:
+        for start in range(0, len(values), self.CHUNK_SIZE):
+            chunk = values[start:start + self.CHUNK_SIZE]
+            yield from conn.execute(query.format(','.join('?' * len(chunk))), chunk)
+
+    def _resolve_orders(self, conn, batch: List[Tuple[int, Tuple]], report: Dict) -> List[Tuple]:
+        """
+        Fill in each event's order from its tracking ID, or check the order
+        it names for a new tracking ID. Order lookups join one logistics row
+        per order, so a new tracking ID is only accepted for an order that
+        has none yet; other events that match no order are rejected.
+        """
+        tracking_orders = dict(self._select_in(
+            conn, 'SELECT tracking_id, order_id FROM logistics WHERE tracking_id IN ({})',
+            list({event[1] for _, event in batch})
+        ))
+        named = list({event[0] for _, event in batch if event[1] not in tracking_orders and event[0] is not None})
+        # Order ID -> its tracking ID, or None if it has no shipment yet
+        order_tracking = dict(self._select_in(conn, '''
+            SELECT o.order_id, l.tracking_id FROM orders o
+            LEFT JOIN logistics l ON l.order_id = o.order_id
+            WHERE o.order_id IN ({})
+        ''', named))
+
+        events = []
+        for number, event in batch:
+            order_id, tracking_id = event[0], event[1]
+            known = tracking_orders.get(tracking_id)
+            if known is not None:
+                if order_id is not None and order_id != known:
+                    self._reject(report, number, InvalidEvent(f'{tracking_id} belongs to order {known}, not {order_id}'))
+                    continue
+                order_id = known
+            elif order_id is None:
+                self._reject(report, number, InvalidEvent(f'Unknown tracking_id {tracking_id!r} and no order_id'))
+                continue
+            elif order_id not in order_tracking:
+                self._reject(report, number, InvalidEvent(f'Unknown order_id {order_id}'))
+                continue
+            elif order_tracking[order_id] not in (None, tracking_id):
+                self._reject(report, number, InvalidEvent(f'Order {order_id} is tracked as {order_tracking[order_id]}'))
+                continue
+            else:
+                # Later events in this batch for another new tracking ID are rejected
+                order_tracking[order_id] = tracking_id
+            events.append((order_id,) + event[1:])
+        return events
+
+    def _write_batch(self, batch: List[Tuple[int, Tuple]], report: Dict):
+        with self._lock, DB_QUERY_SECONDS.time('tracking_ingest'):
+            conn = self._connection()
+            # Take the write lock up front: a deferred transaction that reads
+            # first can fail to upgrade while another process is writing
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Rows go in index order, so consecutive writes hit the same
+                # B-tree pages instead of jumping around the tables
+                events = self._resolve_orders(conn, batch, report)
+                events.sort(key=itemgetter(0, 4))
+                inserted = conn.executemany(self.INSERT_EVENT_QUERY, events).rowcount
+
+                # Only the newest event per tracking ID touches its shipment;
+                # on equal times the later line wins
+                latest = {}
+                for event in events:
+                    current = latest.get(event[1])
+                    if current is None or event[4] >= current[4]:
+                        latest[event[1]] = event
+                logistics_updated = conn.executemany(self.UPSERT_LOGISTICS_QUERY, sorted(
+                    (tracking_id, order_id, location, event_time)
+                    for order_id, tracking_id, location, _, event_time, _ in latest.values()
+                )).rowcount
+                orders_updated = conn.executemany(self.UPDATE_STATUS_QUERY, sorted(
+                    ((status, order_id, status, tracking_id, event_time)
+                     for order_id, tracking_id, _, status, event_time, _ in latest.values() if status),
+                    key=itemgetter(1)
+                )).rowcount
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+        if self.on_commit is not None:
+            self.on_commit({event[0] for event in latest.values()})
+
+        report['inserted'] += inserted
+        report['duplicates'] += len(events) - inserted
+        report['logistics_updated'] += logistics_updated
+        report['orders_updated'] += orders_updated
+        self.batches += 1
+        self.events += len(events)
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'events': self.events,
+            'rejected': self.rejected,
+            'batch_size': self.batch_size
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+
+    from db.database_setup import get_database_path, migrate_database
+
+    parser = argparse.ArgumentParser(
+        description='Ingest carrier tracking events from JSON Lines files (or stdin)')
+    parser.add_argument('paths', nargs='*', help='JSONL files; reads stdin when omitted')
+    parser.add_argument('--db', help='database path (default: DATABASE_PATH or db/customer_support.db)')
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('TRACKING_INGEST_BATCH', 20000)))
+    args = parser.parse_args()
+
+    db_path = args.db or get_database_path()
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate_database(conn)
+    finally:
+        conn.close()
+
+    ingestor = TrackingEventIngestor(db_path, batch_size=args.batch_size)
+    failed = False
+    try:
+        for path in args.paths or ['-']:
+            with (open(path, 'rb') if path != '-' else sys.stdin.buffer) as f:
+                report = ingestor.ingest_lines(f)
+            print(f"{path}: {report['received']} events, {report['inserted']} stored, "
+                  f"{report['duplicates']} duplicates, {report['rejected']} rejected, "
+                  f"{report['logistics_updated']} shipments and {report['orders_updated']} order statuses "
+                  f"updated in {report['seconds']} s")
+            for error in report['errors']:
+                print(f"  {error}")
+            failed = failed or not report['success']
+    finally:
+        ingestor.close()
+    sys.exit(1 if failed else 0)
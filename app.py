@@ -1,6 +1,13 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
+import atexit
+import hmac
+import json
 import os
+import sqlite3
 import sys
+import threading
+import uuid
 from dotenv import load_dotenv
 
 # Add the current directory to Python path for imports
@@ -9,17 +16,90 @@ sys.path.append(current_dir)
 
 # Import our agents
 from agents.support_agent import SupportAgent
-from db.database_setup import create_database, get_database_path
+from agents.pagination import InvalidCursor
+from agents import json_codec
+from agents.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from agents.request_profiler import RequestProfiler
+from db.database_setup import create_database, migrate_database, get_database_path
 
 # Load environment variables
 load_dotenv()
 
+class CodecJSONProvider(DefaultJSONProvider):
+    """
+    Encode JSON responses with agents.json_codec: orjson when installed
+    (JSON_ENCODER picks another), and order records without a dict copy
+    """
+    
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps(obj)
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+app.json = CodecJSONProvider(app)
+
+# The Support Agent is built on first use, so importing the app (a serverless
+# cold start) doesn't pay for it
+_support_agent = None
+_support_agent_lock = threading.Lock()
+
+def get_support_agent():
+    """Return the shared Support Agent, creating it on the first call"""
+    global _support_agent
+    if _support_agent is None:
+        with _support_agent_lock:
+            if _support_agent is None:
+                _support_agent = SupportAgent()
+    return _support_agent
+
+def close_support_agent():
+    """Close pooled database connections, if the agent was ever created"""
+    if _support_agent is not None:
+        _support_agent.close()
+
+# Close pooled database connections on interpreter shutdown
+atexit.register(close_support_agent)
+
+# Cookie that identifies a chat session's conversation history
+SESSION_COOKIE = 'scsa_session'
+SESSION_COOKIE_MAX_AGE = 30 * 24 * 3600
+
+# Page size limits for /history
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+def resolve_session_id(cookie_value):
+    """Return (session_id, is_new), issuing a new id if the cookie is missing or malformed"""
+    if not cookie_value or len(cookie_value) != 32:
+        return uuid.uuid4().hex, True
+    return cookie_value, False
+
+# Opt-in request profiling: send PROFILE_TOKEN in this header, or set a sampling rate
+PROFILE_HEADER = 'X-Profile-Token'
+request_profiler = RequestProfiler(
+    token=os.getenv('PROFILE_TOKEN'),
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+    max_profiles=int(os.getenv('PROFILE_MAX_STORED', 100))
+)
+
+@app.before_request
+def load_session_id():
+    """Resolve the caller's session id, issuing a new one if needed"""
+    g.session_id, g.new_session = resolve_session_id(request.cookies.get(SESSION_COOKIE))
 
-# Initialize the Support Agent
-support_agent = SupportAgent()
+@app.after_request
+def save_session_id(response):
+    """Set the session cookie for newly issued session ids"""
+    if g.get('new_session'):
+        response.set_cookie(
+            SESSION_COOKIE,
+            g.session_id,
+            max_age=SESSION_COOKIE_MAX_AGE,
+            httponly=True,
+            samesite='Lax'
+        )
+    return response
 
 @app.route('/')
 def index():
@@ -40,14 +120,23 @@ def chat():
             }), 400
         
         # Process the user query through the Support Agent
-        response = support_agent.process_user_query(user_message)
+        profile_id = None
+        if request_profiler.should_profile(request.headers.get(PROFILE_HEADER)):
+            response, profile_id = request_profiler.run(
+                '/chat', get_support_agent().process_user_query, user_message, session_id=g.session_id
+            )
+        else:
+            response = get_support_agent().process_user_query(user_message, session_id=g.session_id)
         
-        return jsonify({
+        result = jsonify({
             'success': True,
             'message': response['message'],
             'source': response.get('source', 'unknown'),
             'data': response.get('data')
         })
+        if profile_id:
+            result.headers['X-Profile-Id'] = profile_id
+        return result
         
     except Exception as e:
         print(f"Error processing chat request: {e}")
@@ -56,10 +145,240 @@ def chat():
             'message': 'Sorry, I encountered an error while processing your request. Please try again.'
         }), 500
 
+def format_sse_event(event):
+    """Encode a streaming chat event as a server-sent event"""
+    payload = {key: value for key, value in event.items() if key != 'type'}
+    return f"event: {event['type']}\ndata: {json_codec.dumps(payload)}\n\n"
+
+# Sent when a streamed answer fails part way through
+STREAM_ERROR_EVENT = {
+    'type': 'error',
+    'success': False,
+    'message': 'Sorry, I encountered an error while processing your request. Please try again.'
+}
+
+# Stop proxies from buffering the event stream
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle a chat message, streaming the answer as server-sent events"""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({
+            'success': False,
+            'message': 'Please enter a message.'
+        }), 400
+    
+    session_id = g.session_id
+    
+    def generate():
+        try:
+            for event in get_support_agent().stream_user_query(user_message, session_id=session_id):
+                yield format_sse_event(event)
+        except Exception as e:
+            print(f"Error streaming chat response: {e}")
+            yield format_sse_event(STREAM_ERROR_EVENT)
+    
+    # Profiled while the answer is produced; the profile is stored when the stream ends
+    if request_profiler.should_profile(request.headers.get(PROFILE_HEADER)):
+        body, profile_id = request_profiler.run_stream('/chat/stream', generate)
+        headers = dict(SSE_HEADERS, **{'X-Profile-Id': profile_id})
+        return Response(body, mimetype='text/event-stream', headers=headers)
+    
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+# Maximum number of order IDs accepted by /orders/batch
+BATCH_MAX_ORDER_IDS = 1000
+
+@app.route('/orders/batch', methods=['POST'])
+def orders_batch():
+    """Look up many orders in one call: {"order_ids": [1, 2, 3]}"""
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids')
+    
+    if not isinstance(order_ids, list) or not order_ids:
+        return jsonify({
+            'success': False,
+            'message': 'Please provide a non-empty list of order_ids.'
+        }), 400
+    
+    if len(order_ids) > BATCH_MAX_ORDER_IDS:
+        return jsonify({
+            'success': False,
+            'message': f'A batch may contain at most {BATCH_MAX_ORDER_IDS} order IDs.'
+        }), 400
+    
+    if not all(isinstance(order_id, int) and not isinstance(order_id, bool) for order_id in order_ids):
+        return jsonify({
+            'success': False,
+            'message': 'order_ids must be integers.'
+        }), 400
+    
+    try:
+        found = get_support_agent().logistics_agent.get_orders_info(order_ids)
+        requested = list(dict.fromkeys(order_ids))
+        return jsonify({
+            'success': True,
+            'orders': [found[order_id] for order_id in requested if order_id in found],
+            'not_found': [order_id for order_id in requested if order_id not in found]
+        })
+    except Exception as e:
+        print(f"Error processing batch order lookup: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Sorry, I encountered an error while looking up these orders.'
+        }), 500
+
+def order_search_params():
+    """
+    Read the search criteria shared by /orders/search and /orders/export:
+    ?product=, or a customer's ?email= or ?name=. Returns (page function,
+    export function), or None if no criteria were given.
+    """
+    logistics_agent = get_support_agent().logistics_agent
+    product = request.args.get('product', '').strip()
+    email = request.args.get('email', '').strip()
+    name = request.args.get('name', '').strip()
+    
+    if product:
+        return (
+            lambda cursor, limit: logistics_agent.search_orders_by_product_page(product, cursor=cursor, limit=limit),
+            lambda: logistics_agent.iter_orders_by_product(product)
+        )
+    if email or name:
+        return (
+            lambda cursor, limit: logistics_agent.get_customer_orders_page(
+                customer_email=email or None, customer_name=name or None, cursor=cursor, limit=limit),
+            lambda: logistics_agent.iter_customer_orders(customer_email=email or None, customer_name=name or None)
+        )
+    return None
+
+MISSING_SEARCH_CRITERIA = {
+    'success': False,
+    'message': 'Please provide a product, email or name to search for.'
+}
+
+# Order search and export list any customer's orders, so they are enabled by
+# setting this token; callers send it in the X-Orders-Token header
+ORDER_SEARCH_TOKEN = os.getenv('ORDER_SEARCH_TOKEN')
+ORDER_SEARCH_HEADER = 'X-Orders-Token'
+
+def order_search_authorized():
+    """Check the caller sent the order search token"""
+    token = request.headers.get(ORDER_SEARCH_HEADER)
+    return bool(ORDER_SEARCH_TOKEN and token and hmac.compare_digest(token, ORDER_SEARCH_TOKEN))
+
+@app.route('/orders/search', methods=['GET'])
+def search_orders():
+    """One page of matching orders, newest first; pass next_cursor back as ?cursor= for the next page"""
+    if not order_search_authorized():
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    
+    search = order_search_params()
+    if search is None:
+        return jsonify(MISSING_SEARCH_CRITERIA), 400
+    
+    fetch_page, _ = search
+    try:
+        page = fetch_page(request.args.get('cursor') or None, request.args.get('limit', type=int))
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error searching orders: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Sorry, I encountered an error while searching orders.'
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'orders': page['orders'],
+        'next_cursor': page['next_cursor']
+    })
+
+@app.route('/orders/export', methods=['GET'])
+def export_orders():
+    """
+    Every matching order, newest first, streamed as one JSON document. Rows
+    are read and sent a page at a time, so the result set is never held in
+    memory; a failure part way through ends the document with
+    "success": false.
+    """
+    if not order_search_authorized():
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    
+    search = order_search_params()
+    if search is None:
+        return jsonify(MISSING_SEARCH_CRITERIA), 400
+    
+    _, iter_batches = search
+    
+    def generate():
+        yield '{"orders": ['
+        separator = ''
+        success = True
+        try:
+            for batch in iter_batches():
+                # Encode the page as one list and drop its brackets
+                yield separator + json_codec.dumps(batch)[1:-1]
+                separator = ','
+        except Exception as e:
+            print(f"Error exporting orders: {e}")
+            success = False
+        yield '], "success": ' + json.dumps(success) + '}'
+    
+    return Response(generate(), mimetype='application/json')
+
+# Carrier tracking event ingest is enabled by setting this token; callers
+# send it in the X-Ingest-Token header
+TRACKING_INGEST_TOKEN = os.getenv('TRACKING_INGEST_TOKEN')
+INGEST_HEADER = 'X-Ingest-Token'
+
+@app.route('/tracking/events', methods=['POST'])
+def ingest_tracking_events():
+    """
+    Bulk ingest of carrier tracking events as JSON Lines, one event per line:
+    {"tracking_id": "TRK001", "location": "Pune Hub", "timestamp":
+    "2024-05-01T10:30:00Z", "status": "In Transit"}. The body is streamed and
+    written in batches; the report counts stored, duplicate and rejected
+    events and lists the first errors.
+    """
+    token = request.headers.get(INGEST_HEADER)
+    if not (TRACKING_INGEST_TOKEN and token and hmac.compare_digest(token, TRACKING_INGEST_TOKEN)):
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    
+    ingestor = get_support_agent().logistics_agent.tracking_ingestor
+    report = ingestor.ingest_lines(iter(request.stream.readline, b''))
+    if not report['success']:
+        return jsonify(report), 500
+    if not report['received']:
+        return jsonify({'success': False, 'message': 'Please send at least one tracking event.'}), 400
+    return jsonify(report)
+
+@app.route('/orders/<int:order_id>/tracking', methods=['GET'])
+def get_order_tracking(order_id):
+    """An order's current status and its tracking event history, oldest first"""
+    logistics_agent = get_support_agent().logistics_agent
+    order_info = logistics_agent.get_order_info(order_id)
+    if order_info is None:
+        return jsonify({'success': False, 'message': f'Order #{order_id} not found.'}), 404
+    return jsonify({
+        'success': True,
+        'order': order_info,
+        'events': logistics_agent.get_tracking_events(order_id)
+    })
+
 @app.route('/greeting', methods=['GET'])
 def get_greeting():
     """Get the initial greeting message"""
     try:
+        support_agent = get_support_agent()
         greeting = support_agent.get_greeting_message()
         sample_queries = support_agent.get_sample_queries()
         
@@ -79,25 +398,31 @@ def get_greeting():
 
 @app.route('/history', methods=['GET'])
 def get_history():
-    """Get conversation history"""
+    """Get one page of conversation history, oldest first"""
     try:
-        history = support_agent.get_conversation_history()
+        cursor = request.args.get('cursor', type=int)
+        limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        
+        page = get_support_agent().get_conversation_history(g.session_id, cursor=cursor, limit=limit)
         return jsonify({
             'success': True,
-            'history': history
+            'history': page['history'],
+            'next_cursor': page['next_cursor']
         })
     except Exception as e:
         print(f"Error getting history: {e}")
         return jsonify({
             'success': False,
-            'history': []
+            'history': [],
+            'next_cursor': None
         })
 
 @app.route('/clear', methods=['POST'])
 def clear_history():
     """Clear conversation history"""
     try:
-        support_agent.clear_conversation_history()
+        get_support_agent().clear_conversation_history(g.session_id)
         return jsonify({
             'success': True,
             'message': 'Conversation history cleared.'
@@ -118,6 +443,106 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Cache and history statistics"""
+    support_agent = get_support_agent()
+    llm_client = support_agent.llm_client
+    return jsonify({
+        'order_cache': support_agent.logistics_agent.order_cache.stats(),
+        'response_cache': support_agent.response_cache.stats(),
+        'conversation_history': support_agent.conversation_history.stats(),
+        'conversation_log': support_agent.conversation_log.stats() if support_agent.conversation_log else None,
+        'faq': support_agent.faq.stats() if support_agent.faq else None,
+        'product_index': support_agent.logistics_agent.product_index.stats(),
+        'tracking_ingest': support_agent.logistics_agent.tracking_ingestor.stats(),
+        'llm_admission': llm_client.admission.stats() if llm_client else None,
+        'coalescing': {
+            'llm': support_agent.llm_flights.stats(),
+            'order_info': support_agent.logistics_agent.order_flights.stats()
+        }
+    })
+
+# Gauges and counters read from the agents' own stats when /metrics is scraped
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def llm_circuit_state():
+    llm_client = get_support_agent().llm_client
+    return CIRCUIT_STATES.get(llm_client.breaker.state, 0) if llm_client else 0
+
+def llm_admission_stat(key):
+    llm_client = get_support_agent().llm_client
+    return llm_client.admission.stats()[key] if llm_client else 0
+
+def conversation_log_stat(key):
+    conversation_log = get_support_agent().conversation_log
+    return conversation_log.stats()[key] if conversation_log else 0
+
+REGISTRY.gauge('scsa_order_cache_entries', 'Orders held in the order cache',
+               lambda: get_support_agent().logistics_agent.order_cache.stats()['size'])
+REGISTRY.gauge('scsa_order_cache_hits_total', 'Order cache hits',
+               lambda: get_support_agent().logistics_agent.order_cache.stats()['hits'], 'counter')
+REGISTRY.gauge('scsa_order_cache_misses_total', 'Order cache misses',
+               lambda: get_support_agent().logistics_agent.order_cache.stats()['misses'], 'counter')
+REGISTRY.gauge('scsa_response_cache_entries', 'Answers held in the response cache',
+               lambda: get_support_agent().response_cache.stats()['size'])
+REGISTRY.gauge('scsa_response_cache_hits_total', 'Response cache hits',
+               lambda: get_support_agent().response_cache.stats()['hits'], 'counter')
+REGISTRY.gauge('scsa_response_cache_misses_total', 'Response cache misses',
+               lambda: get_support_agent().response_cache.stats()['misses'], 'counter')
+REGISTRY.gauge('scsa_history_sessions', 'Conversation sessions held in memory',
+               lambda: get_support_agent().conversation_history.stats()['sessions'])
+REGISTRY.gauge('scsa_history_messages', 'Conversation messages held in memory',
+               lambda: get_support_agent().conversation_history.stats()['messages'])
+REGISTRY.gauge('scsa_conversation_log_queued', 'Messages waiting to be written to the conversation log',
+               lambda: conversation_log_stat('queued'))
+REGISTRY.gauge('scsa_conversation_log_dropped_total', 'Messages dropped because the conversation log queue was full',
+               lambda: conversation_log_stat('dropped'), 'counter')
+REGISTRY.gauge('scsa_conversation_log_failed_total', 'Messages lost to conversation log write errors',
+               lambda: conversation_log_stat('failed'), 'counter')
+REGISTRY.gauge('scsa_db_pool_connections', 'Open pooled SQLite connections',
+               lambda: get_support_agent().logistics_agent.db_pool.size())
+REGISTRY.gauge('scsa_llm_circuit_state', 'LLM circuit breaker state (0 closed, 1 half-open, 2 open)',
+               llm_circuit_state)
+REGISTRY.gauge('scsa_llm_in_flight', 'LLM calls currently running',
+               lambda: llm_admission_stat('in_flight'))
+REGISTRY.gauge('scsa_llm_queue_depth', 'LLM calls waiting for admission',
+               lambda: llm_admission_stat('queued'))
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List stored request profiles (requires the profile token)"""
+    if not request_profiler.is_authorized(request.headers.get(PROFILE_HEADER)):
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    return jsonify({'success': True, 'profiles': request_profiler.list_profiles()})
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Return one stored profile as a text report, or with ?format=pstats as a
+    pstats file for snakeviz, gprof2dot or pstats.Stats
+    """
+    if not request_profiler.is_authorized(request.headers.get(PROFILE_HEADER)):
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    
+    if request.args.get('format') == 'pstats':
+        data = request_profiler.get_pstats(profile_id)
+        if data is not None:
+            return Response(data, mimetype='application/octet-stream', headers={
+                'Content-Disposition': f'attachment; filename={profile_id}.pstats'
+            })
+    else:
+        report = request_profiler.get_report(profile_id, sort=request.args.get('sort', 'cumulative'))
+        if report is not None:
+            return Response(report, mimetype='text/plain')
+    
+    return jsonify({'success': False, 'message': 'Profile not found'}), 404
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
 def initialize_database():
     """Initialize the database if it doesn't exist"""
     db_path = get_database_path()
@@ -127,6 +552,12 @@ def initialize_database():
         print("Database initialized successfully!")
     else:
         print("Database already exists.")
+        # Bring older databases up to the current schema in place
+        conn = sqlite3.connect(db_path)
+        try:
+            migrate_database(conn)
+        finally:
+            conn.close()
 
 def check_environment():
     """Check if required environment variables are set"""
@@ -0,0 +1,168 @@
+"""
+ASGI entry point with a non-blocking /chat pipeline.
+
+POST /chat and POST /chat/stream are served natively on the event loop:
+order lookups run on the Logistics Agent's bounded executor and general
+queries await the async LLM client, so slow completions don't tie up a worker
+thread. Every other route is delegated to the Flask app.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import json
+from http.cookies import SimpleCookie
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import dump_cookie
+
+from agents import json_codec
+
+from app import (
+    app, get_support_agent, initialize_database, resolve_session_id, format_sse_event,
+    SESSION_COOKIE, SESSION_COOKIE_MAX_AGE, SSE_HEADERS, STREAM_ERROR_EVENT
+)
+
+flask_application = WsgiToAsgi(app)
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+def _get_cookie(scope, name: str):
+    for key, value in scope.get('headers', []):
+        if key == b'cookie':
+            cookie = SimpleCookie()
+            cookie.load(value.decode('latin-1'))
+            if name in cookie:
+                return cookie[name].value
+    return None
+
+
+async def _send_json(send, status: int, payload: dict, headers=None):
+    body = json_codec.dumps(payload).encode()
+    response_headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode())
+    ]
+    response_headers.extend(headers or [])
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _session(scope):
+    """Return (session_id, headers), with a Set-Cookie header for new sessions"""
+    session_id, new_session = resolve_session_id(_get_cookie(scope, SESSION_COOKIE))
+    headers = []
+    if new_session:
+        cookie = dump_cookie(
+            SESSION_COOKIE,
+            session_id,
+            max_age=SESSION_COOKIE_MAX_AGE,
+            httponly=True,
+            samesite='Lax'
+        )
+        headers.append((b'set-cookie', cookie.encode('latin-1')))
+    return session_id, headers
+
+
+async def chat(scope, receive, send):
+    """Async counterpart of app.chat"""
+    session_id, headers = _session(scope)
+
+    try:
+        data = json.loads(await _read_body(receive) or b'{}')
+        user_message = data.get('message', '').strip()
+
+        if not user_message:
+            await _send_json(send, 400, {
+                'success': False,
+                'message': 'Please enter a message.'
+            }, headers)
+            return
+
+        response = await get_support_agent().process_user_query_async(user_message, session_id=session_id)
+
+        await _send_json(send, 200, {
+            'success': True,
+            'message': response['message'],
+            'source': response.get('source', 'unknown'),
+            'data': response.get('data')
+        }, headers)
+
+    except Exception as e:
+        print(f"Error processing chat request: {e}")
+        await _send_json(send, 500, {
+            'success': False,
+            'message': 'Sorry, I encountered an error while processing your request. Please try again.'
+        }, headers)
+
+
+async def chat_stream(scope, receive, send):
+    """Async counterpart of app.chat_stream"""
+    session_id, headers = _session(scope)
+
+    try:
+        data = json.loads(await _read_body(receive) or b'{}')
+        user_message = data.get('message', '').strip()
+    except ValueError:
+        user_message = ''
+
+    if not user_message:
+        await _send_json(send, 400, {
+            'success': False,
+            'message': 'Please enter a message.'
+        }, headers)
+        return
+
+    headers.append((b'content-type', b'text/event-stream'))
+    headers.extend((key.lower().encode(), value.encode()) for key, value in SSE_HEADERS.items())
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+    try:
+        async for event in get_support_agent().stream_user_query_async(user_message, session_id=session_id):
+            await send({
+                'type': 'http.response.body',
+                'body': format_sse_event(event).encode(),
+                'more_body': True
+            })
+    except Exception as e:
+        print(f"Error streaming chat response: {e}")
+        await send({
+            'type': 'http.response.body',
+            'body': format_sse_event(STREAM_ERROR_EVENT).encode(),
+            'more_body': True
+        })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            initialize_database()
+            # Load the product catalog and recent orders before serving, so
+            # no request does the full catalog scan on the event loop
+            warmed = get_support_agent().warm_up()
+            print(f"Warmed caches: {warmed['orders']} recent orders, {warmed['products']} catalog products")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await get_support_agent().aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/chat':
+        await chat(scope, receive, send)
+    elif scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/chat/stream':
+        await chat_stream(scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
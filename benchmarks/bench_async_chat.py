@@ -0,0 +1,124 @@
+"""
+Load test for the async /chat pipeline (asgi.py).
+
+Starts the stub LLM API with a slow response time and the ASGI app under
+uvicorn, then measures order-lookup latency on its own and again while
+hundreds of slow general queries are in flight. LLM admission control is
+sized to admit every general query, so none is shed to the fallback answer.
+
+Usage:
+    python benchmarks/bench_async_chat.py [--llm-delay 2.0] [--general 200] [--lookups 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import uvicorn
+
+from stub_llm_server import StubLLMServer, STUB_ANSWER
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def spell(number):
+    return ''.join(chr(ord('a') + int(digit)) for digit in str(number))
+
+
+def report(label, latencies):
+    ms = [v * 1000 for v in latencies]
+    print(f"{label:<40} n={len(ms):<5} p50={percentile(ms, 50):7.2f}ms  "
+          f"p95={percentile(ms, 95):7.2f}ms  p99={percentile(ms, 99):7.2f}ms  "
+          f"mean={statistics.mean(ms):7.2f}ms")
+
+
+async def timed_post(client, message):
+    start = time.perf_counter()
+    response = await client.post('/chat', json={'message': message})
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()
+
+
+async def order_lookups(client, count):
+    latencies = []
+    for i in range(count):
+        latency, _ = await timed_post(client, f"Where is my order #{i % 4 + 1}?")
+        latencies.append(latency)
+    return latencies
+
+
+async def run(base_url, args):
+    limits = httpx.Limits(max_connections=args.general + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        report('order lookups (idle)', await order_lookups(client, args.lookups))
+
+        # Unique wording so the response cache cannot absorb the load; digits
+        # would route the query to the Logistics Agent, so spell the index in letters
+        general = [
+            asyncio.create_task(timed_post(client, f"Tell me about your company, topic {spell(i)}"))
+            for i in range(args.general)
+        ]
+        await asyncio.sleep(0.2)
+        lookups = await order_lookups(client, args.lookups)
+        results = await asyncio.gather(*general)
+
+        report(f'order lookups ({args.general} LLM calls in flight)', lookups)
+        report('general queries', [latency for latency, _ in results])
+        answered = sum(1 for _, body in results if body['message'] == STUB_ANSWER)
+        print(f"general queries answered by the LLM: {answered}/{len(results)}   "
+              f"shed or answered otherwise: {len(results) - answered}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--llm-delay', type=float, default=2.0)
+    parser.add_argument('--general', type=int, default=200)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    # The app creates and migrates its sample database here on startup
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_PATH'] = os.path.join(tmp.name, 'bench.db')
+
+    stub = StubLLMServer(delay=args.llm_delay).start()
+    os.environ['OPENAI_BASE_URL'] = stub.base_url
+    os.environ.setdefault('SECRET_KEY', 'sk-benchmark')
+    os.environ['LLM_MAX_CONNECTIONS'] = str(args.general + 10)
+    os.environ['LLM_SLOW_CALL_SECONDS'] = str(args.llm_delay * 10)
+    # The default admission limits would shed most of the general queries
+    os.environ['LLM_MAX_CONCURRENCY'] = str(args.general)
+    os.environ['LLM_QUEUE_SIZE'] = str(args.general)
+    os.environ['LLM_QUEUE_TIMEOUT'] = str(args.llm_delay * 10)
+
+    from asgi import application
+
+    server = uvicorn.Server(uvicorn.Config(application, port=args.port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        asyncio.run(run(f"http://127.0.0.1:{args.port}", args))
+    finally:
+        server.should_exit = True
+        thread.join()
+        stub.stop()
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: cost of logging chat messages, synchronous vs write-behind.
+
+Appends messages from several threads, as concurrent /chat requests would,
+and reports the per-message latency seen by the caller:
+
+    sync          INSERT and commit on a pooled connection per message
+    write-behind  ConversationLog.append, written by its background thread
+
+then the time close() takes to write what is still queued, and checks that
+every accepted message reached the table. Finally a burst into a small
+queue shows what each drop policy does under overload.
+
+Usage:
+    python benchmarks/bench_conversation_log.py [--messages 20000] [--threads 4]
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.conversation_log import DROP_POLICIES, ConversationLog
+from agents.db_pool import SQLiteConnectionPool
+from db.database_setup import create_database
+
+
+def entry(i):
+    return {
+        'type': 'user' if i % 2 == 0 else 'assistant',
+        'message': f'Where is my order #{i}? ' * 3,
+        'timestamp': '2024-05-01 10:30:00',
+        'source': None if i % 2 == 0 else 'logistics_agent'
+    }
+
+
+def run_threads(append, messages, threads):
+    """Call append(session_id, entry) `messages` times across threads; returns sorted latencies"""
+    per_thread = messages // threads
+    timings = []
+
+    def worker(n):
+        local = []
+        for i in range(per_thread):
+            started = time.perf_counter()
+            append(f'session-{n}-{i % 50}', entry(i))
+            local.append(time.perf_counter() - started)
+        timings.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sorted(timings)
+
+
+def describe(label, timings):
+    p50 = statistics.median(timings) * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"{label:<14} p50 {p50:>8.1f} us   p99 {p99:>8.1f} us   max {timings[-1] * 1e3:>7.1f} ms")
+
+
+def count_rows(pool):
+    with pool.connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM conversation_log').fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            create_database(db_path)
+        pool = SQLiteConnectionPool(db_path, max_size=args.threads)
+
+        def sync_append(session_id, message):
+            with pool.connection() as conn, conn:
+                conn.execute(ConversationLog.INSERT_QUERY, (
+                    session_id, message['type'], message['message'], message.get('source'), message['timestamp']
+                ))
+
+        print(f"{args.messages:,} messages from {args.threads} threads")
+        describe('sync', run_threads(sync_append, args.messages, args.threads))
+
+        # Room for the whole run: this part measures latency, not overload
+        log = ConversationLog(pool, max_queue=args.messages)
+        before = count_rows(pool)
+        describe('write-behind', run_threads(log.append, args.messages, args.threads))
+        started = time.perf_counter()
+        log.close()
+        stats = log.stats()
+        stored = count_rows(pool) - before
+        print(f"close() wrote the rest in {(time.perf_counter() - started) * 1e3:.1f} ms; "
+              f"{stats['written']:,} written in {stats['batches']:,} batches, {stats['dropped']} dropped, "
+              f"{stored:,} rows stored")
+
+        print()
+        print(f"Overload: {args.messages:,} messages into a 500-message queue, one 1-row batch at a time")
+        for policy in DROP_POLICIES:
+            log = ConversationLog(pool, max_queue=500, batch_size=1, flush_interval=0, drop_policy=policy)
+            timings = run_threads(log.append, args.messages, args.threads)
+            log.close()
+            stats = log.stats()
+            p99 = timings[int(len(timings) * 0.99)] * 1e6
+            print(f"{policy:<10} written {stats['written']:>7,}   dropped {stats['dropped']:>7,}   "
+                  f"append p99 {p99:>8.1f} us")
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
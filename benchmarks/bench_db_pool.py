@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: connect-per-query vs pooled order lookups.
+
+Both run the same order query against the database; the pooled run borrows
+a connection from SQLiteConnectionPool for each lookup, without
+LogisticsAgent's order cache in front of it, so only connection handling
+differs.
+
+Usage:
+    python benchmarks/bench_db_pool.py [--iterations N] [--threads T]
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.db_pool import SQLiteConnectionPool
+from db.database_setup import create_database
+
+ORDER_QUERY = '''
+    SELECT o.order_id, o.product_name, o.delivery_status, o.expected_date,
+           o.order_date, c.name, c.email, l.tracking_id, l.current_location, l.last_update
+    FROM orders o
+    LEFT JOIN customers c ON o.customer_id = c.id
+    LEFT JOIN logistics l ON o.order_id = l.order_id
+    WHERE o.order_id = ?
+'''
+
+
+def lookup_connect_per_query(db_path: str, order_id: int):
+    """Previous behaviour: open, query and close a connection for every lookup"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(ORDER_QUERY, (order_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def lookup_pooled(pool: SQLiteConnectionPool, order_id: int):
+    """Borrow a pooled connection for the lookup"""
+    with pool.connection() as conn:
+        return conn.execute(ORDER_QUERY, (order_id,)).fetchone()
+
+
+def run(label: str, lookup, iterations: int, threads: int):
+    per_thread = iterations // threads
+
+    def worker():
+        for i in range(per_thread):
+            lookup(i % 4 + 1)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = per_thread * threads
+    print(f"{label:<22} {total / elapsed:>12,.0f} lookups/s   "
+          f"{elapsed / total * 1e6:>8.1f} us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            create_database(db_path)
+
+        pool = SQLiteConnectionPool(db_path, max_size=args.threads)
+        try:
+            run('connect-per-query', lambda oid: lookup_connect_per_query(db_path, oid),
+                args.iterations, args.threads)
+            run('pooled', lambda oid: lookup_pooled(pool, oid), args.iterations, args.threads)
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
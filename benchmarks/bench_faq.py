@@ -0,0 +1,151 @@
+"""
+Benchmark: accuracy and latency of the local FAQ answer tier.
+
+Scores a labelled query set (benchmarks/faq_queries.jsonl; faq_id null for
+questions the FAQ should leave to the LLM) against an FAQ file (by default
+benchmarks/faq_sample.json, made-up sample answers, not real policy) at a range
+of similarity thresholds, then again through SupportAgent's routing at the
+chosen threshold, which is what users get: a question the matcher sends to
+the order lookup instead counts as missed. Finally times FaqIndex.answer
+per message.
+
+Usage:
+    python benchmarks/bench_faq.py [--faq benchmarks/faq_sample.json] [--threshold 0.3] [--repeat 200] [--verbose]
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from agents.faq_index import FaqIndex
+
+THRESHOLDS = (0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7)
+
+
+def load_queries(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def tally(answered_ids, labelled):
+    """Return (correct answers, wrong answers, missed, correctly left to the LLM)"""
+    correct = wrong = missed = abstained = 0
+    for answered, item in zip(answered_ids, labelled):
+        if item['faq_id'] is None:
+            if answered is not None:
+                wrong += 1
+            else:
+                abstained += 1
+        elif answered is None:
+            missed += 1
+        elif answered == item['faq_id']:
+            correct += 1
+        else:
+            wrong += 1
+    return correct, wrong, missed, abstained
+
+
+def score(matches, labelled, threshold):
+    return tally([
+        entry['id'] if entry is not None and similarity >= threshold else None
+        for entry, similarity in matches
+    ], labelled)
+
+
+def routed_answers(labelled, faq_path, threshold):
+    """
+    FAQ entry IDs SupportAgent answers each query with (None if it used the
+    order lookup or the general path), on a temporary sample database and
+    without an API key
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        os.environ['FAQ_PATH'] = faq_path
+        os.environ['FAQ_MIN_SIMILARITY'] = str(threshold)
+        os.environ['CONVERSATION_LOG'] = '0'
+        os.environ.pop('SECRET_KEY', None)
+
+        from agents.support_agent import SupportAgent
+        from db.database_setup import create_database
+
+        with contextlib.redirect_stdout(sys.stderr):
+            create_database()
+            agent = SupportAgent()
+        try:
+            ids_by_answer = {entry['answer']: entry['id'] for entry in agent.faq.entries}
+            answered = []
+            for item in labelled:
+                response = agent.process_user_query(item['query'], session_id='bench')
+                answered.append(ids_by_answer.get(response['message']) if response.get('source') == 'faq' else None)
+            return answered
+        finally:
+            agent.close()
+
+
+def report(label, counts, total, positives):
+    correct, wrong, missed, abstained = counts
+    accuracy = (correct + abstained) / total
+    precision = correct / (correct + wrong) if correct + wrong else 1.0
+    print(f"{label:>9} {accuracy:>9.1%} {precision:>10.1%} {correct / positives:>7.1%} {wrong:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--faq', default=os.path.join(ROOT, 'benchmarks', 'faq_sample.json'))
+    parser.add_argument('--queries', default=os.path.join(ROOT, 'benchmarks', 'faq_queries.jsonl'))
+    parser.add_argument('--threshold', type=float, default=float(os.getenv('FAQ_MIN_SIMILARITY', 0.3)))
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--verbose', action='store_true', help='list misclassified queries')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = FaqIndex.load(args.faq, min_similarity=args.threshold)
+    build = time.perf_counter() - start
+    labelled = load_queries(args.queries)
+    matches = [index.match(item['query']) for item in labelled]
+
+    positives = sum(1 for item in labelled if item['faq_id'] is not None)
+    stats = index.stats()
+    print(f"FAQ index: {stats['entries']} entries, {stats['questions']} questions, "
+          f"{stats['terms']} terms, loaded in {build * 1e3:.1f} ms (including the NumPy import)")
+    print(f"Queries: {len(labelled)} ({positives} answerable, {len(labelled) - positives} for the LLM)")
+    print()
+    print(f"{'threshold':>9} {'accuracy':>9} {'precision':>10} {'recall':>7} {'wrong':>6}")
+    for threshold in sorted(set(THRESHOLDS + (args.threshold,))):
+        label = f"{threshold:.2f}" + (' <-' if threshold == args.threshold else '')
+        report(label, score(matches, labelled, threshold), len(labelled), positives)
+
+    routed = routed_answers(labelled, args.faq, args.threshold)
+    print()
+    print(f"Through SupportAgent routing at {args.threshold:.2f}:")
+    report('routed', tally(routed, labelled), len(labelled), positives)
+
+    if args.verbose:
+        print()
+        for (entry, similarity), answered, item in zip(matches, routed, labelled):
+            if answered != item['faq_id']:
+                print(f"  {similarity:.2f} expected {item['faq_id']}, got {answered}: {item['query']}")
+
+    timings = []
+    for _ in range(args.repeat):
+        for item in labelled:
+            started = time.perf_counter()
+            index.answer(item['query'])
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    print()
+    print(f"answer() latency over {len(timings)} calls: "
+          f"p50 {statistics.median(timings) * 1e6:.1f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} us, "
+          f"max {timings[-1] * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
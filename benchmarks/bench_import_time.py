@@ -0,0 +1,101 @@
+"""
+Startup-time check: how long a cold `import app` takes.
+
+Imports the app in fresh interpreters under `python -X importtime`, prints
+the median wall time and the slowest modules, and fails if a module that
+should only load on first use (the OpenAI SDK and its HTTP stack, NumPy) is
+imported at startup, or if the import exceeds an optional time budget.
+
+Usage:
+    python benchmarks/bench_import_time.py [--module app] [--runs 5] [--top 15] [--budget-ms 400]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Loaded lazily (the SDK on the first general query, NumPy with the FAQ
+# index when the Support Agent is created); never at import time
+LAZY_MODULES = ('openai', 'httpx', 'httpcore', 'pydantic', 'anyio', 'numpy')
+
+
+def import_once(module, env):
+    """Import module in a fresh interpreter; returns (wall seconds, importtime rows)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"import {module} failed")
+    return elapsed, parse_importtime(result.stderr)
+
+
+def parse_importtime(output):
+    """Parse -X importtime lines into (name, self_us, cumulative_us, depth)"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header row
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='fail if the median import takes longer than this')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the import away from the real database
+        env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, 'import.db'))
+
+        baseline = statistics.median(import_once('sys', env)[0] for _ in range(args.runs))
+        runs = [import_once(args.module, env) for _ in range(args.runs)]
+
+    walls = [elapsed for elapsed, _ in runs]
+    median = statistics.median(walls)
+    rows = runs[walls.index(median)][1] if median in walls else runs[0][1]
+    total = sum(cumulative for _, _, cumulative, depth in rows if depth == 1)
+
+    print(f"import {args.module}: median {median * 1e3:.1f} ms wall over {args.runs} runs "
+          f"({(median - baseline) * 1e3:.1f} ms above a bare interpreter)")
+    print(f"importtime total:  {total / 1e3:.1f} ms across {len(rows)} modules")
+    print()
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, own, cumulative, depth in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative / 1e3:>14.1f} {own / 1e3:>9.1f}  {'  ' * (depth - 1)}{name}")
+
+    failures = []
+    eager = sorted({name.split('.')[0] for name, _, _, _ in rows} & set(LAZY_MODULES))
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if args.budget_ms is not None and (median - baseline) * 1e3 > args.budget_ms:
+        failures.append(f"import took {(median - baseline) * 1e3:.1f} ms, budget {args.budget_ms:.0f} ms")
+
+    print()
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        sys.exit(1)
+    print("ok   no lazily-loaded modules imported at startup")
+
+
+if __name__ == '__main__':
+    main()
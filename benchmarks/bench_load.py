@@ -0,0 +1,251 @@
+"""
+End-to-end load and latency benchmark for the web app.
+
+Builds a scaled synthetic database, starts the stub LLM API and the app as
+subprocesses under one of several servers:
+
+    dev       python app.py, the Flask debug server (reloader and debugger)
+    flask     Flask's threaded server without debug mode
+    asgi      the ASGI entry point under uvicorn
+    gunicorn  the production configuration (gunicorn.conf.py)
+
+It then drives /chat, /greeting and /history with a weighted mix of order,
+product and general queries at a fixed concurrency and, optionally, a fixed
+request rate. Reports throughput and p50/p95/p99 latency per route and per
+response source as JSON, so results can be compared between commits.
+
+Usage:
+    python benchmarks/bench_load.py [--server dev|flask|asgi|gunicorn] [--workers N]
+        [--orders 100000] [--concurrency 32] [--rps 0] [--duration 20]
+        [--mix order=50,product=15,general=15,greeting=10,history=10]
+        [--output results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from db.database_setup import generate_dataset
+
+PRODUCT_QUERIES = [
+    'When will my earbuds arrive?', 'Where are my headphones?', 'Status of my phone case',
+    'Has my cable shipped?', 'Track my speaker'
+]
+GENERAL_QUERIES = [
+    'Who are you?', "What's your return policy?", 'How can I contact support?',
+    'Do you offer gift wrapping?', 'What payment methods do you accept?',
+    'Can I change my email address?', 'Do you have a loyalty program?'
+]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_servers(args, db_path):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_PATH': db_path,
+        'SECRET_KEY': env.get('SECRET_KEY') or 'sk-benchmark',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{args.stub_port}/v1',
+        'LLM_MAX_CONNECTIONS': str(max(20, args.concurrency)),
+        'PYTHONUNBUFFERED': '1'
+    })
+
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'stub_llm_server.py'),
+         '--port', str(args.stub_port), '--delay', str(args.llm_delay)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL
+    )
+
+    if args.server == 'dev':
+        env['PORT'] = str(args.port)
+        command = [sys.executable, 'app.py']
+    elif args.server == 'gunicorn':
+        if args.workers:
+            env['WEB_CONCURRENCY'] = str(args.workers)
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                   '--bind', f'127.0.0.1:{args.port}', '--access-logfile', '/dev/null']
+    elif args.server == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application',
+                   '--port', str(args.port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-c',
+                   'import app; app.initialize_database(); '
+                   f'app.app.run(host="127.0.0.1", port={args.port}, threaded=True)']
+    # Own process group, so reloader children and forked workers are stopped too
+    server = subprocess.Popen(command, cwd=ROOT, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    wait_for(f'http://127.0.0.1:{args.port}/health')
+    return stub, server
+
+
+def next_request(rng, mix, orders):
+    """Pick (route, kind, method, path, body) according to the mix weights"""
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    if kind == 'order':
+        return '/chat', kind, 'POST', '/chat', {'message': f'Where is my order #{rng.randint(1, orders)}?'}
+    if kind == 'product':
+        return '/chat', kind, 'POST', '/chat', {'message': rng.choice(PRODUCT_QUERIES)}
+    if kind == 'general':
+        return '/chat', kind, 'POST', '/chat', {'message': rng.choice(GENERAL_QUERIES)}
+    if kind == 'greeting':
+        return '/greeting', kind, 'GET', '/greeting', None
+    return '/history', kind, 'GET', '/history?limit=20', None
+
+
+async def drive(args, mix):
+    base_url = f'http://127.0.0.1:{args.port}'
+    records = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    issued = 0
+
+    async def worker(worker_id):
+        nonlocal issued
+        rng = random.Random(worker_id)
+        # One client per worker keeps a stable session cookie, like a real user
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            while True:
+                if args.rps:
+                    # Open-loop pacing: request i is due at start + i / rps
+                    due = start + issued / args.rps
+                    issued += 1
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if time.perf_counter() >= deadline:
+                    return
+                route, kind, method, path, body = next_request(rng, mix, args.orders)
+                sent = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code < 400
+                    source = response.json().get('source') if route == '/chat' and ok else None
+                except (httpx.HTTPError, ValueError):
+                    ok, source = False, None
+                records.append((route, kind, source, time.perf_counter() - sent, ok))
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return records, time.perf_counter() - start
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3) if ordered else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else None
+    }
+
+
+def report(records, elapsed, args, mix):
+    groups = {'routes': defaultdict(list), 'sources': defaultdict(list), 'kinds': defaultdict(list)}
+    errors = {'routes': defaultdict(int), 'sources': defaultdict(int), 'kinds': defaultdict(int)}
+    for route, kind, source, latency, ok in records:
+        for group, key in (('routes', route), ('kinds', kind), ('sources', source)):
+            if key is None:
+                continue
+            groups[group][key].append(latency)
+            if not ok:
+                errors[group][key] += 1
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    result = {
+        'commit': commit,
+        'config': {
+            'server': args.server, 'workers': args.workers, 'orders': args.orders, 'concurrency': args.concurrency,
+            'rps': args.rps, 'duration_s': args.duration, 'llm_delay_s': args.llm_delay, 'mix': mix
+        },
+        'overall': summarize([r[3] for r in records], sum(1 for r in records if not r[4]), elapsed)
+    }
+    for group in ('routes', 'sources', 'kinds'):
+        result[group] = {
+            key: summarize(values, errors[group][key], elapsed)
+            for key, values in sorted(groups[group].items())
+        }
+    return result
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['dev', 'flask', 'asgi', 'gunicorn'], default='flask')
+    parser.add_argument('--workers', type=int, help='gunicorn worker processes (default: WEB_CONCURRENCY or CPU count)')
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rps', type=float, default=0, help='target request rate (0 = closed loop)')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--llm-delay', type=float, default=0.3)
+    parser.add_argument('--mix', default='order=50,product=15,general=15,greeting=10,history=10')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--stub-port', type=int, default=5078)
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        # Keep stdout clean for the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_dataset(db_path, orders=args.orders, seed=7)
+        stub, server = start_servers(args, db_path)
+        try:
+            records, elapsed = asyncio.run(drive(args, mix))
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            stub.terminate()
+            server.wait()
+            stub.wait()
+
+    result = json.dumps(report(records, elapsed, args, mix), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(result + '\n')
+    else:
+        print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: fetching and serializing order rows, before and after order
+records.
+
+Reads every order of a synthetic dataset with LogisticsAgent.ORDER_INFO_QUERY
+and encodes them as a JSON response, two ways:
+
+    before   sqlite3.Row per row copied into a dict, encoded like Flask's
+             default provider (json.dumps, sort_keys)
+    after    OrderInfo built by the cursor's row factory, encoded with
+             agents.json_codec (stdlib and, when installed, orjson)
+
+Reports fetch and encode time, the memory the fetched rows keep alive and the
+peak memory of the whole fetch + encode.
+
+Usage:
+    python benchmarks/bench_order_records.py [--orders 100000] [--repeat 3]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.json_codec import load_encoder
+from agents.logistics_agent import LogisticsAgent
+from agents.order_record import OrderInfo
+from db.database_setup import generate_dataset
+
+
+def fetch_dicts(conn):
+    """Previous behaviour: sqlite3.Row, then a dict per row"""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute(LogisticsAgent.ORDER_INFO_QUERY)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def fetch_records(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = OrderInfo.from_row
+    cursor.execute(LogisticsAgent.ORDER_INFO_QUERY)
+    return cursor.fetchall()
+
+
+def flask_default_dumps(value):
+    """What Flask's DefaultJSONProvider does for a non-debug response"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result
+    return best
+
+
+def measure(label, conn, fetch, dumps, repeat):
+    fetch_time = best_time(lambda: fetch(conn), repeat)
+    rows = fetch(conn)
+    encode_time = best_time(lambda: dumps({'success': True, 'data': rows}), repeat)
+    size = len(dumps({'success': True, 'data': rows}))
+    count = len(rows)
+    del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = fetch(conn)
+    retained = tracemalloc.get_traced_memory()[0]
+    body = dumps({'success': True, 'data': rows})
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del rows, body
+
+    print(f"{label:<28} {fetch_time * 1e3:>8.0f} ms {encode_time * 1e3:>8.0f} ms "
+          f"{retained / count:>9.0f} B {peak / 2 ** 20:>9.1f} MiB {size / 2 ** 20:>8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_dataset(db_path, orders=args.orders, seed=1)
+        conn = sqlite3.connect(db_path)
+        try:
+            print(f"{args.orders:,} orders")
+            print(f"{'':<28} {'fetch':>11} {'encode':>11} {'row size':>11} {'peak':>13} {'body':>12}")
+            measure('before: Row + dict, json', conn, fetch_dicts, flask_default_dumps, args.repeat)
+            measure('after: OrderInfo, stdlib', conn, fetch_records, load_encoder('stdlib'), args.repeat)
+            try:
+                import orjson  # noqa: F401
+            except ImportError:
+                print('orjson is not installed, skipping the orjson encoder')
+            else:
+                measure('after: OrderInfo, orjson', conn, fetch_records, load_encoder('orjson'), args.repeat)
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
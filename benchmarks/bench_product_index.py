@@ -0,0 +1,155 @@
+"""
+Benchmark: ProductIndex build time, memory and lookup latency on a large
+synthetic catalog.
+
+Generates product names from brand, line, adjective and noun vocabularies,
+indexes them, then times lookups for messages naming a product correctly,
+with one typo per product word (dropped, swapped, doubled or replaced
+letter) and with no product at all. Reports how often the typo'd word was
+corrected to the intended catalog word, and the cost of an incremental add.
+
+Usage:
+    python benchmarks/bench_product_index.py [--products 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.product_index import ProductIndex
+
+ADJECTIVES = (
+    'Wireless', 'Portable', 'Compact', 'Ergonomic', 'Rugged', 'Slim', 'Premium', 'Smart',
+    'Foldable', 'Magnetic', 'Waterproof', 'Adjustable', 'Rechargeable', 'Mechanical', 'Noise Cancelling',
+    'Ultra', 'Mini', 'Travel', 'Gaming', 'Studio', 'Outdoor', 'Kids', 'Professional', 'Leather'
+)
+NOUNS = (
+    'Earbuds', 'Headphones', 'Speaker', 'Charger', 'Cable', 'Case', 'Sleeve', 'Keyboard', 'Mouse',
+    'Monitor', 'Webcam', 'Microphone', 'Tripod', 'Backpack', 'Power Bank', 'Screen Protector',
+    'Smartwatch Band', 'Router', 'Adapter', 'Hub', 'Dock', 'Stand', 'Lamp', 'Projector', 'Drone',
+    'Tablet', 'Stylus', 'Controller', 'Headset', 'Thermostat', 'Doorbell', 'Scale', 'Blender',
+    'Kettle', 'Toaster', 'Vacuum', 'Purifier', 'Humidifier', 'Fan', 'Heater', 'Tracker', 'Wallet'
+)
+
+
+def syllable_words(rng, count, syllables=('ka', 'lo', 'vi', 'ne', 'tor', 'qua', 'zen', 'mi', 'ra', 'xo',
+                                          'sul', 'den', 'fi', 'bo', 'tek', 'lux', 'ar', 'io', 'pen', 'gra')):
+    """Made-up brand and product-line names"""
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).capitalize())
+    return sorted(words)
+
+
+def build_catalog(size, seed=7):
+    rng = random.Random(seed)
+    brands = syllable_words(rng, 400)
+    lines = syllable_words(rng, 1500)
+    names = set()
+    while len(names) < size:
+        parts = [rng.choice(brands)]
+        if rng.random() < 0.6:
+            parts.append(rng.choice(lines))
+        parts.append(rng.choice(ADJECTIVES))
+        parts.append(rng.choice(NOUNS))
+        if rng.random() < 0.4:
+            parts.append(rng.choice(('Pro', 'Max', 'Plus', 'Lite', 'X', 'S', '2', '3', 'Gen 2', 'XL')))
+        names.add(' '.join(parts))
+    return sorted(names)
+
+
+def typo(rng, word):
+    """One random edit: drop, swap, double or replace a letter"""
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == 2:
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def time_calls(func, messages):
+    timings = []
+    for message in messages:
+        started = time.perf_counter()
+        func(message)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.products)
+    rng = random.Random(11)
+
+    start = time.perf_counter()
+    index = ProductIndex()
+    index.add(catalog)
+    build = time.perf_counter() - start
+
+    # Memory from a second, traced build; tracing slows the build itself down
+    tracemalloc.start()
+    traced = ProductIndex()
+    traced.add(catalog)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+    stats = index.stats()
+    print(f"Indexed {stats['products']:,} products ({stats['words']:,} words, {stats['trigrams']:,} trigrams) "
+          f"in {build:.2f} s, {memory / 2 ** 20:.1f} MiB")
+
+    # A noun the customer types, e.g. "Power Bank", with its catalog words
+    nouns = [noun for noun in NOUNS if all(len(word) >= 5 for word in noun.split())]
+    exact, typos, intended = [], [], []
+    for _ in range(args.queries):
+        product = rng.choice(catalog)
+        exact.append(f"where is my {product.lower()}?")
+        noun = rng.choice(nouns)
+        mistyped = ' '.join(typo(rng, word.lower()) for word in noun.split())
+        typos.append(f"when will my {mistyped} arrive")
+        intended.append(noun)
+    general = [rng.choice((
+        "what's your return policy?", 'do you ship internationally?', 'how can I contact support',
+        'can I pay with paypal', 'who are you', 'I forgot my password'
+    )) + f' {rng.randint(1, 10 ** 6)}' for _ in range(args.queries)]
+
+    corrected = sum(
+        1 for message, noun in zip(typos, intended)
+        if index.search_terms(message)[:1] == [noun]
+    )
+    found = sum(1 for message in exact if index.match(message))
+    print(f"Exact names found: {found / len(exact):.1%}   typos corrected: {corrected / len(typos):.1%}")
+
+    print()
+    print(f"{'messages':<22} {'p50':>9} {'p99':>9}")
+    for label, messages in (('exact product name', exact), ('one typo per word', typos), ('no product', general)):
+        # First pass fills the word cache, as repeated chat vocabulary would
+        index._catalog.resolved = {}
+        cold = time_calls(index.match, messages)
+        warm = time_calls(index.match, messages)
+        print(f"{label + ' (cold)':<22} {cold[0] * 1e6:>7.1f}us {cold[1] * 1e6:>7.1f}us")
+        print(f"{label + ' (warm)':<22} {warm[0] * 1e6:>7.1f}us {warm[1] * 1e6:>7.1f}us")
+
+    new_products = [f'Brandnew {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}' for i in range(100)]
+    start = time.perf_counter()
+    index.add(new_products)
+    print()
+    print(f"Incremental add of {len(new_products)} products: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark: carrier tracking event ingest throughput, and order lookup
+latency while it runs.
+
+Generates a synthetic dataset, then ingests JSON Lines tracking events for
+random existing shipments (a mix of new scans, status changes, out-of-order
+and replayed events) through TrackingEventIngestor: once on its own, then
+again with new events while reader threads keep looking up orders through
+LogisticsAgent. Reader latency is also measured with no ingest running.
+Readers and the ingest share one interpreter, so busy readers also slow
+the ingest down by holding the GIL.
+
+Usage:
+    python benchmarks/bench_tracking_ingest.py [--orders 200000] [--events 200000]
+        [--batch-size 20000] [--readers 2]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.logistics_agent import LogisticsAgent
+from agents.tracking_ingest import TrackingEventIngestor
+from db.database_setup import HUB_CITIES, generate_dataset
+
+STATUSES = ('Shipped', 'In Transit', 'Out for Delivery', 'Delivered', None)
+
+
+def make_events(count, orders, seed=5):
+    """JSON Lines events; about 5% replay an earlier line and 10% arrive late"""
+    rng = random.Random(seed)
+    start = datetime.now()
+    lines = []
+    for i in range(count):
+        if lines and rng.random() < 0.05:
+            lines.append(rng.choice(lines))
+            continue
+        order_id = rng.randint(1, orders)
+        moment = start + timedelta(seconds=i)
+        if rng.random() < 0.1:
+            moment -= timedelta(hours=rng.randint(1, 48))
+        lines.append(json.dumps({
+            'tracking_id': f'TRK{order_id:09d}',
+            'location': f'{rng.choice(HUB_CITIES)} Hub',
+            'timestamp': moment.isoformat(timespec='seconds'),
+            'status': rng.choice(STATUSES),
+            'carrier': 'BenchExpress'
+        }).encode() + b'\n')
+    return lines
+
+
+def read_latencies(agent, orders, stop, results, seed):
+    rng = random.Random(seed)
+    timings = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        agent.get_order_info(rng.randint(1, orders))
+        timings.append(time.perf_counter() - started)
+    results.extend(timings)
+
+
+def run_readers(agent, orders, readers, work):
+    """Run `work` while reader threads look up orders; returns its result and the read latencies"""
+    stop = threading.Event()
+    results = []
+    threads = [
+        threading.Thread(target=read_latencies, args=(agent, orders, stop, results, seed))
+        for seed in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        outcome = work()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return outcome, sorted(results)
+
+
+def report_ingest(label, report, elapsed):
+    print(f"{label:<22} {report['received']:>9,} events in {elapsed:5.2f} s  "
+          f"{report['received'] / elapsed:>8,.0f} events/s   "
+          f"stored {report['inserted']:,}, duplicates {report['duplicates']:,}, rejected {report['rejected']:,}, "
+          f"shipments updated {report['logistics_updated']:,}, statuses updated {report['orders_updated']:,}")
+
+
+def describe(label, timings, elapsed):
+    p50 = statistics.median(timings) * 1e3
+    p99 = timings[int(len(timings) * 0.99)] * 1e3
+    print(f"{label:<22} {len(timings) / elapsed:>10,.0f} reads/s   p50 {p50:>6.2f} ms   p99 {p99:>6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    parser.add_argument('--readers', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_dataset(db_path, orders=args.orders, seed=7)
+        alone_lines = make_events(args.events, args.orders, seed=5)
+        busy_lines = make_events(args.events, args.orders, seed=6)
+
+        # Lookups always read the database, so the comparison isn't a cache benchmark
+        agent = LogisticsAgent(db_path)
+        agent.order_cache.max_size = 0
+        ingestor = TrackingEventIngestor(db_path, batch_size=args.batch_size)
+        try:
+            idle_time = 2.0
+            _, idle = run_readers(agent, args.orders, args.readers, lambda: time.sleep(idle_time))
+
+            print(f"{args.orders:,} orders, batches of {args.batch_size:,}, {args.readers} reader threads")
+            started = time.perf_counter()
+            report = ingestor.ingest_lines(alone_lines)
+            report_ingest('ingest alone', report, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            report, busy = run_readers(agent, args.orders, args.readers, lambda: ingestor.ingest_lines(busy_lines))
+            elapsed = time.perf_counter() - started
+            report_ingest('ingest with readers', report, elapsed)
+            print()
+            describe('lookups, idle', idle, idle_time)
+            describe('lookups during ingest', busy, elapsed)
+        finally:
+            ingestor.close()
+            agent.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Paging check for the conversation log's history pages.
+
+Writes some of a session's messages and leaves the rest queued behind a
+writer that waits to fill a batch, then pages through the history a few
+messages at a time, as a client following next_cursor would. Fails unless
+every message comes back exactly once, in order, and the paging ends.
+
+Usage:
+    python benchmarks/check_conversation_log.py [--written 5] [--queued 5] [--page-size 3]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.conversation_log import ConversationLog
+from agents.db_pool import SQLiteConnectionPool
+from db.database_setup import create_database
+
+
+def page_through(log, session_id, page_size, max_pages):
+    """Messages of every page, following next_cursor; None if it never ends"""
+    messages = []
+    cursor = None
+    for _ in range(max_pages):
+        page = log.get_page(session_id, cursor=cursor, limit=page_size)
+        messages.extend(entry['message'] for entry in page['history'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return messages
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--written', type=int, default=5)
+    parser.add_argument('--queued', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=3)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'history.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            create_database(db_path)
+        pool = SQLiteConnectionPool(db_path, max_size=2)
+        # A writer that holds messages until a large batch fills
+        log = ConversationLog(pool, batch_size=100000, flush_interval=60)
+
+        total = args.written + args.queued
+        max_pages = total + 2
+        # (description, session, messages written first)
+        cases = [
+            ('written then queued', 'mixed', args.written),
+            ('all queued', 'queued', 0),
+            ('all written', 'written', total),
+        ]
+        for description, session_id, written in cases:
+            expected = [f'message {i}' for i in range(total)]
+            for i, message in enumerate(expected):
+                log.append(session_id, {'type': 'user', 'message': message, 'timestamp': str(i)})
+                if i + 1 == written:
+                    log.flush()
+
+            messages = page_through(log, session_id, args.page_size, max_pages)
+            ok = messages == expected
+            if messages is None:
+                detail = f"still paging after {max_pages} pages"
+            else:
+                detail = f"{len(messages)} of {total} messages"
+            print(f"{'ok  ' if ok else 'FAIL'} {description}: {detail}")
+            if not ok:
+                failures += 1
+
+        log.close()
+        pool.close()
+
+    if failures:
+        print(f"{failures} histories repeated, skipped or never finished paging")
+        sys.exit(1)
+    print("Every history pages to the end with each message once")
+
+
+if __name__ == '__main__':
+    main()
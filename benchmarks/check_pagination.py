@@ -0,0 +1,100 @@
+"""
+Keyset pagination check for LogisticsAgent order searches.
+
+Builds a synthetic database, clears the order date of some orders and pages
+through product and customer searches a few rows at a time. Fails unless
+every search returns each matching order exactly once, newest first with
+orders that have no date last, so a page ending on an undated order still
+leads to the rest.
+
+Usage:
+    python benchmarks/check_pagination.py [--orders 5000] [--page-size 7]
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.logistics_agent import LogisticsAgent
+from db.database_setup import generate_dataset
+
+
+def all_pages(fetch_page, page_size):
+    """Order IDs of every page, following next_cursor to the end"""
+    order_ids = []
+    cursor = None
+    while True:
+        page = fetch_page(cursor, page_size)
+        order_ids.extend(order['order_id'] for order in page['orders'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return order_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=7)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'pagination.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_dataset(db_path, orders=args.orders, seed=1)
+
+        conn = sqlite3.connect(db_path)
+        conn.execute('UPDATE orders SET order_date = NULL WHERE order_id % 10 = 3')
+        conn.commit()
+        rows = conn.execute('''
+            SELECT o.order_id, o.product_name, o.order_date, c.email, c.name
+            FROM orders o JOIN customers c ON o.customer_id = c.id
+        ''').fetchall()
+        email, name = conn.execute('''
+            SELECT c.email, c.name FROM orders o JOIN customers c ON o.customer_id = c.id
+            WHERE o.order_date IS NULL GROUP BY c.id ORDER BY count(*) DESC LIMIT 1
+        ''').fetchone()
+        conn.close()
+
+        def expected(keep):
+            matching = [row for row in rows if keep(row)]
+            matching.sort(key=lambda row: (row[2] or '', row[0]), reverse=True)
+            return [row[0] for row in matching]
+
+        agent = LogisticsAgent(db_path)
+        # (description, page fetcher, expected order IDs)
+        searches = [
+            ('product search (full-text)',
+             lambda cursor, limit: agent.search_orders_by_product_page('Earbuds', cursor, limit),
+             expected(lambda row: 'earbuds' in row[1].lower())),
+            ('product search (date index walk)',
+             lambda cursor, limit: agent.search_orders_by_product_page('SD', cursor, limit),
+             expected(lambda row: 'sd' in row[1].lower())),
+            ('customer orders by email',
+             lambda cursor, limit: agent.get_customer_orders_page(customer_email=email, cursor=cursor, limit=limit),
+             expected(lambda row: row[3] == email)),
+            ('customer orders by name',
+             lambda cursor, limit: agent.get_customer_orders_page(customer_name=name, cursor=cursor, limit=limit),
+             expected(lambda row: name.lower() in row[4].lower())),
+        ]
+        for description, fetch_page, want in searches:
+            got = all_pages(fetch_page, args.page_size)
+            ok = got == want
+            wanted = set(want)
+            undated = sum(1 for row in rows if row[0] in wanted and row[2] is None)
+            print(f"{'ok  ' if ok else 'FAIL'} {description}: {len(got)} of {len(want)} orders, {undated} without a date")
+            if not ok:
+                failures += 1
+
+    if failures:
+        print(f"{failures} searches skipped, repeated or misordered orders across pages")
+        sys.exit(1)
+    print("All searches page through every order once")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Extraction regression check for QueryMatcher.
+
+Runs messages that were once misread through the matcher and fails if the
+order IDs it extracts differ from the expected ones, so amounts, counts and
+dates next to an order ID are never looked up as further orders. Product
+detection runs against the sample catalog: generic words in messages that are
+not about the customer's own purchase ("bank holiday", "power outage") must
+not fuzzy-match a product name.
+
+Usage:
+    python benchmarks/check_query_matcher.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.product_index import ProductIndex
+from agents.query_matcher import QueryMatcher
+from db.database_setup import PRODUCT_WEIGHTS
+
+# (message, expected order IDs)
+ORDER_ID_CASES = [
+    ("I paid 2 dollars extra for order 1, why?", [1]),
+    ("where is order #5, 2 days late?", [5]),
+    ("order 12 and 3 more items", [12]),
+    ("paid 300 for order 7", [7]),
+    ("Is the valid 2 year warranty on my order?", []),
+    ("Where are orders #12, #15 and #31?", [12, 15, 31]),
+    ("Track order 4 and order 9", [4, 9]),
+    ("status of #3 & #4", [3, 4]),
+    ("order 7 and #8 please", [7, 8]),
+    ("my id is 55", []),
+    ("my ID 77", [77]),
+    ("order #6, then id 2", [6]),
+    ("orders 1, 2", [1, 2]),
+    ("my order 12 and 13", [12, 13]),
+    ("Where are orders 1, 2 and 3 please?", [1, 2, 3]),
+    ("order 3, 4.", [3, 4]),
+    ("order 7 and 2 others", [7]),
+    ("order 5, 2nd delivery attempt", [5]),
+]
+
+# (message, whether a catalog product should be detected)
+PRODUCT_CASES = [
+    ("bank holiday", False),
+    ("Is there a power outage?", False),
+    ("Do you sell laptops?", False),
+    ("What are your opening hours?", False),
+    ("When will my earbuds arrive?", True),
+    ("my earbds", True),
+    ("Has my parcel with the usb cable shipped yet", True),
+]
+
+
+def main():
+    catalog = ProductIndex()
+    catalog.add(name for name, _ in PRODUCT_WEIGHTS)
+    matcher = QueryMatcher(product_index=catalog)
+    failures = 0
+    for message, expected in ORDER_ID_CASES:
+        order_ids = matcher.match(message).order_ids
+        ok = order_ids == expected
+        print(f"{'ok  ' if ok else 'FAIL'} {message!r} -> {order_ids}" + ('' if ok else f" (expected {expected})"))
+        if not ok:
+            failures += 1
+    for message, expected in PRODUCT_CASES:
+        products = matcher.match(message).products
+        ok = bool(products) == expected
+        print(f"{'ok  ' if ok else 'FAIL'} {message!r} -> {products}"
+              + ('' if ok else f" (expected {'a product' if expected else 'none'})"))
+        if not ok:
+            failures += 1
+
+    if failures:
+        print(f"{failures} messages extracted the wrong order IDs or products")
+        sys.exit(1)
+    print("All order IDs and products extracted as expected")
+
+
+if __name__ == '__main__':
+    main()
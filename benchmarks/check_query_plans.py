@@ -0,0 +1,108 @@
+"""
+Query-plan regression check for LogisticsAgent.
+
+Builds a migrated synthetic database, runs EXPLAIN QUERY PLAN for every
+query LogisticsAgent, the tracking event ingest and the conversation log
+issue, and fails if any step scans a table without an index. The plans are
+printed so a regression shows which step changed.
+
+Usage:
+    python benchmarks/check_query_plans.py [--orders 20000]
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents.conversation_log import ConversationLog
+from agents.logistics_agent import LogisticsAgent
+from agents.tracking_ingest import TrackingEventIngestor
+from db.database_setup import generate_dataset
+
+A = LogisticsAgent
+KEYSET = ('2026-01-01', '2026-01-01', 500)
+
+
+def page(sql, keyset=False):
+    """A search query as run for the first page, or for a later page after a cursor"""
+    return sql + (A.ORDER_KEYSET_FILTER if keyset else '') + A.ORDER_PAGE_ORDER
+
+
+# (description, SQL, parameters, tables a full scan is expected on)
+QUERIES = [
+    ('order by ID', A.ORDER_INFO_QUERY + ' WHERE o.order_id = ?', (1,), ()),
+    ('orders by ID batch', A.ORDER_INFO_QUERY + ' WHERE o.order_id IN (?, ?, ?)', (1, 2, 3), ()),
+    ('most recent orders', A.RECENT_ORDERS_QUERY, (1000,), ()),
+    ('customer orders by email',
+     page(A.CUSTOMER_ORDERS_QUERY + A.CUSTOMER_EMAIL_FILTER), ('john.doe1@email.com', 51), ()),
+    ('customer orders by email, next page',
+     page(A.CUSTOMER_ORDERS_QUERY + A.CUSTOMER_EMAIL_FILTER, True), ('john.doe1@email.com',) + KEYSET + (51,), ()),
+    ('customer orders for a product',
+     page(A.CUSTOMER_ORDERS_QUERY + A.CUSTOMER_EMAIL_FILTER + A.CUSTOMER_PRODUCT_FILTER),
+     ('john.doe1@email.com', '%Earbuds%', 51), ()),
+    ('customer orders by name',
+     page(A.CUSTOMER_ORDERS_QUERY + A.CUSTOMER_NAME_FILTER), ('"Sharma"', 51), ()),
+    # A leading-wildcard LIKE can't use an index; orders are still found through theirs
+    ('customer orders by short name',
+     page(A.CUSTOMER_ORDERS_QUERY + A.CUSTOMER_NAME_LIKE_FILTER), ('%Li%', 51), ('customers',)),
+    ('product search (few matches)', page(A.PRODUCT_SEARCH_QUERY), ('"Earbuds"', 51), ()),
+    ('product search (few matches), next page',
+     page(A.PRODUCT_SEARCH_QUERY, True), ('"Earbuds"',) + KEYSET + (51,), ()),
+    ('product search (many matches or short term)', page(A.PRODUCT_SCAN_QUERY), ('%SD%', 51), ()),
+    ('product search (many matches or short term), next page',
+     page(A.PRODUCT_SCAN_QUERY, True), ('%SD%',) + KEYSET + (51,), ()),
+    # Counting reads back the capped subquery's own rows, not a table
+    ('product match count', A.PRODUCT_MATCH_COUNT_QUERY, ('"Earbuds"', A.FTS_SORT_LIMIT), ('(subquery-1)',)),
+    ('product names for the product index', A.PRODUCT_NAMES_QUERY, (100, 200), ()),
+    ('latest order change', A.LATEST_CHANGE_QUERY, (), ()),
+    ('orders changed since a cache sync', A.CHANGED_ORDERS_QUERY, (100, 200), ()),
+    ('tracking event history', A.TRACKING_EVENTS_QUERY, (1,), ()),
+    ('tracking event status update', TrackingEventIngestor.UPDATE_STATUS_QUERY,
+     ('Shipped', 1, 'Shipped', 'TRK000000001', '2026-01-01 00:00:00'), ()),
+    ('conversation history page', ConversationLog.PAGE_QUERY, ('session', 0, 'session', 51), ())
+]
+
+
+def full_scans(plan):
+    """Return the tables in a query plan that are scanned without an index"""
+    tables = []
+    for _, _, _, detail in plan:
+        if detail.startswith('SCAN ') and 'USING' not in detail and 'VIRTUAL TABLE' not in detail:
+            tables.append(detail.split()[1])
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plans.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_dataset(db_path, orders=args.orders, seed=1)
+
+        conn = sqlite3.connect(db_path)
+        for description, sql, params, allowed in QUERIES:
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+            scans = [table for table in full_scans(plan) if table not in allowed]
+            print(f"{'FAIL' if scans else 'ok  '} {description}")
+            for _, _, _, detail in plan:
+                print(f"       {detail}")
+            if scans:
+                failures += 1
+        conn.close()
+
+    if failures:
+        print(f"{failures} queries scan tables without an index")
+        sys.exit(1)
+    print("All queries use indexes")
+
+
+if __name__ == '__main__':
+    main()
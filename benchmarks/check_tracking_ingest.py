@@ -0,0 +1,72 @@
+"""
+Read-after-ingest check for carrier tracking events.
+
+Builds the sample database, warms the order cache with an order, posts a
+newer tracking event for it to /tracking/events and immediately reads
+/orders/<id>/tracking. Fails unless the order's status and location agree
+with the event history just written. The order cache is set to skip its
+change log check for an hour, so this checks that the ingest drops the
+orders it changed from the cache itself.
+
+Usage:
+    python benchmarks/check_tracking_ingest.py
+"""
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+TOKEN = 'check-token'
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_PATH'] = os.path.join(tmp, 'ingest.db')
+    os.environ['TRACKING_INGEST_TOKEN'] = TOKEN
+    os.environ['ORDER_CACHE_CHECK_INTERVAL'] = '3600'
+    os.environ['CONVERSATION_LOG'] = '0'
+    try:
+        from db.database_setup import create_database
+        with contextlib.redirect_stdout(sys.stderr):
+            create_database(os.environ['DATABASE_PATH'])
+            import app
+
+        client = app.app.test_client()
+        before = client.get('/orders/1/tracking').get_json()['order']
+
+        event = {
+            'tracking_id': before['tracking_id'],
+            'location': 'Pune Hub',
+            'status': 'Delivered',
+            'timestamp': (datetime.now(timezone.utc) + timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        }
+        response = client.post('/tracking/events', data=json.dumps(event) + '\n',
+                               headers={'X-Ingest-Token': TOKEN})
+        report = response.get_json()
+        if response.status_code != 200 or not report['inserted']:
+            print(f"FAIL ingest: {response.status_code} {report}")
+            sys.exit(1)
+
+        after = client.get('/orders/1/tracking').get_json()
+        order, latest = after['order'], after['events'][-1]
+        print(f"before ingest   {before['delivery_status']} at {before['current_location']}")
+        print(f"latest event    {latest['status']} at {latest['location']}")
+        print(f"after ingest    {order['delivery_status']} at {order['current_location']}")
+        if (order['delivery_status'], order['current_location']) != ('Delivered', 'Pune Hub'):
+            print("FAIL order status is stale after ingest")
+            sys.exit(1)
+        print("Order status matches the ingested events")
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            if 'app' in sys.modules:
+                sys.modules['app'].close_support_agent()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
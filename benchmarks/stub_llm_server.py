@@ -0,0 +1,165 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions with a canned answer after a configurable
+delay, optionally failing a fraction of requests. Requests with
+"stream": true receive the answer word by word as server-sent events,
+`--chunk-delay` seconds apart. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python benchmarks/stub_llm_server.py [--port 8089] [--delay 0.5] [--chunk-delay 0.05] [--error-rate 0.0]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANSWER = "Thanks for reaching out! Our return window is 30 days from delivery."
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        self.server.request_count += 1
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if random.random() < self.server.error_rate:
+            self._send_json(500, {'error': {'message': 'stub upstream failure', 'type': 'server_error'}})
+            return
+
+        if payload.get('stream'):
+            self._send_stream(payload.get('model', 'gpt-3.5-turbo'))
+            return
+
+        self._send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': STUB_ANSWER},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+        })
+
+    def _send_stream(self, model: str):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        words = STUB_ANSWER.split(' ')
+        for i, word in enumerate(words):
+            if i and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            self._send_event({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': word if i == 0 else ' ' + word},
+                    'finish_reason': None
+                }]
+            })
+        self._send_event({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+        })
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+    def _send_event(self, body: dict):
+        self.wfile.write(b'data: ' + json.dumps(body).encode() + b'\n\n')
+        self.wfile.flush()
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Accept bursts of concurrent connections
+
+
+class StubLLMServer:
+    """Run the stub API on a background thread"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0,
+                 error_rate: float = 0.0, chunk_delay: float = 0.0):
+        self.httpd = StubHTTPServer((host, port), StubLLMHandler)
+        self.httpd.delay = delay
+        self.httpd.chunk_delay = chunk_delay
+        self.httpd.error_rate = error_rate
+        self.httpd.request_count = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    def set_delay(self, delay: float):
+        self.httpd.delay = delay
+
+    def set_error_rate(self, error_rate: float):
+        self.httpd.error_rate = error_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--delay', type=float, default=0.5)
+    parser.add_argument('--chunk-delay', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.delay, args.error_rate, args.chunk_delay)
+    print(f"Stub LLM API listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,57 @@
 import sqlite3
 import os
+import csv
+import json
+import random
 from datetime import datetime, timedelta
+from itertools import islice
 
-def create_database():
+# Columns accepted by the importer, in table order
+TABLE_COLUMNS = {
+    'customers': ('id', 'name', 'email'),
+    'orders': ('order_id', 'customer_id', 'product_name', 'delivery_status', 'expected_date', 'order_date'),
+    'logistics': ('tracking_id', 'order_id', 'current_location', 'last_update')
+}
+
+# Rows per executemany call for generated and imported data
+BULK_BATCH_SIZE = 50000
+
+# Product catalog with relative order volume
+PRODUCT_WEIGHTS = (
+    ('Wireless Earbuds', 18), ('Smartphone Case', 16), ('USB-C Cable', 15),
+    ('Bluetooth Speaker', 8), ('Noise Cancelling Headphones', 7), ('Wireless Charger', 9),
+    ('Laptop Sleeve', 5), ('Smartwatch Band', 6), ('Power Bank', 8),
+    ('Screen Protector', 12), ('Portable SSD', 3), ('Mechanical Keyboard', 3)
+)
+
+FIRST_NAMES = (
+    'John', 'Jane', 'Mike', 'Priya', 'Arjun', 'Sara', 'Wei', 'Fatima', 'Carlos', 'Emma',
+    'Liam', 'Aisha', 'Noah', 'Olivia', 'Ravi', 'Mei', 'Lucas', 'Zara', 'Omar', 'Hannah'
+)
+LAST_NAMES = (
+    'Doe', 'Smith', 'Johnson', 'Sharma', 'Patel', 'Chen', 'Khan', 'Garcia', 'Brown', 'Nguyen',
+    'Williams', 'Kumar', 'Lee', 'Martin', 'Singh', 'Lopez', 'Ali', 'Wilson', 'Das', 'Taylor'
+)
+HUB_CITIES = (
+    'Bangalore', 'Delhi', 'Mumbai', 'Chennai', 'Hyderabad', 'Pune', 'Kolkata', 'Ahmedabad'
+)
+
+def create_database(db_path=None):
     """Create and populate the SQLite database with sample data"""
     
-    # Create db directory if it doesn't exist
-    db_dir = os.path.dirname(__file__)
-    db_path = os.path.join(db_dir, 'customer_support.db')
+    if db_path is None:
+        db_path = get_database_path()
     
-    # Remove existing database to start fresh
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    # Remove existing database (and any WAL sidecar files) to start fresh
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
     
     # Connect to database
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    # Create customers table
-    cursor.execute('''
-        CREATE TABLE customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE
-        )
-    ''')
-    
-    # Create orders table
-    cursor.execute('''
-        CREATE TABLE orders (
-            order_id INTEGER PRIMARY KEY,
-            customer_id INTEGER,
-            product_name TEXT NOT NULL,
-            delivery_status TEXT NOT NULL,
-            expected_date TEXT,
-            order_date TEXT,
-            FOREIGN KEY (customer_id) REFERENCES customers (id)
-        )
-    ''')
-    
-    # Create logistics table
-    cursor.execute('''
-        CREATE TABLE logistics (
-            tracking_id TEXT PRIMARY KEY,
-            order_id INTEGER,
-            current_location TEXT NOT NULL,
-            last_update TEXT NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES orders (order_id)
-        )
-    ''')
+    create_tables(cursor)
     
     # Insert sample customers
     customers_data = [
@@ -89,8 +92,12 @@ def create_database():
     
     cursor.executemany('INSERT INTO logistics VALUES (?, ?, ?, ?)', logistics_data)
     
-    # Commit changes and close connection
     conn.commit()
+    
+    # Indexes, search tables and triggers
+    migrate_database(conn)
+    
+    # Close connection
     conn.close()
     
     print(f"Database created successfully at: {db_path}")
@@ -99,10 +106,444 @@ def create_database():
     print("- 4 orders")
     print("- 4 logistics entries")
 
+def create_tables(cursor):
+    """Create the customers, orders and logistics tables"""
+    
+    # Create customers table
+    cursor.execute('''
+        CREATE TABLE customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE
+        )
+    ''')
+    
+    # Create orders table
+    cursor.execute('''
+        CREATE TABLE orders (
+            order_id INTEGER PRIMARY KEY,
+            customer_id INTEGER,
+            product_name TEXT NOT NULL,
+            delivery_status TEXT NOT NULL,
+            expected_date TEXT,
+            order_date TEXT,
+            FOREIGN KEY (customer_id) REFERENCES customers (id)
+        )
+    ''')
+    
+    # Create logistics table
+    cursor.execute('''
+        CREATE TABLE logistics (
+            tracking_id TEXT PRIMARY KEY,
+            order_id INTEGER,
+            current_location TEXT NOT NULL,
+            last_update TEXT NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders (order_id)
+        )
+    ''')
+
+def _set_bulk_load_pragmas(conn, fresh):
+    """
+    Speed up large loads. A fresh database has nothing to lose if the load is
+    interrupted, so it also skips the rollback journal and fsyncs entirely.
+    """
+    conn.execute('PRAGMA cache_size = -262144')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA synchronous = OFF')
+    if fresh:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA locking_mode = EXCLUSIVE')
+
+def _insert_batches(conn, table, rows, batch_size=BULK_BATCH_SIZE):
+    """Insert rows from an iterable with one executemany per batch; returns the row count"""
+    columns = TABLE_COLUMNS[table]
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows = iter(rows)
+    total = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return total
+        conn.executemany(sql, batch)
+        total += len(batch)
+
+def _weighted_table(weights, size=1000):
+    """Expand (value, weight) pairs into a lookup table indexed by a uniform random number"""
+    total = sum(weight for _, weight in weights)
+    table = []
+    for value, weight in weights:
+        table.extend([value] * round(size * weight / total))
+    return table
+
+def _generate_customers(rng, count):
+    for customer_id in range(1, count + 1):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        yield (customer_id, f'{first} {last}', f'{first.lower()}.{last.lower()}{customer_id}@email.com')
+
+def _generate_orders(rng, count, customers, days):
+    """
+    Yield (order_row, logistics_row) pairs. Order dates are spread over the
+    last `days` days, a minority of customers place most orders, and the
+    delivery status follows from the order's age and shipping lead time.
+    """
+    today = datetime.now()
+    # Date strings from `days` ago to 10 days ahead, indexed by offset + days
+    dates = [(today + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(-days, 11)]
+    times = [f'{hour:02d}:{minute:02d}' for hour in range(24) for minute in range(0, 60, 15)]
+    products = _weighted_table(PRODUCT_WEIGHTS)
+    hubs = [f'{city} Hub' for city in HUB_CITIES] + [f'{city} Sorting Center' for city in HUB_CITIES]
+    warehouses = [f'Warehouse {city}' for city in HUB_CITIES]
+    random_number = rng.random
+    randint = rng.randint
+    
+    for order_id in range(1, count + 1):
+        # Squaring skews purchases toward low customer IDs (repeat buyers)
+        customer_id = int(customers * random_number() ** 2) + 1
+        # Squaring again skews order dates toward the recent past
+        age = int(days * random_number() ** 2)
+        lead = randint(2, 7)
+        
+        if age >= lead:
+            status = 'Delivered'
+            location = 'Delivered - Customer Location'
+            updated = days - age + lead
+        elif age == 0:
+            status = 'Processing'
+            location = warehouses[int(random_number() * len(warehouses))]
+            updated = days
+        else:
+            status = 'Shipped' if age * 2 < lead else 'In Transit'
+            location = hubs[int(random_number() * len(hubs))]
+            updated = days
+        
+        yield (
+            (order_id, customer_id, products[int(random_number() * len(products))], status,
+             dates[days - age + lead], dates[days - age]),
+            (f'TRK{order_id:09d}', order_id, location,
+             dates[updated] + ' ' + times[int(random_number() * len(times))])
+        )
+
+def generate_dataset(db_path=None, orders=100000, customers=None, days=365, seed=None,
+                     batch_size=BULK_BATCH_SIZE):
+    """
+    Create a fresh database with a synthetic dataset of the given size,
+    generated and inserted in batches so memory use does not grow with it.
+    """
+    if db_path is None:
+        db_path = get_database_path()
+    if customers is None:
+        customers = max(1, orders // 4)
+    
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    _set_bulk_load_pragmas(conn, fresh=True)
+    create_tables(conn.cursor())
+    
+    _insert_batches(conn, 'customers', _generate_customers(rng, customers), batch_size)
+    
+    order_sql = 'INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)'
+    logistics_sql = 'INSERT INTO logistics VALUES (?, ?, ?, ?)'
+    pairs = _generate_orders(rng, orders, customers, days)
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            break
+        conn.executemany(order_sql, [order for order, _ in batch])
+        conn.executemany(logistics_sql, [logistics for _, logistics in batch])
+    conn.commit()
+    
+    # Indexes and triggers are built once, after the data is in
+    migrate_database(conn)
+    conn.close()
+    
+    print(f"Generated database at: {db_path}")
+    print(f"- {customers} customers")
+    print(f"- {orders} orders")
+    print(f"- {orders} logistics entries")
+
+def _read_records(path):
+    """Stream records from a CSV (with a header row) or JSON Lines file, one at a time"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for record in csv.DictReader(f):
+                # Empty CSV fields are NULLs
+                yield {key: value if value != '' else None for key, value in record.items()}
+
+def import_records(path, table, db_path=None, batch_size=BULK_BATCH_SIZE):
+    """
+    Stream a CSV or JSONL export into a table, holding at most one batch in
+    memory. Into a new database the schema is created first and indexes are
+    built after the load; into an existing one the usual triggers keep them
+    current. Returns the number of rows imported.
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    if db_path is None:
+        db_path = get_database_path()
+    
+    fresh = not os.path.exists(db_path)
+    columns = TABLE_COLUMNS[table]
+    conn = sqlite3.connect(db_path)
+    _set_bulk_load_pragmas(conn, fresh)
+    if fresh:
+        create_tables(conn.cursor())
+    
+    try:
+        rows = (tuple(record.get(column) for column in columns) for record in _read_records(path))
+        total = _insert_batches(conn, table, rows, batch_size)
+        conn.commit()
+        if fresh:
+            migrate_database(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    print(f"Imported {total} rows into {table} from {path}")
+    return total
+
+def _create_trigram_index(conn, index_table, table, rowid_column, column):
+    """
+    Create an external-content FTS5 trigram index over one text column and the
+    triggers that keep it in sync with its table. Returns False when SQLite
+    was built without FTS5 or the trigram tokenizer.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index_table,))
+    if cursor.fetchone():
+        return True
+    
+    try:
+        # External-content table: stores only the index, rows live in the source table
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE {index_table} USING fts5(
+                {column},
+                content='{table}',
+                content_rowid='{rowid_column}',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 trigram index {index_table} unavailable, using LIKE search: {e}")
+        return False
+    
+    cursor.execute(f'''
+        CREATE TRIGGER {index_table}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {index_table} (rowid, {column}) VALUES (new.{rowid_column}, new.{column});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER {index_table}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {index_table} ({index_table}, rowid, {column}) VALUES ('delete', old.{rowid_column}, old.{column});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER {index_table}_update AFTER UPDATE OF {rowid_column}, {column} ON {table} BEGIN
+            INSERT INTO {index_table} ({index_table}, rowid, {column}) VALUES ('delete', old.{rowid_column}, old.{column});
+            INSERT INTO {index_table} (rowid, {column}) VALUES (new.{rowid_column}, new.{column});
+        END
+    ''')
+    
+    # Index any rows that existed before the table was created
+    cursor.execute(f"INSERT INTO {index_table} ({index_table}) VALUES ('rebuild')")
+    return True
+
+def create_search_index(conn):
+    """Create the FTS5 trigram index over orders.product_name"""
+    return _create_trigram_index(conn, 'orders_fts', 'orders', 'order_id', 'product_name')
+
+def create_customer_search_index(conn):
+    """Create the FTS5 trigram index over customers.name for substring name lookups"""
+    return _create_trigram_index(conn, 'customers_fts', 'customers', 'id', 'name')
+
+def create_lookup_indexes(conn):
+    """
+    Index the join and lookup columns used by LogisticsAgent. The logistics
+    index covers every column the order queries read, so the join never
+    touches the logistics table itself. Orders are indexed by
+    COALESCE(order_date, ''), the sort key of paginated order searches, so
+    orders without a date sort as the oldest and can be paged past.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logistics_order_id
+        ON logistics (order_id, current_location, last_update, tracking_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_customer_date_key
+        ON orders (customer_id, COALESCE(order_date, ''))
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_date_key ON orders (COALESCE(order_date, ''))")
+    cursor.execute('ANALYZE')
+
+# Change log rows kept for order caches to catch up from; a cache further
+# behind drops everything. Pruned every ORDER_CHANGE_PRUNE_EVERY changes.
+ORDER_CHANGE_LOG_KEEP = 100000
+ORDER_CHANGE_PRUNE_EVERY = 1000
+
+def create_order_change_log(conn):
+    """
+    Create the order_changes log and the triggers that add the affected
+    order IDs whenever orders, logistics or customers change. Order caches
+    read the latest version to check a cached lookup is current, and drop
+    just the orders changed since then rather than all of them (a tracking
+    ingest batch changes thousands of rows). Each row's version is its
+    rowid; a customer change logs every order of that customer.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_changes (
+            version INTEGER PRIMARY KEY,
+            order_id INTEGER NOT NULL
+        )
+    ''')
+    
+    # Rows whose order_id changes log both orders
+    changed_orders = {
+        ('orders', 'INSERT'): 'SELECT NEW.order_id',
+        ('orders', 'UPDATE'): 'SELECT OLD.order_id UNION SELECT NEW.order_id',
+        ('orders', 'DELETE'): 'SELECT OLD.order_id',
+        ('logistics', 'INSERT'): 'SELECT NEW.order_id',
+        ('logistics', 'UPDATE'): 'SELECT OLD.order_id UNION SELECT NEW.order_id',
+        ('logistics', 'DELETE'): 'SELECT OLD.order_id',
+        ('customers', 'INSERT'): 'SELECT order_id FROM orders WHERE customer_id = NEW.id',
+        ('customers', 'UPDATE'): 'SELECT order_id FROM orders WHERE customer_id IN (OLD.id, NEW.id)',
+        ('customers', 'DELETE'): 'SELECT order_id FROM orders WHERE customer_id = OLD.id'
+    }
+    for (table, event), select in changed_orders.items():
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_changes AFTER {event} ON {table} BEGIN
+                INSERT INTO order_changes (order_id) {select};
+            END
+        ''')
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS order_changes_prune AFTER INSERT ON order_changes
+        WHEN NEW.version % {ORDER_CHANGE_PRUNE_EVERY} = 0 BEGIN
+            DELETE FROM order_changes WHERE version <= NEW.version - {ORDER_CHANGE_LOG_KEEP};
+        END
+    ''')
+
+def create_tracking_events(conn):
+    """
+    Create the tracking_events history table filled by the carrier event
+    ingest. The unique index drops replayed events and also serves an
+    order's history in event time order.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tracking_events (
+            id INTEGER PRIMARY KEY,
+            order_id INTEGER NOT NULL,
+            tracking_id TEXT NOT NULL,
+            location TEXT NOT NULL,
+            status TEXT,
+            event_time TEXT NOT NULL,
+            carrier TEXT,
+            received_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (order_id) REFERENCES orders (order_id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_tracking_events_order_time
+        ON tracking_events (order_id, event_time, tracking_id, location)
+    ''')
+
+def create_conversation_log(conn):
+    """
+    Create the conversation_log table, the persistent record of chat
+    messages written behind /chat by agents.conversation_log. A session's
+    history is read newest-last through its (session_id, id) index.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_log (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            source TEXT,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_conversation_log_session
+        ON conversation_log (session_id, id)
+    ''')
+
+# Schema changes in the order they were introduced, as (version, description,
+# function). The applied version is stored in PRAGMA user_version; append new
+# steps here, never edit or reorder released ones. Steps must also succeed on
+# databases that predate versioning and already contain some of their objects.
+MIGRATIONS = (
+    (1, 'full-text product search index', create_search_index),
+    (2, 'per-order change log for cached order lookups', create_order_change_log),
+    (3, 'join and lookup indexes', create_lookup_indexes),
+    (4, 'full-text customer name search index', create_customer_search_index),
+    (5, 'carrier tracking event history', create_tracking_events),
+    (6, 'persistent conversation log', create_conversation_log)
+)
+
+def migrate_database(conn):
+    """
+    Upgrade a database in place by applying every migration newer than its
+    schema version. Each step commits together with its version bump, so an
+    interrupted upgrade resumes where it stopped. Returns the schema version.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    for target, description, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.commit()
+        conn.execute('BEGIN')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {target}: {description}")
+        version = target
+    
+    return version
+
 def get_database_path():
-    """Return the path to the database"""
+    """Return the path to the database (DATABASE_PATH overrides the default)"""
+    if os.getenv('DATABASE_PATH'):
+        return os.getenv('DATABASE_PATH')
     db_dir = os.path.dirname(__file__)
     return os.path.join(db_dir, 'customer_support.db')
 
 if __name__ == "__main__":
-    create_database()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Create, generate or import the customer support database')
+    parser.add_argument('--db', help='database path (default: DATABASE_PATH or db/customer_support.db)')
+    parser.add_argument('--orders', type=int, help='generate a synthetic dataset with this many orders')
+    parser.add_argument('--customers', type=int, help='number of synthetic customers (default: orders / 4)')
+    parser.add_argument('--seed', type=int, help='random seed for a reproducible dataset')
+    parser.add_argument('--import', dest='import_path', help='CSV or JSONL file to import')
+    parser.add_argument('--table', choices=sorted(TABLE_COLUMNS), help='table to import into')
+    args = parser.parse_args()
+    
+    if args.import_path:
+        if not args.table:
+            parser.error('--import requires --table')
+        import_records(args.import_path, args.table, args.db)
+    elif args.orders is not None:
+        generate_dataset(args.db, orders=args.orders, customers=args.customers, seed=args.seed)
+    else:
+        create_database(args.db)
@@ -0,0 +1,40 @@
+"""
+Gunicorn settings for production serving.
+
+The app is preloaded in the master process, which initializes the database
+and warms caches exactly once before forking workers. Each worker serves
+requests on a pool of threads, since most request time is spent waiting on
+SQLite or the LLM API.
+
+Environment:
+    PORT               port to listen on (default 5000)
+    WEB_CONCURRENCY    worker processes (default: one per CPU core)
+    GUNICORN_THREADS   threads per worker (default 8)
+    GUNICORN_TIMEOUT   seconds before a silent worker is restarted (default 60)
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:application'
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+
+# Import the app, migrate the database and warm caches once, before forking
+preload_app = True
+
+accesslog = '-'
+
+
+def pre_fork(server, worker):
+    from app import get_support_agent
+    get_support_agent().before_fork()
+
+
+def post_fork(server, worker):
+    from app import get_support_agent
+    get_support_agent().after_fork()
@@ -0,0 +1,20 @@
+"""
+Production WSGI entry point.
+
+Importing this module initializes (or migrates) the database and warms the
+caches. Under gunicorn with preload_app (see gunicorn.conf.py) that happens
+once in the master process, and every forked worker starts with the warm
+caches already in memory.
+
+Run with:
+    gunicorn -c gunicorn.conf.py
+"""
+from app import app, get_support_agent, initialize_database, check_environment
+
+check_environment()
+initialize_database()
+
+warmed = get_support_agent().warm_up()
+print(f"Warmed caches: {warmed['orders']} recent orders, {warmed['products']} catalog products")
+
+application = app